@@ -1,16 +1,27 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 import logging
 import os
 from pathlib import Path
 from string import Template
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 from dotenv import load_dotenv
 from Levenshtein import distance as levenshtein_distance
 
-import api.summary_tables_requests
+from agents.function_matcher import get_function_matcher
+from agents.table_budget import table_budget
+from agents.tool_registry import tool_registry
+from agents.toolset import compile_toolset
+
+# Registers the summary tables in the tool registry
+import api.summary_tables_requests  # noqa: F401
 from api.utils.coords_typer import prepare_typed_coords
 from modules.models.connector_creator import LanguageModelCreator
 from modules.variables import ROOT
+from modules.variables.settings import app_settings
+from utils.admission import upstream
 
 
 path_to_config = Path(ROOT, "config.env")
@@ -28,9 +39,12 @@ class Agent:
             tools: A list of tools for the FC LLM to choose from.
         """
         load_dotenv(path_to_config)
+        self.fc_llm_name = fc_llm_name
         self.model_url = os.environ.get(fc_llm_name)
         self.tools = tools
         self.functions = [tool["function"]["name"] for tool in tools]
+        self.matcher = get_function_matcher(tuple(self.functions))
+        self.toolset = compile_toolset(tools)
         # TODO: pass model as a param
 
     @staticmethod
@@ -40,6 +54,13 @@ class Agent:
 
     def parse_function_names_from_agent_answer(self, llm_res: str) -> List[str]:
         """Finds function names (from the current tools) in the LLM answer."""
+        return self.matcher.match(llm_res)
+
+    def parse_function_names_with_levenshtein(self, llm_res: str) -> List[str]:
+        """Finds function names by the nearest name to every word of the LLM answer.
+
+        The previous parser, kept as the baseline of benchmark_function_matcher.
+        """
         predicted_funcs = llm_res.replace("[Correct answer]: ", "").split(" ")
         predicted_funcs = list(map(lambda x: x.strip(), predicted_funcs))
         correct_pred_funcs = set(
@@ -51,14 +72,48 @@ class Agent:
         res = list(correct_pred_funcs.intersection(self.functions))
         return res
 
+    @staticmethod
+    def _plan_tables(chosen_functions: List) -> List:
+        """Leaves the functions that fit the table budget.
+
+        Repeated functions (e.g. a default function also chosen by the LLM) are
+        removed keeping the order.
+        """
+        planned, dropped = table_budget.plan(list(dict.fromkeys(chosen_functions)))
+        if dropped:
+            logger.info(f"Tables dropped by the budget: {dropped}")
+        return planned
+
+    @staticmethod
+    def _join_tables(functions: List, results: Dict) -> str:
+        """Combines the tables into one string in the order of the functions.
+
+        The failed tables are logged and skipped.
+
+        Args:
+            functions: Names of the functions.
+            results: Table or exception returned by each function.
+        """
+        context = ""
+        for func in functions:
+            result = results[func]
+            if isinstance(result, BaseException):
+                if isinstance(result, (TimeoutError, asyncio.TimeoutError)):
+                    result = f"no response in {app_settings.table_timeout} sec"
+                logger.error(f"Could NOT retrieve the table of {func}: {result}")
+                continue
+            context += str(result)
+        return context
+
     @staticmethod
     def retrieve_context_from_api(
         t_name: str, t_type: str, coords: List, chosen_functions: List
     ) -> str:
         """Call all functions to get the context.
 
-        Calls all given functions in order to collect the relevant context
-        for the given question.
+        Calls the given functions that fit the table budget through the tool
+        registry, TABLE_MAX_PARALLEL at a time, the slowest first. A failed
+        function does not discard the tables of the others.
 
         Args:
             t_name: Name of the chosen territory.
@@ -72,20 +127,82 @@ class Agent:
             coordinates = prepare_typed_coords(coords)
         else:
             coordinates = None
-        chosen_functions = chosen_functions[:3]
-        context = ""
+        chosen_functions = Agent._plan_tables(chosen_functions)
+        if not chosen_functions:
+            return ""
+
+        parallel = min(len(chosen_functions), app_settings.table_max_parallel)
+        executor = ThreadPoolExecutor(max_workers=parallel)
         try:
-            for func in chosen_functions:
-                cur_handle = getattr(api.summary_tables_requests, func)
-                context += str(
-                    cur_handle(
-                        name_id=t_name, territory_type=t_type, coordinates=coordinates
-                    )
+            futures = {
+                func: executor.submit(
+                    tool_registry.call,
+                    func,
+                    name_id=t_name,
+                    territory_type=t_type,
+                    coordinates=coordinates,
                 )
-        except Exception as e:
-            # TODO: send these logs to frontend
-            logger.error(f"Could NOT retrieve context from API: {e}")
-        return context
+                for func in tool_registry.schedule(chosen_functions)
+            }
+            rounds = -(-len(chosen_functions) // parallel)
+            wait(futures.values(), timeout=app_settings.table_timeout * rounds)
+        finally:
+            # The tables that did not respond in time are not waited for
+            executor.shutdown(wait=False, cancel_futures=True)
+        results = {
+            func: (future.exception() or future.result())
+            if future.done()
+            else TimeoutError()
+            for func, future in futures.items()
+        }
+        return Agent._join_tables(chosen_functions, results)
+
+    @staticmethod
+    async def a_retrieve_context_from_api(
+        t_name: str, t_type: str, coords: List, chosen_functions: List
+    ) -> str:
+        """Asynchronous version of the retrieve_context_from_api method.
+
+        Each function is given TABLE_TIMEOUT seconds.
+        """
+        if coords:
+            coordinates = prepare_typed_coords(coords)
+        else:
+            coordinates = None
+        chosen_functions = Agent._plan_tables(chosen_functions)
+        semaphore = asyncio.Semaphore(app_settings.table_max_parallel)
+
+        async def retrieve_table(func: str) -> Dict:
+            async with semaphore:
+                return await tool_registry.a_call(
+                    func,
+                    timeout=app_settings.table_timeout,
+                    name_id=t_name,
+                    territory_type=t_type,
+                    coordinates=coordinates,
+                )
+
+        scheduled = tool_registry.schedule(chosen_functions)
+        results = await asyncio.gather(
+            *[retrieve_table(func) for func in scheduled], return_exceptions=True
+        )
+        return Agent._join_tables(chosen_functions, dict(zip(scheduled, results)))
+
+    def _prepare_fc_prompts(
+        self, question: str, sys_prompt: str, user_prompt: str
+    ) -> Tuple[str, str]:
+        """Fills the function calling prompts with the current tools and the question."""
+        sys_prompt = Template(sys_prompt).safe_substitute(tools=self.toolset.text)
+        user_prompt = Template(user_prompt).safe_substitute(question=question)
+        return sys_prompt, user_prompt
+
+    def _prepare_check_prompt(
+        self, question: str, answer: str | List[str], user_prompt: str
+    ) -> str:
+        """Fills the prompt for checking the chosen functions."""
+        return Template(user_prompt).safe_substitute(
+            question=question, answer=answer, tools=self.toolset.text
+        )
 
     def get_relevant_functions(
         self, question: str, sys_prompt: str, user_prompt: str
@@ -103,14 +220,26 @@ class Agent:
 
         Returns: List of the most suitable functions.
         """
-        sys_prompt = Template(sys_prompt).safe_substitute(
-            tools=str(self.tools).replace('"', "'")
+        sys_prompt, user_prompt = self._prepare_fc_prompts(
+            question, sys_prompt, user_prompt
         )
-        user_prompt = Template(user_prompt).safe_substitute(question=question)
         model_connector = LanguageModelCreator.create_llm_connector(
             self.model_url, sys_prompt
         )
-        return model_connector.generate(user_prompt)
+        return model_connector.generate_function_call(user_prompt, self.tools)
+
+    async def a_get_relevant_functions(
+        self, question: str, sys_prompt: str, user_prompt: str
+    ) -> List[str]:
+        """Asynchronous version of the get_relevant_functions method."""
+        sys_prompt, user_prompt = self._prepare_fc_prompts(
+            question, sys_prompt, user_prompt
+        )
+        model_connector = await LanguageModelCreator.a_create_llm_connector(
+            self.model_url, sys_prompt
+        )
+        async with upstream(self.fc_llm_name).slot():
+            return await model_connector.a_generate_function_call(user_prompt, self.tools)
 
     def choose_functions(
         self, question: str, sys_prompt: str, user_prompt: str
@@ -123,6 +252,14 @@ class Agent:
         llm_res_funcs = self.parse_function_names_from_agent_answer(llm_res)
         return llm_res_funcs
 
+    async def a_choose_functions(
+        self, question: str, sys_prompt: str, user_prompt: str
+    ) -> List[str]:
+        """Asynchronous version of the choose_functions method."""
+        llm_res = await self.a_get_relevant_functions(question, sys_prompt, user_prompt)
+        llm_res_funcs = self.parse_function_names_from_agent_answer(llm_res)
+        return llm_res_funcs
+
     def check_choice_correctness(
         self,
         question: str,
@@ -145,14 +282,27 @@ class Agent:
         Returns: A string that contains the corrected names of the chosen
         functions in a free format.
         """
-        user_prompt = Template(user_prompt).safe_substitute(
-            question=question, answer=answer, tools=str(self.tools).replace('"', "'")
-        )
+        user_prompt = self._prepare_check_prompt(question, answer, user_prompt)
         model_connector = LanguageModelCreator.create_llm_connector(
             self.model_url, sys_prompt
         )
         return model_connector.generate(user_prompt)
 
+    async def a_check_choice_correctness(
+        self,
+        question: str,
+        answer: str | List[str],
+        sys_prompt: str,
+        user_prompt: str,
+    ) -> str:
+        """Asynchronous version of the check_choice_correctness method."""
+        user_prompt = self._prepare_check_prompt(question, answer, user_prompt)
+        model_connector = await LanguageModelCreator.a_create_llm_connector(
+            self.model_url, sys_prompt
+        )
+        async with upstream(self.fc_llm_name).slot():
+            return await model_connector.a_generate(user_prompt)
+
     def check_functions(
         self,
         question: str,
@@ -165,3 +315,16 @@ class Agent:
             question, answer, sys_prompt, user_prompt
         )
         return self.parse_function_names_from_agent_answer(llm_check_res)
+
+    async def a_check_functions(
+        self,
+        question: str,
+        answer: str | List[str],
+        sys_prompt: str,
+        user_prompt: str,
+    ) -> List[str]:
+        """Asynchronous version of the check_functions method."""
+        llm_check_res = await self.a_check_choice_correctness(
+            question, answer, sys_prompt, user_prompt
+        )
+        return self.parse_function_names_from_agent_answer(llm_check_res)
@@ -0,0 +1,113 @@
+"""Compares the function name matcher with the previous Levenshtein parser.
+
+The answers are built from the labelled accessibility questions, the accuracy
+and latency report is written to the test results.
+
+Run from the project root:
+
+    python -m agents.benchmark_function_matcher
+"""
+
+from pathlib import Path
+import random
+from typing import Callable, Dict, List
+
+from agents.agent import Agent
+from agents.tools.accessibility_tools import accessibility_tools
+from modules.routing.train_function_selector import load_questions
+from modules.variables import ROOT
+from utils.measure_time import latency_summary
+from utils.measure_time import Timer
+
+
+path_to_results = Path(
+    ROOT,
+    "pipelines",
+    "tests",
+    "test_results",
+    "accessibility_pipeline",
+    "function_name_matcher_results.txt",
+)
+# Number of words of reasoning around the function names in a rambling answer
+RAMBLING_WORDS = 300
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    """Drops or doubles one letter of the name."""
+    i = rng.randrange(len(name))
+    return name[:i] + name[i + 1 :] if rng.random() < 0.5 else name[: i + 1] + name[i:]
+
+
+def build_answers(question: str, functions: List[str], rng: random.Random) -> Dict:
+    """Builds the answers of the LLM of different styles that mention the functions."""
+    words = question.split()
+    reasoning = [rng.choice(words) for _ in range(RAMBLING_WORDS)]
+    for function in functions:
+        reasoning.insert(rng.randrange(len(reasoning)), f"{function},")
+    return {
+        "clean": " ".join(functions),
+        "misspelled": "[Correct answer]: "
+        + " ".join(misspell(function, rng) for function in functions),
+        "rambling": " ".join(reasoning),
+    }
+
+
+def run_parser(
+    parse: Callable[[str], List[str]], answers: List[str], labels: List[List[str]]
+) -> Dict[str, float]:
+    """Parses the answers and returns the accuracy and the latency of the parser."""
+    correct, latencies = 0, []
+    for answer, functions in zip(answers, labels):
+        with Timer() as t:
+            parsed = parse(answer)
+            latencies.append(t.seconds_from_start)
+        correct += set(parsed) == set(functions)
+    return {"accuracy": correct / len(answers), **latency_summary(latencies)}
+
+
+def benchmark_function_matcher(seed: int = 0) -> str:
+    """Runs both parsers on every style of the answers and saves the report.
+
+    Args:
+        seed: Seed of the misspellings and the rambling answers.
+
+    Returns: The report.
+    """
+    rng = random.Random(seed)
+    agent = Agent("LLAMA_FC_URL", accessibility_tools)
+    data = load_questions()
+    # The default functions of the territory are not among the tools
+    data["correct_functions"] = data["correct_functions"].apply(
+        lambda functions: [f for f in functions if f in agent.functions]
+    )
+    data = data[data["correct_functions"].apply(len) > 0]
+    labels = data["correct_functions"].tolist()
+    answers = [
+        build_answers(question, functions, rng)
+        for question, functions in zip(data["question"], labels)
+    ]
+    parsers = {
+        "Levenshtein parser": agent.parse_function_names_with_levenshtein,
+        "Function name matcher": agent.parse_function_names_from_agent_answer,
+    }
+
+    report = [f"Total answers of each style: {len(labels)}"]
+    for style in answers[0]:
+        style_answers = [answer[style] for answer in answers]
+        report.append(f"Answer style: {style}")
+        for name, parse in parsers.items():
+            res = run_parser(parse, style_answers, labels)
+            report.append(
+                f"  {name}: accuracy {round(res['accuracy'] * 100, 2)}%, "
+                f"average time {round(res['mean'] * 1000, 3)} ms, "
+                f"p95 time {round(res['p95'] * 1000, 3)} ms"
+            )
+    report = "\n".join(report)
+    path_to_results.parent.mkdir(parents=True, exist_ok=True)
+    with open(path_to_results, "w") as f:
+        print(report, file=f)
+    return report
+
+
+if __name__ == "__main__":
+    print(benchmark_function_matcher())
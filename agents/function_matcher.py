@@ -0,0 +1,73 @@
+from functools import lru_cache
+import re
+from typing import List, Tuple
+
+from Levenshtein import distance as levenshtein_distance
+
+
+# Max edit distance from a misspelled name to the name of a tool
+MAX_NAME_DISTANCE = 3
+# Identifiers with an underscore, like the names of the tools
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z]\w*_\w+")
+
+
+class FunctionNameMatcher:
+    """Finds the names of the tools in the answer of a function calling LLM.
+
+    The exact names are found with one pass of a precompiled regex. Only the
+    remaining identifiers are compared with the names, within MAX_NAME_DISTANCE.
+    """
+
+    def __init__(self, functions: Tuple[str, ...]) -> None:
+        """Compiles the matcher for the tools.
+
+        Args:
+            functions: Names of the tools.
+        """
+        self.functions = functions
+        # Longer names first, so a name is not matched by its prefix
+        names = sorted(functions, key=len, reverse=True)
+        self.pattern = re.compile(
+            r"(?<!\w)(?:" + "|".join(map(re.escape, names)) + r")(?!\w)"
+            if names
+            else r"(?!)"
+        )
+
+    def nearest(self, token: str) -> str | None:
+        """Returns the name nearest to the token within MAX_NAME_DISTANCE.
+
+        None is returned if there is no such name.
+        """
+        best, best_distance = None, MAX_NAME_DISTANCE + 1
+        for function in self.functions:
+            if abs(len(function) - len(token)) >= best_distance:
+                continue
+            # The distance is not computed further than the best one found
+            cur_distance = levenshtein_distance(
+                token, function, score_cutoff=best_distance - 1
+            )
+            if cur_distance < best_distance:
+                best, best_distance = function, cur_distance
+        return best
+
+    def match(self, llm_res: str) -> List[str]:
+        """Finds the names of the tools in the LLM answer.
+
+        Args:
+            llm_res: The answer of the LLM.
+
+        Returns: The exact names in the order of their first mention, then the
+        corrected misspelled names.
+        """
+        found = dict.fromkeys(self.pattern.findall(llm_res))
+        for token in IDENTIFIER_PATTERN.findall(self.pattern.sub(" ", llm_res)):
+            function = self.nearest(token)
+            if function is not None:
+                found[function] = None
+        return list(found)
+
+
+@lru_cache(maxsize=32)
+def get_function_matcher(functions: Tuple[str, ...]) -> FunctionNameMatcher:
+    """Returns the matcher for the tools, it is compiled once per toolset."""
+    return FunctionNameMatcher(functions)
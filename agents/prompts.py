@@ -12,6 +12,13 @@ binary_fc_user_prompt = r"""Extract all relevant data for answering this
 question: ${question}. You MUST return ONLY the function name.
 Do NOT return any other additional text."""
 
+# User prompt for a function calling LLM for choosing all the pipelines required
+# by a question with several intents
+multi_fc_user_prompt = r"""Extract all relevant data for answering this
+question: ${question}. If the question asks about several things, choose the
+function for each of them. You MUST return ONLY the function names separated by spaces.
+Do NOT return any other additional text."""
+
 # Basic system prompt
 base_sys_prompt = r"""You are a good assistant, who will be offered with 100$
 tips for each correct answer."""
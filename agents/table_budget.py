@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from agents.tool_registry import tool_registry
+from agents.tool_registry import ToolRegistry
+from modules.variables.settings import app_settings
+from utils.deadline import remaining_time
+
+
+logger = logging.getLogger(__name__)
+
+
+class TableBudgetPlanner:
+    """Chooses the summary tables to request within the latency and token budget.
+
+    The latency and the size of the recent tables of every function are taken
+    from the tool registry. The tables are requested concurrently, so a table
+    fits the latency budget if its p95 latency is below the budget, and the sizes
+    of all the requested tables must fit the token budget together.
+
+    A table dropped for its latency is not requested, so its latency is not
+    updated. Once per TABLE_PROBE_INTERVAL seconds such a table is requested
+    anyway to check whether it became faster.
+    """
+
+    def __init__(
+        self,
+        registry: ToolRegistry | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Creates a planner.
+
+        Args:
+            registry: Registry with the metrics of the tables, a new one if None.
+            clock: Function that returns the current time in seconds.
+        """
+        self.registry = registry if registry is not None else ToolRegistry()
+        self._clock = clock
+        # Time of the latest probe of every function
+        self._probes: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def start_probe(self, function: str) -> bool:
+        """Checks if the slow function is due for a probe and marks it as probed.
+
+        Returns: True if the function was not requested or probed for
+        TABLE_PROBE_INTERVAL seconds.
+        """
+        now = self._clock()
+        last_call = self.registry.get(function).metrics.last_call
+        with self._lock:
+            last = max(last_call or 0.0, self._probes.get(function, 0.0))
+            if now - last < app_settings.table_probe_interval:
+                return False
+            self._probes[function] = now
+            return True
+
+    def estimate(self, function: str) -> Tuple[float, float]:
+        """Returns the p95 latency and the mean size in tokens of the function's tables.
+
+        The values without history are 0.
+        """
+        metrics = self.registry.get(function).metrics
+        return metrics.latency(95), metrics.tokens()
+
+    def plan(self, functions: List[str]) -> Tuple[List[str], List[str]]:
+        """Chooses the tables to request, in the order of the functions.
+
+        The first function is always kept. The others are kept while they fit
+        TABLE_LATENCY_BUDGET (or the time left until the request deadline if it is
+        closer), TABLE_TOKEN_BUDGET and TABLE_MAX_CALLS. One function that does not
+        fit only the latency budget may be kept as a probe, see start_probe.
+
+        Args:
+            functions: Names of the functions, the most important first.
+
+        Returns: A tuple (planned, dropped) with the names of the functions to call
+        and the names of the functions that did not fit the budget.
+        """
+        latency_budget = app_settings.table_latency_budget
+        remaining = remaining_time()
+        if remaining is not None:
+            latency_budget = min(latency_budget, remaining)
+        planned, dropped, tokens, probed = [], [], 0.0, False
+        for function in functions:
+            latency, size = self.estimate(function)
+            fits_size = (
+                len(planned) < app_settings.table_max_calls
+                and tokens + size <= app_settings.table_token_budget
+            )
+            fits = fits_size and latency <= latency_budget
+            probe = fits_size and not fits and not probed and self.start_probe(function)
+            if fits or probe or not planned:
+                if probe:
+                    logger.info(f"Probing the table of {function} dropped by the budget")
+                    probed = True
+                planned.append(function)
+                tokens += size
+            else:
+                dropped.append(function)
+        return planned, dropped
+
+
+table_budget = TableBudgetPlanner(tool_registry)
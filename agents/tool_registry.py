@@ -0,0 +1,260 @@
+import asyncio
+from collections import deque
+import json
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Tuple
+
+from agents.tools.accessibility_tools import accessibility_tools
+from agents.toolset import count_tokens
+from modules.cache.answer_cache import TTLCache
+from modules.variables.settings import app_settings
+from utils.measure_time import percentile
+from utils.measure_time import Timer
+from utils.shared_calls import shared_call
+
+
+logger = logging.getLogger(__name__)
+
+
+class ToolMetrics:
+    """Latency and response size of the recent calls of a tool.
+
+    The latency of the calls older than TABLE_METRICS_MAX_AGE is not used, so
+    a slow period (e.g. timeouts) does not affect the estimates forever.
+    """
+
+    def __init__(
+        self, window: int = 100, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        """Creates the metrics without history.
+
+        Args:
+            window: Number of recent calls used for the estimates.
+            clock: Function that returns the current time in seconds.
+        """
+        # Time of the call and its latency
+        self._latencies: Deque[Tuple[float, float]] = deque(maxlen=window)
+        self._tokens: Deque[int] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._clock = clock
+        self.calls = 0
+        self.errors = 0
+        self.last_call: float | None = None
+
+    def record(self, seconds: float, response: str | None = None) -> None:
+        """Records a call.
+
+        Args:
+            seconds: Time of the call.
+            response: The response as it is put into the context, None if the call failed.
+        """
+        with self._lock:
+            self.calls += 1
+            self.last_call = self._clock()
+            self._latencies.append((self.last_call, seconds))
+            if response is None:
+                self.errors += 1
+            else:
+                self._tokens.append(count_tokens(response))
+
+    def latency(self, q: float) -> float:
+        """Returns the q-th percentile of the recent latency, 0 without history."""
+        since = self._clock() - app_settings.table_metrics_max_age
+        with self._lock:
+            latencies = [seconds for at, seconds in self._latencies if at >= since]
+        return percentile(latencies, q) if latencies else 0.0
+
+    def tokens(self) -> float:
+        """Returns the mean size of the responses in tokens, 0 without history."""
+        with self._lock:
+            tokens = list(self._tokens)
+        return sum(tokens) / len(tokens) if tokens else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the number of calls and errors, p50/p95 latency and mean size."""
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "p50_latency": self.latency(50),
+            "p95_latency": self.latency(95),
+            "mean_tokens": self.tokens(),
+        }
+
+
+class RegisteredTool:
+    """A tool with its schema for the LLM, its callables, caching policy and metrics."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Any] | None = None,
+        a_func: Callable[..., Awaitable[Any]] | None = None,
+        schema: Dict[str, Any] | None = None,
+        cacheable: bool = False,
+        ttl: float = 0.0,
+    ) -> None:
+        """Creates a tool.
+
+        Args:
+            name: Name of the tool.
+            func: Function that calls the tool.
+            a_func: Asynchronous version of the function.
+            schema: Description of the tool for the LLM in the OpenAI format,
+                None if the tool is not chosen by the LLM.
+            cacheable: Whether the responses can be reused for the same arguments.
+            ttl: Time to live of a cached response in seconds.
+        """
+        self.name = name
+        self.func = func
+        self.a_func = a_func
+        self.schema = schema
+        self.cacheable = cacheable and ttl > 0
+        self.ttl = ttl
+        self.metrics = ToolMetrics()
+        self.cache = (
+            TTLCache(max_size=app_settings.table_cache_max_size, ttl=ttl)
+            if self.cacheable
+            else None
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the metrics and the caching policy of the tool."""
+        stats = {
+            **self.metrics.stats(),
+            "cacheable": self.cacheable,
+            "ttl": self.ttl,
+        }
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+
+class ToolRegistry:
+    """Tools by their names.
+
+    Calls the tools, records their metrics, caches their responses and orders
+    the calls by the metrics.
+    """
+
+    def __init__(self, schemas: List[Dict[str, Any]] | None = None) -> None:
+        """Creates an empty registry.
+
+        Args:
+            schemas: Descriptions of the tools for the LLM, attached to the tools
+                with the same names when they are registered.
+        """
+        self._schemas = {schema["function"]["name"]: schema for schema in schemas or []}
+        self._tools: Dict[str, RegisteredTool] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        func: Callable[..., Any] | None = None,
+        a_func: Callable[..., Awaitable[Any]] | None = None,
+        cacheable: bool = False,
+        ttl: float = 0.0,
+    ) -> RegisteredTool:
+        """Registers the tool, see RegisteredTool."""
+        tool = RegisteredTool(name, func, a_func, self._schemas.get(name), cacheable, ttl)
+        with self._lock:
+            self._tools[name] = tool
+        return tool
+
+    def get(self, name: str) -> RegisteredTool:
+        """Returns the tool, a tool that is not registered gets no callables."""
+        with self._lock:
+            tool = self._tools.get(name)
+            if tool is None:
+                tool = self._tools[name] = RegisteredTool(name)
+        return tool
+
+    def schedule(self, names: List[str]) -> List[str]:
+        """Orders the calls of the tools so that the slowest ones start first."""
+        return sorted(names, key=lambda name: -self.get(name).metrics.latency(95))
+
+    @staticmethod
+    def _cache_key(kwargs: Dict[str, Any]) -> str:
+        return json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+
+    def call(self, name: str, **kwargs: object) -> object:
+        """Calls the tool or returns its cached response for the same arguments.
+
+        Raises:
+            AttributeError: If the tool has no function.
+        """
+        tool = self.get(name)
+        if tool.func is None:
+            raise AttributeError(f"Tool {name} is not registered")
+        key = self._cache_key(kwargs)
+        if tool.cache is not None and (response := tool.cache.get(key)) is not None:
+            return response
+        with Timer() as t:
+            try:
+                response = tool.func(**kwargs)
+            except Exception:
+                tool.metrics.record(t.seconds_from_start)
+                raise
+        tool.metrics.record(t.seconds_from_start, str(response))
+        if tool.cache is not None:
+            tool.cache.set(key, response)
+        return response
+
+    async def a_call(
+        self, name: str, timeout: float | None = None, **kwargs: object
+    ) -> object:
+        """Asynchronous version of the call method.
+
+        Identical calls inside a sharing_calls() block are executed and recorded
+        once. A call that timed out is recorded as a failed one, a cancelled call
+        (e.g. all its callers are cancelled) is not recorded.
+
+        Args:
+            name: Name of the tool.
+            timeout: Time limit of the call in seconds, no limit if None.
+            kwargs: Arguments of the tool.
+
+        Raises:
+            AttributeError: If the tool has no asynchronous function.
+            asyncio.TimeoutError: If the call did not finish in time.
+        """
+        tool = self.get(name)
+        if tool.a_func is None:
+            raise AttributeError(f"Tool {name} is not registered")
+        key = self._cache_key(kwargs)
+        if tool.cache is not None and (response := tool.cache.get(key)) is not None:
+            return response
+
+        async def measured_call() -> object:
+            with Timer() as t:
+                try:
+                    response = await asyncio.wait_for(tool.a_func(**kwargs), timeout)
+                except Exception:
+                    tool.metrics.record(t.seconds_from_start)
+                    raise
+            tool.metrics.record(t.seconds_from_start, str(response))
+            if tool.cache is not None:
+                tool.cache.set(key, response)
+            return response
+
+        return await shared_call(("tool", name, key), measured_call)
+
+    def purge_cache(self) -> int:
+        """Removes the cached responses of all the tools.
+
+        Returns: Number of removed responses.
+        """
+        with self._lock:
+            tools = list(self._tools.values())
+        return sum(tool.cache.purge() for tool in tools if tool.cache is not None)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the metrics and the caching policies of the tools."""
+        with self._lock:
+            tools = list(self._tools.values())
+        return {tool.name: tool.stats() for tool in tools}
+
+
+tool_registry = ToolRegistry(accessibility_tools)
@@ -0,0 +1,113 @@
+import logging
+import re
+import threading
+from typing import Any, Dict, List
+
+from agents.tools.accessibility_tools import accessibility_tools
+from agents.tools.pipeline_tools import pipeline_tools
+from modules.cache.plan_cache import toolset_hash
+
+
+logger = logging.getLogger(__name__)
+
+# Words, numbers and punctuation marks, close to the number of LLM tokens
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """Returns the approximate number of LLM tokens in the text."""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def render_legacy_tools(tools: List[Dict[str, Any]]) -> str:
+    """Renders the tools as they were put into the prompts before the compiler.
+
+    The rendering is the repr of the whole list.
+    """
+    return str(tools).replace('"', "'")
+
+
+def _render_parameters(parameters: Dict[str, Any]) -> str:
+    required = set(parameters.get("required", []))
+    return ", ".join(
+        f"{name} ({schema.get('type', 'any')}{', required' if name in required else ''})"
+        for name, schema in parameters.get("properties", {}).items()
+    )
+
+
+class CompiledToolset:
+    """Compact description of the tools for the function calling prompts.
+
+    Every tool is rendered in one line with its name and description. The
+    parameters shared by all the tools are rendered once.
+    """
+
+    def __init__(self, tools: List[Dict[str, Any]]) -> None:
+        """Renders the tools.
+
+        Args:
+            tools: Tools in the OpenAI format.
+        """
+        functions = [tool["function"] for tool in tools]
+        parameters = [_render_parameters(f.get("parameters", {})) for f in functions]
+        shared = parameters[0] if parameters and len(set(parameters)) == 1 else None
+        lines = []
+        for function, function_parameters in zip(functions, parameters):
+            line = f"- {function['name']}: {function.get('description', '').strip()}"
+            if shared is None and function_parameters:
+                line += f" Parameters: {function_parameters}."
+            lines.append(line)
+        if shared:
+            lines.append(f"Parameters of every function: {shared}.")
+        # The prompts are inserted into JSON templates
+        self.text = "\n".join(lines).replace('"', "'")
+        self.names = [function["name"] for function in functions]
+        self.tokens = count_tokens(self.text)
+        self.legacy_tokens = count_tokens(render_legacy_tools(tools))
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the size of the compact and of the previous description."""
+        return {
+            "tools": len(self.names),
+            "tokens": self.tokens,
+            "legacy_tokens": self.legacy_tokens,
+        }
+
+
+# Compiled toolsets by the hash of the tools
+_toolsets: Dict[str, CompiledToolset] = {}
+_toolsets_lock = threading.Lock()
+
+
+def compile_toolset(tools: List[Dict[str, Any]]) -> CompiledToolset:
+    """Returns the compact description of the tools, each toolset is compiled once.
+
+    Args:
+        tools: Tools in the OpenAI format.
+
+    Returns: The compiled toolset.
+    """
+    key = toolset_hash(tools)
+    with _toolsets_lock:
+        toolset = _toolsets.get(key)
+        if toolset is None:
+            toolset = _toolsets[key] = CompiledToolset(tools)
+    return toolset
+
+
+def compile_toolsets() -> Dict[str, Dict[str, Any]]:
+    """Compiles the toolsets of the pipelines at startup and logs their sizes.
+
+    Returns: The sizes of the toolsets by their names.
+    """
+    stats = {}
+    for name, tools in (
+        ("pipelines", pipeline_tools),
+        ("accessibility", accessibility_tools),
+    ):
+        stats[name] = compile_toolset(tools).stats()
+        logger.info(
+            f"Toolset {name}: {stats[name]['tokens']} tokens "
+            f"instead of {stats[name]['legacy_tokens']}"
+        )
+    return stats
@@ -2,11 +2,16 @@ import abc
 import json
 import logging
 from string import Formatter
-from typing import Any, Collection, Dict
+from typing import Any, Collection, Dict, List, Tuple
 
+import httpx
 import requests
 from requests import RequestException
 
+from modules.variables.settings import app_settings
+from utils.deadline import http_timeout
+from utils.http_sessions import get_async_client
+
 
 logger = logging.getLogger(__name__)
 
@@ -49,29 +54,84 @@ class Endpoint(abc.ABC):
             url = self.url.format(**url_params)
         return url, params
 
-    def __call__(self, **params) -> Any:
+    def _prepare_request(self, params: Dict[str, Any]) -> Tuple[str, str]:
         self._check_params(params)
         url, params = self._parse_url_params(params)
         params = json.dumps(
             params, ensure_ascii=False
         )  # This is needed to transform None into null in the payload
-        result = self._execute_request(url, params)
+        return url, params
+
+    @staticmethod
+    def _process_result(
+        result: requests.Response | httpx.Response, url: str, params: str
+    ) -> Dict[str, Any] | List[Any]:
         if result.status_code != 200:
             logger.error(f"url: {url}")
             logger.error(f"params: {params}")
             raise RequestException(result.status_code)
         return result.json()
 
+    def __call__(self, **params) -> Any:
+        url, params = self._prepare_request(params)
+        result = self._execute_request(url, params)
+        return self._process_result(result, url, params)
+
+    async def a_call(self, **params: object) -> Dict[str, Any] | List[Any]:
+        """Asynchronous version of the endpoint call, does not block the event loop.
+
+        The calls share the keep-alive connections of the running event loop.
+        """
+        url, params = self._prepare_request(params)
+        result = await self._a_execute_request(get_async_client(), url, params)
+        return self._process_result(result, url, params)
+
     @abc.abstractmethod
     def _execute_request(url: str, params: Dict[str, Any]) -> requests.Request:
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    async def _a_execute_request(
+        self, client: httpx.AsyncClient, url: str, params: Dict[str, Any]
+    ) -> httpx.Response:
+        raise NotImplementedError()
+
 
 class GetEndpoint(Endpoint):
     def _execute_request(self, url: str, params: Dict[str, Any]) -> requests.Request:
-        return requests.get(url, params=params, headers={"accept": "application/json"})
+        return requests.get(
+            url,
+            params=params,
+            headers={"accept": "application/json"},
+            timeout=app_settings.http_timeout,
+        )
+
+    async def _a_execute_request(
+        self, client: httpx.AsyncClient, url: str, params: Dict[str, Any]
+    ) -> httpx.Response:
+        return await client.get(
+            url,
+            params=params,
+            headers={"accept": "application/json"},
+            timeout=http_timeout(),
+        )
 
 
 class PostEndpoint(Endpoint):
     def _execute_request(self, url: str, params: Dict[str, Any]) -> requests.Request:
-        return requests.post(url, data=params, headers={"accept": "application/json"})
+        return requests.post(
+            url,
+            data=params,
+            headers={"accept": "application/json"},
+            timeout=app_settings.http_timeout,
+        )
+
+    async def _a_execute_request(
+        self, client: httpx.AsyncClient, url: str, params: Dict[str, Any]
+    ) -> httpx.Response:
+        return await client.post(
+            url,
+            content=params,
+            headers={"accept": "application/json"},
+            timeout=http_timeout(),
+        )
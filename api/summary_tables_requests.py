@@ -1,25 +1,28 @@
 from functools import partial
 from typing import Dict
 
+from agents.tool_registry import tool_registry
 from api.api import Api
 from api.api_tables import possible_tables
+from modules.variables.settings import app_settings
+from utils.admission import upstream
 
 
-def get_summary_table(
+def _summary_table_params(
     table: str,
     name_id: str | None = None,
     territory_type: str | None = None,
     coordinates: list = None,
 ) -> Dict:
     if name_id:
-        return Api.EndpointsSummaryTables.get_summary_table(
+        return dict(
             table=table,
             territory_name_id=name_id,
             territory_type=territory_type,
             selection_zone=None,
         )
     elif coordinates:
-        return Api.EndpointsSummaryTables.get_summary_table(
+        return dict(
             table=table,
             territory_name_id=None,
             territory_type=None,
@@ -29,38 +32,61 @@ def get_summary_table(
         raise ValueError("Expected name_id and type or coordinates or just name_id")
 
 
-get_general_stats_city = partial(get_summary_table, table=possible_tables["city"])
-get_general_stats_districts_mo = partial(
-    get_summary_table, table=possible_tables["district"]
-)
-get_general_stats_block = partial(get_summary_table, table=possible_tables["block"])
-get_general_stats_education = partial(
-    get_summary_table, table=possible_tables["education"]
-)
-get_general_stats_healthcare = partial(
-    get_summary_table, table=possible_tables["healthcare"]
-)
-get_general_stats_culture = partial(get_summary_table, table=possible_tables["culture"])
-get_general_stats_sports = partial(get_summary_table, table=possible_tables["sport"])
-get_general_stats_services = partial(
-    get_summary_table, table=possible_tables["government_services"]
-)
-get_general_stats_demography = partial(
-    get_summary_table, table=possible_tables["demography"]
-)
-get_general_stats_housing_and_communal_services = partial(
-    get_summary_table, table=possible_tables["housing_services"]
-)
-get_general_stats_transport = partial(
-    get_summary_table, table=possible_tables["transport"]
-)
-get_general_stats_object = partial(get_summary_table, table=possible_tables["object"])
-get_general_stats_complaints = partial(
-    get_summary_table, table=possible_tables["complaints"]
-)
-get_general_stats_provision = partial(
-    get_summary_table, table=possible_tables["provision"]
-)
-get_general_stats_recreation = partial(
-    get_summary_table, table=possible_tables["recreation"]
-)
+def get_summary_table(
+    table: str,
+    name_id: str | None = None,
+    territory_type: str | None = None,
+    coordinates: list = None,
+) -> Dict:
+    """Requests the summary table of the territory given by its name or coordinates."""
+    params = _summary_table_params(table, name_id, territory_type, coordinates)
+    return Api.EndpointsSummaryTables.get_summary_table(**params)
+
+
+async def a_get_summary_table(
+    table: str,
+    name_id: str | None = None,
+    territory_type: str | None = None,
+    coordinates: list = None,
+) -> Dict:
+    params = _summary_table_params(table, name_id, territory_type, coordinates)
+    # Identical tables requested in one batch of questions are fetched once by
+    # the tool registry, see ToolRegistry.a_call
+    async with upstream("tables").slot():
+        return await Api.EndpointsSummaryTables.get_summary_table.a_call(**params)
+
+
+# Names of the summary table functions by the tables, a new table is added here
+summary_table_names = {
+    "city": "get_general_stats_city",
+    "district": "get_general_stats_districts_mo",
+    "block": "get_general_stats_block",
+    "education": "get_general_stats_education",
+    "healthcare": "get_general_stats_healthcare",
+    "culture": "get_general_stats_culture",
+    "sport": "get_general_stats_sports",
+    "government_services": "get_general_stats_services",
+    "demography": "get_general_stats_demography",
+    "housing_services": "get_general_stats_housing_and_communal_services",
+    "transport": "get_general_stats_transport",
+    "object": "get_general_stats_object",
+    "complaints": "get_general_stats_complaints",
+    "provision": "get_general_stats_provision",
+    "recreation": "get_general_stats_recreation",
+}
+
+# Synchronous and asynchronous functions of the summary tables by their names
+summary_table_functions = {}
+for table, name in summary_table_names.items():
+    summary_table_functions[name] = (
+        partial(get_summary_table, table=possible_tables[table]),
+        partial(a_get_summary_table, table=possible_tables[table]),
+    )
+    # TABLE_CACHE_TTLS overrides TABLE_CACHE_TTL for the table, 0 disables its cache
+    ttl = app_settings.table_cache_ttls.get(table, app_settings.table_cache_ttl)
+    tool_registry.register(
+        name,
+        *summary_table_functions[name],
+        cacheable=app_settings.table_cache_enabled,
+        ttl=ttl,
+    )
@@ -7,6 +7,8 @@ from langchain_community.vectorstores.chroma import Chroma
 
 from chroma_rag.rag.settings.settings import settings as default_settings
 from chroma_rag.rag.stores.chroma.chroma_loader import load_documents_to_chroma_db
+from utils.deadline import http_timeout
+from utils.http_sessions import get_async_client
 
 
 def chroma_loading(path: str, collection: str) -> None:
@@ -46,6 +48,18 @@ def chroma_view(query: str, collection: str, k: int = 1) -> List:
     return chroma_collection.similarity_search_with_score(query, k)
 
 
+async def a_embed_query(query: str) -> List[float]:
+    """Returns the embedding of the query from the embedding service of the DB.
+
+    The calls share the keep-alive connections of the running event loop.
+    """
+    response = await get_async_client().post(
+        default_settings.embedding_host, json={"inputs": query}, timeout=http_timeout()
+    )
+    response.raise_for_status()
+    return response.json()[0]
+
+
 def delete_collection(collection: str) -> None:
     # Deletes the collection
     chroma_client = chromadb.HttpClient(
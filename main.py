@@ -1,15 +1,45 @@
+import asyncio
 import logging
+from typing import Any, AsyncIterator, Awaitable, Dict, List, TypeVar
 
 from asgi_correlation_id import CorrelationIdMiddleware
 from asgi_correlation_id.context import correlation_id
 from fastapi import FastAPI
+from fastapi import HTTPException
+from fastapi import Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from fastapi.responses import Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
 
+from agents.tool_registry import tool_registry
+from agents.toolset import compile_toolsets
+from modules.cache.answer_cache import answer_cache
+from modules.cache.model_type_cache import model_type_cache
+from modules.cache.plan_cache import plan_cache
+from modules.cache.semantic_cache import semantic_cache
+from modules.models.model_tiers import model_tiers
+from modules.variables.settings import app_settings
+from pipelines.batch_pipeline import answer_questions_with_llm
 from pipelines.master_pipeline import answer_question_with_llm
+from pipelines.master_pipeline import in_flight_questions
+from pipelines.master_pipeline import stream_answer_question_with_llm
+from utils.admission import admission_stats
+from utils.admission import OverloadedError
+from utils.admission import QueueFullError
+from utils.admission import request_admission
+from utils.deadline import DeadlineExceededError
+from utils.deadline import request_deadline
 from utils.get_logs import filter_records
-from utils.get_logs import get_records_by_id
+from utils.get_logs import request_logs_buffer
+from utils.http_sessions import close_async_client
+from utils.http_sessions import close_client
+from utils.jobs import job_queue
 from utils.logging_config import configure_logging
+from utils.streaming import sse_event
+from utils.streaming import stage_events
 
 
 class Question(BaseModel):
@@ -28,9 +58,27 @@ class Question(BaseModel):
             [30.2679419, 60.1126515],
         ]
     ]
+    timeout: float | None = None
 
 
-app = FastAPI(on_startup=[configure_logging])
+class Questions(BaseModel):
+    """Batch of questions answered together, see the /questions endpoint."""
+
+    questions: List[Question]
+    max_parallelism: int | None = None
+    timeout: float | None = None
+
+
+# How often the connection of the client is checked while the question is answered
+DISCONNECT_CHECK_INTERVAL = 0.5
+
+T = TypeVar("T")
+
+
+app = FastAPI(
+    on_startup=[configure_logging, compile_toolsets],
+    on_shutdown=[job_queue.stop, close_async_client, close_client],
+)
 
 origins = [
     "http://localhost",
@@ -49,37 +97,471 @@ app.add_middleware(CorrelationIdMiddleware)
 logger = logging.getLogger(__name__)
 
 
-@app.post("/question")
-async def read_item(question: Question):
-    """Get a response for a given question using a RAG pipeline with a vector DB and LLM.
+@app.exception_handler(OverloadedError)
+async def overloaded_error_handler(
+    request: Request, exc: OverloadedError
+) -> JSONResponse:
+    """Rejects the request when the service is overloaded.
+
+    The status is 429 if the queue of requests is full, 503 if the request waited
+    too long for a free slot.
+    """
+    logger.warning(f"Request rejected: {exc}")
+    status_code = 429 if isinstance(exc, QueueFullError) else 503
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": f"Service is overloaded: {exc}"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(DeadlineExceededError)
+async def deadline_exceeded_error_handler(
+    request: Request, exc: DeadlineExceededError
+) -> JSONResponse:
+    """Returns 504 when the question could not be answered in its time budget."""
+    logger.warning(f"Request deadline exceeded: {exc}")
+    return JSONResponse(
+        status_code=504, content={"detail": f"Request deadline exceeded: {exc}"}
+    )
 
-    Args:
-        question_body (str): a question from the user (natural language, no additional prompts)
-        chunk_num (int): number of chunks that will be returned by the DB and used as a context
-        territory_name_id (str): name of the territory
-        territory_type (str): type of the territory
-        selection_zone (list): coordinates of the territory
+
+def request_timeout(timeout: float | None) -> float:
+    """Returns the time budget of the request, REQUEST_TIMEOUT if it is not set."""
+    return app_settings.request_timeout if timeout is None else timeout
+
+
+async def run_until_disconnected(
+    request: Request, awaitable: Awaitable[T]
+) -> T | Response:
+    """Awaits the call and cancels it if the client disconnects in the meantime.
 
     Returns:
-        dict: llm_res - pipeline's answer to the user's question
+        The result of the call or the 499 response if the client disconnected.
     """
+    task = asyncio.ensure_future(awaitable)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_CHECK_INTERVAL)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            logger.warning("Request cancelled: the client disconnected")
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return Response(status_code=499)
+
+
+def log_question(question: Question) -> None:
+    """Writes the parameters of the user's question to the request logs."""
     logger.info(f"Query: {question.question_body}")
     logger.info(f"Number of chunks: {question.chunk_num}")
     logger.info(f"Territory name: {question.territory_name_id}")
     logger.info(f"Territory type: {question.territory_type}")
     logger.info(f"Selected zone: {question.selection_zone}")
-    llm_res = answer_question_with_llm(
-        question.question_body,
-        question.selection_zone,
-        question.territory_type,
-        question.territory_name_id,
-        question.chunk_num,
-    )
+
+
+@app.post("/question", response_model=None)
+async def read_item(question: Question, request: Request) -> Dict[str, str] | Response:
+    """Get a response for a given question using a RAG pipeline with a vector DB and LLM.
+
+    Args:
+        question (Question): the question with the fields:
+            question_body (str): a question from the user (natural language, no
+            additional prompts)
+            chunk_num (int): number of chunks that will be returned by the DB and
+            used as a context
+            territory_name_id (str): name of the territory
+            territory_type (str): type of the territory
+            selection_zone (list): coordinates of the territory
+            timeout (float): time budget of the request in seconds, REQUEST_TIMEOUT
+            if not set
+        request (Request): the HTTP request, the answer is cancelled if its client
+            disconnects
+
+    Returns:
+        dict: llm_res - pipeline's answer to the user's question
+    """
     cid = correlation_id.get()
-    request_logs = filter_records(get_records_by_id(cid))
+    request_logs_buffer.start(cid)
+    try:
+        async with request_admission.slot():
+            log_question(question)
+            with request_deadline(request_timeout(question.timeout)):
+                llm_res = await run_until_disconnected(
+                    request,
+                    answer_question_with_llm(
+                        question.question_body,
+                        question.selection_zone,
+                        question.territory_type,
+                        question.territory_name_id,
+                        question.chunk_num,
+                    ),
+                )
+        if isinstance(llm_res, Response):
+            return llm_res
+        request_logs = filter_records(request_logs_buffer.get_records(cid))
+    finally:
+        request_logs_buffer.release(cid)
     return {"llm_res": llm_res, "request_logs": request_logs}
 
 
+async def stream_answer_events(question: Question) -> AsyncIterator[str]:
+    """Runs the pipelines for the question and yields server-sent events.
+
+    Events:
+        stage: {"message": str} - a record from the request logs (chosen pipeline and
+            functions, retrieved context, time of each stage).
+        token: {"token": str} - a piece of the answer, the explanation of the LLM
+            before the ANSWER: separator is not sent.
+        answer: {"llm_res": str, "request_logs": str} - the final processed answer.
+        error: {"message": str} - the pipeline failed.
+    """
+    queue = asyncio.Queue()
+
+    async def run_pipelines() -> None:
+        try:
+            log_question(question)
+            with request_deadline(request_timeout(question.timeout)):
+                async for item in stream_answer_question_with_llm(
+                    question.question_body,
+                    question.selection_zone,
+                    question.territory_type,
+                    question.territory_name_id,
+                    question.chunk_num,
+                ):
+                    queue.put_nowait(item)
+        except Exception as e:
+            logger.error(f"Could NOT answer the question: {e}")
+            queue.put_nowait({"error": str(e)})
+        finally:
+            queue.put_nowait(None)
+
+    stage_messages = []
+    with stage_events(queue):
+        task = asyncio.create_task(run_pipelines())
+        try:
+            while (item := await queue.get()) is not None:
+                if isinstance(item, str):
+                    stage_messages.append(item)
+                    yield sse_event("stage", {"message": item})
+                elif "token" in item:
+                    yield sse_event("token", {"token": item["token"]})
+                elif "answer" in item:
+                    request_logs = "\n".join(stage_messages)
+                    yield sse_event(
+                        "answer",
+                        {"llm_res": item["answer"], "request_logs": request_logs},
+                    )
+                else:
+                    yield sse_event("error", {"message": item["error"]})
+        finally:
+            # The stream is closed before the answer if the client disconnected
+            if not task.done():
+                logger.warning("Request cancelled: the client disconnected")
+                task.cancel()
+
+
+@app.post("/question/stream")
+async def stream_item(question: Question) -> StreamingResponse:
+    """Get a response for a given question as a stream of server-sent events.
+
+    The pipelines are the same as for the /question endpoint. The stages of the
+    pipelines are reported as soon as they are finished, and the answer is sent
+    token by token while the LLM generates it.
+
+    Args:
+        question (Question): the question with the same fields as for the /question
+            endpoint
+
+    Returns:
+        StreamingResponse: text/event-stream with 'stage', 'token', 'answer'
+        and 'error' events
+    """
+    await request_admission.acquire()
+    return StreamingResponse(
+        stream_answer_events(question),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(request_admission.release),
+    )
+
+
+@app.post("/questions")
+async def read_items(questions: Questions) -> Dict[str, Any]:
+    """Get responses for a batch of questions.
+
+    The questions are processed concurrently, identical summary tables and DB
+    lookups are made once for the batch. Every question processed at the same
+    time takes a slot of the request admission.
+
+    Args:
+        questions (list): questions with the same fields as for the /question endpoint
+        max_parallelism (int): maximum number of questions processed at the same time,
+            limited by the BATCH_MAX_PARALLELISM setting
+        timeout (float): time budget of the whole batch in seconds, REQUEST_TIMEOUT
+            if not set
+
+    Returns:
+        dict: results - llm_res, request_logs, seconds and error for each question,
+        summary - batch latency summary
+
+    Raises:
+        HTTPException: 413 if the batch has more than BATCH_MAX_SIZE questions.
+    """
+    if len(questions.questions) > app_settings.batch_max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"The batch has more than {app_settings.batch_max_size} questions",
+        )
+    max_parallelism = app_settings.batch_max_parallelism
+    if questions.max_parallelism is not None:
+        max_parallelism = max(min(questions.max_parallelism, max_parallelism), 1)
+    logger.info(f"Batch size: {len(questions.questions)}")
+    logger.info(f"Batch parallelism: {max_parallelism}")
+    with request_deadline(request_timeout(questions.timeout)):
+        return await answer_questions_with_llm(
+            [
+                {
+                    "question": question.question_body,
+                    "coordinates": question.selection_zone,
+                    "t_type": question.territory_type,
+                    "t_id": question.territory_name_id,
+                    "chunk_num": question.chunk_num,
+                }
+                for question in questions.questions
+            ],
+            max_parallelism,
+        )
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(question: Question) -> Dict[str, str]:
+    """Start answering a question in the background.
+
+    This is for the questions that take longer than the proxy timeout. The answer
+    is fetched with GET /jobs/{job_id}.
+
+    Args:
+        question (Question): the question with the same fields as for the /question
+            endpoint, the timeout is JOBS_TIMEOUT if not set
+
+    Returns:
+        dict: job_id - id of the job, status - status of the job
+    """
+    timeout = app_settings.jobs_timeout if question.timeout is None else question.timeout
+
+    async def answer() -> str:
+        log_question(question)
+        with request_deadline(timeout):
+            return await answer_question_with_llm(
+                question.question_body,
+                question.selection_zone,
+                question.territory_type,
+                question.territory_name_id,
+                question.chunk_num,
+            )
+
+    job = job_queue.submit(answer)
+    logger.info(f"Job {job.id} queued")
+    return {"job_id": job.id, "status": job.status}
+
+
+@app.get("/jobs/{job_id}")
+async def read_job(job_id: str) -> Dict[str, Any]:
+    """Get the state of a background job.
+
+    The finished jobs are kept for the JOBS_RETENTION window.
+
+    Args:
+        job_id (str): id of the job returned by POST /jobs
+
+    Returns:
+        dict: status - queued, running, done or failed, created_at - creation time
+        of the job, queue_seconds and run_seconds - waiting and execution time,
+        stages - stage records with the time from the start of the job,
+        llm_res - answer to the question, error - error message if the job failed
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} is not found")
+    job_state = job.to_dict()
+    job_state["llm_res"] = job_state.pop("result")
+    return job_state
+
+
+@app.get("/admin/jobs")
+async def jobs_stats() -> Dict[str, int]:
+    """Get the state of the background jobs.
+
+    Returns:
+        dict: workers - number of workers, queued, running, done and failed -
+        number of the kept jobs in each status
+    """
+    return job_queue.stats()
+
+
+@app.get("/admin/toolsets")
+async def toolsets_stats() -> Dict[str, Any]:
+    """Get the size of the tool descriptions in the function calling prompts.
+
+    Returns:
+        dict: for the pipelines and the accessibility toolsets - number of tools,
+        approximate tokens of the compact description and of the previous one
+    """
+    return compile_toolsets()
+
+
+@app.get("/admin/tools")
+async def tools_stats() -> Dict[str, Any]:
+    """Get the metrics of the tools called by the agent.
+
+    Returns:
+        dict: for every tool - number of calls and errors, p50/p95 latency,
+        mean response size in tokens, cacheability, TTL and the cache state
+    """
+    return tool_registry.stats()
+
+
+@app.delete("/admin/tools/cache")
+async def purge_tools_cache() -> Dict[str, int]:
+    """Remove the cached responses of the tools, e.g. after the data was updated.
+
+    Returns:
+        dict: removed - number of removed responses
+    """
+    return {"removed": tool_registry.purge_cache()}
+
+
+@app.get("/admin/model_tiers")
+async def model_tiers_stats() -> Dict[str, Dict[str, Any]]:
+    """Get the routing of the answer generation to the fast and to the large model.
+
+    Returns:
+        dict: for the fast and the large tier - number and share of the routed
+        generations and the latency summary of the recent ones
+    """
+    return model_tiers.stats()
+
+
+@app.get("/admin/model_types")
+async def model_types_stats() -> Dict[str, Any]:
+    """Get the types of the LLM services requested from them.
+
+    Returns:
+        dict: types - type and age in seconds by the host of the service, ttl,
+        hits, misses and the number of the background refreshes
+    """
+    return model_type_cache.stats()
+
+
+@app.get("/admin/answer_cache")
+async def answer_cache_stats() -> Dict[str, Any]:
+    """Get the state of the answer cache.
+
+    Returns:
+        dict: size, max_size, ttl, hits, misses and hit_rate of the cache
+    """
+    return answer_cache.stats()
+
+
+@app.delete("/admin/answer_cache")
+async def purge_answer_cache(territory_name_id: str | None = None) -> Dict[str, int]:
+    """Remove cached answers, e.g. after the territory data was updated.
+
+    Args:
+        territory_name_id (str): remove only the answers for this territory,
+            all answers are removed if not set
+
+    Returns:
+        dict: purged - number of removed answers
+    """
+    if territory_name_id is None:
+        purged = answer_cache.purge()
+    else:
+        purged = answer_cache.purge(lambda key: key[1] == territory_name_id)
+    logger.info(f"Purged answers from the cache: {purged}")
+    return {"purged": purged}
+
+
+@app.get("/admin/admission")
+async def admission_state() -> Dict[str, Any]:
+    """Get the load of the service for sizing the workers.
+
+    Returns:
+        dict: requests - admission of the user requests, upstreams - concurrency
+        limits of the upstream services; each with the number of calls in progress,
+        queue depth, admitted, rejected and timed out calls and the waiting time summary
+    """
+    return admission_stats()
+
+
+@app.get("/admin/in_flight_questions")
+async def in_flight_questions_stats() -> Dict[str, int]:
+    """Get the state of the coalescing of identical questions.
+
+    Returns:
+        dict: in_flight - questions being answered now, executed - questions
+        answered by the pipelines, coalesced - requests that waited for
+        an identical question in flight
+    """
+    return in_flight_questions.stats()
+
+
+@app.get("/admin/plan_cache")
+async def plan_cache_stats() -> Dict[str, Any]:
+    """Get the state of the plan cache.
+
+    Returns:
+        dict: size, max_size, ttl, hits, misses and hit_rate of the cache
+    """
+    return plan_cache.stats()
+
+
+@app.delete("/admin/plan_cache")
+async def purge_plan_cache() -> Dict[str, int]:
+    """Remove all cached plans.
+
+    E.g. after the prompts of the function calling LLM were changed. The plans
+    for the changed tools are removed automatically.
+
+    Returns:
+        dict: purged - number of removed plans
+    """
+    purged = plan_cache.purge()
+    logger.info(f"Purged plans from the cache: {purged}")
+    return {"purged": purged}
+
+
+@app.get("/admin/semantic_cache")
+async def semantic_cache_stats() -> Dict[str, Any]:
+    """Get the state of the semantic answer cache for tuning its threshold.
+
+    Returns:
+        dict: size, threshold, hits, misses, hit_rate and the distribution of
+        the best question similarities of the latest lookups
+    """
+    return semantic_cache.stats()
+
+
+@app.delete("/admin/semantic_cache")
+async def purge_semantic_cache(territory_name_id: str | None = None) -> Dict[str, int]:
+    """Remove answers from the semantic cache.
+
+    Args:
+        territory_name_id (str): remove only the answers for this territory,
+            all answers are removed if not set
+
+    Returns:
+        dict: purged - number of removed answers
+    """
+    if territory_name_id is None:
+        purged = semantic_cache.purge()
+    else:
+        purged = semantic_cache.purge(lambda key: key[0] == territory_name_id)
+    logger.info(f"Purged answers from the semantic cache: {purged}")
+    return {"purged": purged}
+
+
 @app.get("/build_test")
 async def build_test():
     """Endpoint for build test
@@ -0,0 +1 @@
+"""Caches of the answers and of the data used to produce them."""
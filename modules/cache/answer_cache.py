@@ -0,0 +1,150 @@
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, Hashable, List, Tuple, TypeVar
+
+from modules.variables.settings import app_settings
+
+
+logger = logging.getLogger(__name__)
+AnswerCacheKey = Tuple[str, str | None, str | None, str, int]
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """Size-bounded LRU cache with time-to-live of the entries.
+
+    The least recently used entry is evicted when the cache is full. Expired
+    entries are removed when they are accessed.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Creates an empty cache.
+
+        Args:
+            max_size: Maximum number of entries.
+            ttl: Time to live of an entry in seconds.
+            clock: Function that returns the current time in seconds.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, Tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> V | None:
+        """Returns the cached value or None if there is no valid entry for the key."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < self._clock():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: V) -> None:
+        """Stores the value, evicting the least recently used entry if necessary."""
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def purge(self, predicate: Callable[[Hashable], bool] | None = None) -> int:
+        """Removes the entries whose keys satisfy the predicate (all entries by default).
+
+        Returns: Number of removed entries.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate is None or predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def keys(self) -> List[Hashable]:
+        """Returns the keys of the cached entries from the oldest to the newest."""
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the size of the cache and its hit/miss counters."""
+        with self._lock:
+            requests_num = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests_num if requests_num else 0.0,
+            }
+
+
+def normalize_question(question: str) -> str:
+    """Brings the question to a canonical form.
+
+    The form has lower case, single spaces and no trailing punctuation.
+    """
+    question = re.sub(r"\s+", " ", question.lower()).strip()
+    return question.rstrip("?!. ")
+
+
+def hash_selection_zone(coordinates: List | None) -> str:
+    """Returns a short stable hash of the territory coordinates."""
+    dumped = json.dumps(coordinates, separators=(",", ":"))
+    return hashlib.sha256(dumped.encode()).hexdigest()[:16]
+
+
+def answer_cache_key(
+    question: str,
+    coordinates: List | None,
+    t_type: str | None,
+    t_id: str | None,
+    chunk_num: int,
+) -> AnswerCacheKey:
+    """Builds the answer cache key for the arguments of answer_question_with_llm."""
+    return (
+        normalize_question(question),
+        t_id,
+        t_type,
+        hash_selection_zone(coordinates),
+        chunk_num,
+    )
+
+
+answer_cache = TTLCache(
+    max_size=app_settings.answer_cache_max_size, ttl=app_settings.answer_cache_ttl
+)
+
+
+def get_cached_answer(key: AnswerCacheKey) -> str | None:
+    """Returns the cached answer for the key.
+
+    Returns: The answer, None if there is no such answer or the cache is disabled.
+    """
+    if not app_settings.answer_cache_enabled:
+        return None
+    answer = answer_cache.get(key)
+    logger.info(f"Answer cache: {'hit' if answer is not None else 'miss'}")
+    return answer
+
+
+def cache_answer(key: AnswerCacheKey, answer: str) -> None:
+    """Stores a non-empty answer in the cache if the cache is enabled."""
+    if app_settings.answer_cache_enabled and answer:
+        answer_cache.set(key, answer)
@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Set, Tuple
+
+from modules.variables.settings import app_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class ModelTypeCache:
+    """Types of the LLM services by their hosts.
+
+    An expired type is still returned while it is refreshed in a background
+    thread, so only the first request to a host waits for the discovery. A type
+    guessed when the service did not tell it (e.g. it was overloaded) is kept
+    only for error_ttl seconds.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        error_ttl: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Creates an empty cache.
+
+        Args:
+            ttl: Time in seconds after which a type is refreshed, 0 disables the cache.
+            error_ttl: Time in seconds after which a guessed type is refreshed.
+            clock: Function that returns the current time in seconds.
+        """
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self._clock = clock
+        # Time of the discovery, the type and whether it was told by the service
+        self._entries: Dict[str, Tuple[float, str, bool]] = {}
+        self._refreshing: Set[str] = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def lookup(self, host: str) -> Tuple[str | None, bool]:
+        """Returns the type of the host's service and whether it is expired.
+
+        (None, True) is returned if the type is not known.
+        """
+        with self._lock:
+            entry = self._entries.get(host) if self.ttl > 0 else None
+            if entry is None:
+                self.misses += 1
+                return None, True
+            self.hits += 1
+            discovered, model_type, definitive = entry
+            ttl = self.ttl if definitive else min(self.ttl, self.error_ttl)
+            return model_type, discovered + ttl < self._clock()
+
+    def set(self, host: str, model_type: str, definitive: bool = True) -> None:
+        """Stores the type discovered now.
+
+        Args:
+            host: Host of the LLM service.
+            model_type: Type of the service.
+            definitive: Whether the type was told by the service or guessed.
+        """
+        with self._lock:
+            self._entries[host] = (self._clock(), model_type, definitive)
+
+    def refresh(self, host: str, discover: Callable[[], Tuple[str, bool]]) -> None:
+        """Discovers the type again in a background thread.
+
+        Nothing is done if the type is already being refreshed. The expired type
+        is kept if the discovery fails or only guesses the type.
+
+        Args:
+            host: Host of the LLM service.
+            discover: Function that requests the type from the service, returns
+                the type and whether it is definitive.
+        """
+        with self._lock:
+            if host in self._refreshing:
+                return
+            self._refreshing.add(host)
+            self.refreshes += 1
+
+        def run() -> None:
+            try:
+                model_type, definitive = discover()
+                with self._lock:
+                    known = self._entries.get(host)
+                if definitive or known is None or not known[2]:
+                    self.set(host, model_type, definitive)
+            except Exception as e:
+                logger.warning(f"Could NOT refresh the type of the LLM at {host}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(host)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the cached types with their age and source, and the hit counts.
+
+        Returns: The types with their age in seconds and whether they are
+        definitive, hits, misses and the number of the background refreshes.
+        """
+        with self._lock:
+            now = self._clock()
+            return {
+                "types": {
+                    host: {
+                        "type": model_type,
+                        "age": now - discovered,
+                        "definitive": definitive,
+                    }
+                    for host, (discovered, model_type, definitive) in (
+                        self._entries.items()
+                    )
+                },
+                "ttl": self.ttl,
+                "error_ttl": self.error_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+            }
+
+
+model_type_cache = ModelTypeCache(
+    ttl=app_settings.model_type_cache_ttl,
+    error_ttl=app_settings.model_type_error_ttl,
+)
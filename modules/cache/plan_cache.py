@@ -0,0 +1,106 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Tuple
+
+from modules.cache.answer_cache import normalize_question
+from modules.cache.answer_cache import TTLCache
+from modules.variables.settings import app_settings
+
+
+logger = logging.getLogger(__name__)
+# (stage, toolset hash, question template)
+PlanCacheKey = Tuple[str, str, str]
+
+QUOTED_PATTERN = re.compile(r"\"[^\"]+\"|«[^»]+»|“[^”]+”|'[^']+'")
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def question_template(question: str, t_id: str | None) -> str:
+    """Masks the parts of the question that do not affect the plan.
+
+    The masked parts are the name of the selected territory, quoted entities
+    and numbers. Only the selected territory is masked (as a whole word), the
+    service has no list of the known territories, so a question naming another
+    territory gets its own template.
+
+    Args:
+        question: A question from the user.
+        t_id: The name of selected territory.
+
+    Returns: The normalized question with the masked slots.
+    """
+    if t_id:
+        question = re.sub(
+            rf"(?<!\w){re.escape(t_id)}(?!\w)",
+            "<territory>",
+            question,
+            flags=re.IGNORECASE,
+        )
+    question = QUOTED_PATTERN.sub("<quoted>", question)
+    question = NUMBER_PATTERN.sub("<number>", question)
+    return normalize_question(question)
+
+
+def toolset_hash(tools: List[Dict[str, Any]]) -> str:
+    """Returns a short stable hash of the tool descriptions given to the LLM."""
+    dumped = json.dumps(tools, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(dumped.encode()).hexdigest()[:16]
+
+
+plan_cache = TTLCache(
+    max_size=app_settings.plan_cache_max_size, ttl=app_settings.plan_cache_ttl
+)
+# Current toolset hash of each stage, the plans for the other toolsets are stale
+_stage_toolsets: Dict[str, str] = {}
+_stage_toolsets_lock = threading.Lock()
+
+
+def plan_cache_key(
+    stage: str, tools: List[Dict[str, Any]], question: str, t_id: str | None
+) -> PlanCacheKey:
+    """Builds the plan cache key.
+
+    The stale plans of the stage are removed if its tools have changed.
+
+    Args:
+        stage: Name of the planning stage, e.g. 'pipeline' or 'functions'.
+        tools: Tools the LLM chooses from at this stage.
+        question: A question from the user.
+        t_id: The name of selected territory.
+
+    Returns: The plan cache key.
+    """
+    tools_hash = toolset_hash(tools)
+    with _stage_toolsets_lock:
+        previous_hash = _stage_toolsets.get(stage)
+        _stage_toolsets[stage] = tools_hash
+    if previous_hash is not None and previous_hash != tools_hash:
+        purged = plan_cache.purge(lambda key: key[0] == stage and key[1] != tools_hash)
+        logger.info(
+            f"Plan cache: tools of the {stage} stage changed, {purged} plans removed"
+        )
+    return stage, tools_hash, question_template(question, t_id)
+
+
+def get_cached_plan(key: PlanCacheKey) -> List[str] | None:
+    """Returns the functions chosen for the same question template.
+
+    None is returned if there is no such plan or the cache is disabled.
+    """
+    if not app_settings.plan_cache_enabled:
+        return None
+    res_funcs = plan_cache.get(key)
+    logger.info(f"Plan cache ({key[0]}): {'hit' if res_funcs is not None else 'miss'}")
+    return list(res_funcs) if res_funcs is not None else None
+
+
+def cache_plan(key: PlanCacheKey, res_funcs: List[str]) -> None:
+    """Stores the functions chosen by the LLM if the cache is enabled.
+
+    An empty choice is not stored, the LLM could not come up with an answer.
+    """
+    if app_settings.plan_cache_enabled and res_funcs:
+        plan_cache.set(key, tuple(res_funcs))
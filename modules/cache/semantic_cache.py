@@ -0,0 +1,182 @@
+from collections import deque
+from collections import OrderedDict
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import numpy as np
+
+from modules.variables.settings import app_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """Cache of answers that finds earlier answers to similar questions.
+
+    Questions are compared by the cosine similarity of their embeddings, only
+    the answers for the same territory are considered. The least recently used
+    entry is evicted when the cache is full.
+    """
+
+    similarity_bins = np.linspace(0.0, 1.0, 21)
+
+    def __init__(
+        self,
+        threshold: float,
+        max_size: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+        history_size: int = 1000,
+    ) -> None:
+        """Creates an empty cache.
+
+        Args:
+            threshold: Minimum cosine similarity of the questions to return a cached
+                answer.
+            max_size: Maximum number of entries.
+            ttl: Time to live of an entry in seconds.
+            clock: Function that returns the current time in seconds.
+            history_size: Number of the latest similarities used for the statistics.
+        """
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[
+            Tuple[Hashable, str], Tuple[float, np.ndarray, str]
+        ] = OrderedDict()
+        self._lock = threading.Lock()
+        self._similarities = deque(maxlen=history_size)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        return embedding / (np.linalg.norm(embedding) or 1.0)
+
+    def get(
+        self, territory_key: Hashable, embedding: np.ndarray
+    ) -> Tuple[str | None, float]:
+        """Finds the answer to the most similar question about the same territory.
+
+        Args:
+            territory_key: Key of the territory the question is about.
+            embedding: Embedding of the question.
+
+        Returns: A tuple (answer, similarity), the answer is None if there is no
+        question with the similarity above the threshold.
+        """
+        embedding = self._normalize(embedding)
+        with self._lock:
+            now = self._clock()
+            expired = [key for key, entry in self._entries.items() if entry[0] < now]
+            for key in expired:
+                del self._entries[key]
+            keys = [key for key in self._entries if key[0] == territory_key]
+            if not keys:
+                self.misses += 1
+                return None, 0.0
+            matrix = np.stack([self._entries[key][1] for key in keys])
+            similarities = matrix @ embedding
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            self._similarities.append(similarity)
+            if similarity < self.threshold:
+                self.misses += 1
+                return None, similarity
+            self._entries.move_to_end(keys[best])
+            self.hits += 1
+            return self._entries[keys[best]][2], similarity
+
+    def set(
+        self, territory_key: Hashable, question: str, embedding: np.ndarray, answer: str
+    ) -> None:
+        """Stores the answer with the embedding of its question."""
+        with self._lock:
+            key = (territory_key, question)
+            self._entries[key] = (
+                self._clock() + self.ttl,
+                self._normalize(embedding),
+                answer,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def purge(self, predicate: Callable[[Hashable], bool] | None = None) -> int:
+        """Removes the entries whose territory keys satisfy the predicate.
+
+        All the entries are removed by default.
+
+        Returns: Number of removed entries.
+        """
+        with self._lock:
+            keys = [
+                key for key in self._entries if predicate is None or predicate(key[0])
+            ]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the hit rate and the distribution of the best similarities.
+
+        The similarities of the latest lookups are used for tuning the threshold.
+        """
+        with self._lock:
+            requests_num = self.hits + self.misses
+            similarities = np.array(self._similarities)
+            stats = {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests_num if requests_num else 0.0,
+            }
+        if similarities.size:
+            counts, _ = np.histogram(similarities, bins=self.similarity_bins)
+            stats["similarity_quantiles"] = {
+                f"p{q}": float(np.percentile(similarities, q)) for q in (10, 50, 90, 99)
+            }
+            stats["similarity_histogram"] = {
+                f"{low:.2f}-{high:.2f}": int(count)
+                for low, high, count in zip(
+                    self.similarity_bins[:-1], self.similarity_bins[1:], counts
+                )
+                if count
+            }
+        return stats
+
+
+semantic_cache = SemanticCache(
+    threshold=app_settings.semantic_cache_threshold,
+    max_size=app_settings.semantic_cache_max_size,
+    ttl=app_settings.semantic_cache_ttl,
+)
+
+
+def get_semantic_answer(territory_key: Hashable, embedding: np.ndarray) -> str | None:
+    """Returns the cached answer to a similar question about the same territory.
+
+    Returns: The answer, None if there is no such answer.
+    """
+    answer, similarity = semantic_cache.get(territory_key, embedding)
+    logger.info(
+        f"Semantic cache: {'hit' if answer is not None else 'miss'} "
+        f"(similarity {similarity:.3f})"
+    )
+    return answer
+
+
+def cache_semantic_answer(
+    territory_key: Hashable, question: str, embedding: np.ndarray, answer: str
+) -> None:
+    """Stores a non-empty answer with the embedding of its question."""
+    if answer:
+        semantic_cache.set(territory_key, question, embedding, answer)
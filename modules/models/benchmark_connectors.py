@@ -0,0 +1,198 @@
+"""Compares the LLM calls with a new connection per call and with the pooled sessions.
+
+The pooled keep-alive sessions are the ones of the connectors, the latency
+report is written to the test results.
+
+The LLM service is emulated by a local HTTP server that waits HANDSHAKE_DELAY
+seconds before serving a new connection, like the TCP and TLS handshakes with
+a remote host, and answers every call at once.
+
+Run from the project root:
+
+    python -m modules.models.benchmark_connectors
+"""
+
+import asyncio
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+import httpx
+import requests
+
+from modules.models.connector_creator import LanguageModelCreator
+from modules.variables import ResponseMode
+from modules.variables import ROOT
+from utils.http_sessions import close_async_client
+from utils.measure_time import latency_summary
+from utils.measure_time import Timer
+
+
+path_to_results = Path(
+    ROOT,
+    "pipelines",
+    "tests",
+    "test_results",
+    "llm_connectors",
+    "connector_sessions_results.txt",
+)
+# Time of establishing a connection to the emulated LLM service in seconds
+HANDSHAKE_DELAY = 0.02
+# Number of calls of each kind
+CALLS = 200
+
+
+class LLMServer(ThreadingHTTPServer):
+    """Local HTTP/1.1 server that counts the connections.
+
+    Every call is answered with an empty completion.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, handshake_delay: float = HANDSHAKE_DELAY) -> None:
+        """Starts the server on a free port in a background thread.
+
+        Args:
+            handshake_delay: Delay before serving a new connection in seconds.
+        """
+        super().__init__(("127.0.0.1", 0), _LLMHandler)
+        self.handshake_delay = handshake_delay
+        self.connections = 0
+        self._lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        """URL of the completions endpoint."""
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/completions"
+
+    def count_connection(self) -> None:
+        """Counts a new connection to the server."""
+        with self._lock:
+            self.connections += 1
+
+
+class _LLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # The headers and the body are written separately
+    disable_nagle_algorithm = True
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.count_connection()
+        time.sleep(self.server.handshake_delay)
+
+    def _answer(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"choices": [{"text": ""}]}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        self._answer()
+
+    def do_POST(self) -> None:
+        self._answer()
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+def run_calls(call: Callable[[], object], calls: int) -> Dict[str, float]:
+    """Makes the calls one by one and returns their latency summary."""
+    latencies = []
+    for _ in range(calls):
+        with Timer() as t:
+            call()
+            latencies.append(t.seconds_from_start)
+    return latency_summary(latencies)
+
+
+async def a_run_calls(
+    call: Callable[[], Awaitable[object]], calls: int
+) -> Dict[str, float]:
+    """Asynchronous version of run_calls."""
+    latencies = []
+    for _ in range(calls):
+        with Timer() as t:
+            await call()
+            latencies.append(t.seconds_from_start)
+    return latency_summary(latencies)
+
+
+def benchmark_connectors(calls: int = CALLS) -> str:
+    """Runs the calls of each kind against the emulated LLM service and saves the report.
+
+    Args:
+        calls: Number of calls of each kind.
+
+    Returns: The report.
+    """
+    server = LLMServer()
+    connector = LanguageModelCreator._create_connector_for_type(
+        server.url, "", "llama-8b"
+    )
+    message = connector._prepare_message("Question", None, 0.15, 50, 0.15)
+
+    def new_connection() -> requests.Response:
+        return requests.post(server.url, json=message, timeout=60)
+
+    def pooled_session() -> requests.Response:
+        return connector.generate("Question", mode=ResponseMode.full)
+
+    async def a_new_connection() -> httpx.Response:
+        async with httpx.AsyncClient(timeout=60) as client:
+            return await client.post(server.url, json=message)
+
+    async def a_pooled_session() -> httpx.Response:
+        return await connector.a_generate("Question", mode=ResponseMode.full)
+
+    def measure(name: str, run: Callable[[], Dict[str, float]]) -> None:
+        before = server.connections
+        res = run()
+        results.append((name, res, server.connections - before))
+
+    async def run_async() -> None:
+        try:
+            for name, call in (
+                ("async, new connection per call", a_new_connection),
+                ("async, pooled session", a_pooled_session),
+            ):
+                before = server.connections
+                res = await a_run_calls(call, calls)
+                results.append((name, res, server.connections - before))
+        finally:
+            await close_async_client()
+
+    results: List[Tuple[str, Dict[str, float], int]] = []
+    measure("sync, new connection per call", lambda: run_calls(new_connection, calls))
+    measure("sync, pooled session", lambda: run_calls(pooled_session, calls))
+    asyncio.run(run_async())
+    server.shutdown()
+    server.server_close()
+
+    report = [
+        f"Calls of each kind: {calls}, connection setup delay: "
+        f"{HANDSHAKE_DELAY * 1000} ms"
+    ]
+    for name, res, connections in results:
+        report.append(
+            f"  {name}: average time {round(res['mean'] * 1000, 3)} ms, "
+            f"p95 time {round(res['p95'] * 1000, 3)} ms, connections {connections}"
+        )
+    report = "\n".join(report)
+    path_to_results.parent.mkdir(parents=True, exist_ok=True)
+    with open(path_to_results, "w") as f:
+        print(report, file=f)
+    return report
+
+
+if __name__ == "__main__":
+    print(benchmark_connectors())
@@ -1,13 +1,20 @@
+import logging
+from typing import Tuple
 import urllib
 
 from dotenv import load_dotenv
-import requests
 
+from modules.cache.model_type_cache import model_type_cache
 from modules.models.connectors import BaseLanguageModelInterface
 from modules.models.connectors import GPTWebLanguageModel
 from modules.models.connectors import WEBLanguageModel
+from modules.preprocessing.default import llama_8b_fc_postprocessing
+from modules.preprocessing.default import llama_8b_fc_preprocessing
 from modules.preprocessing.default import llama_8b_postprocessing
+from modules.preprocessing.default import llama_8b_stream_postprocessing
+from modules.preprocessing.default import llama_70b_fc_preprocessing
 from modules.preprocessing.default import llama_70b_postprocessing
+from modules.preprocessing.default import vsegpt_fc_postprocessing
 from modules.preprocessing.default import vsegpt_postprocessing
 from modules.preprocessing.text_preprocessor import BaseTextProcessor
 from modules.variables import ROOT
@@ -15,9 +22,19 @@ from modules.variables.prompts import all_gpt_template
 from modules.variables.prompts import llama_8b_template
 from modules.variables.prompts import llama_70b_template
 from modules.variables.prompts.templates import llama_70b_int4_template
+from modules.variables.settings import app_settings
+from utils.http_sessions import async_timeout
+from utils.http_sessions import get_async_client
+from utils.http_sessions import get_session
+from utils.http_sessions import llm_timeouts
+from utils.single_flight import SingleFlight
 
 
 load_dotenv(ROOT / "config.env")
+logger = logging.getLogger(__name__)
+
+# Concurrent discoveries of the type of the same LLM service
+model_type_discoveries = SingleFlight()
 
 
 class LanguageModelCreator:
@@ -29,36 +46,167 @@ class LanguageModelCreator:
         "llama-8b": {
             "template": llama_8b_template,
             "postprocessor": llama_8b_postprocessing,
+            "stream_postprocessor": llama_8b_stream_postprocessing,
+            "fc_preprocessor": llama_8b_fc_preprocessing,
+            "fc_postprocessor": llama_8b_fc_postprocessing,
         },
         "llama-70b": {
             "template": llama_70b_template,
             "postprocessor": llama_70b_postprocessing,
+            "fc_preprocessor": llama_70b_fc_preprocessing,
         },
         "llama-70b-int4": {
             "template": llama_70b_int4_template,
             "postprocessor": llama_70b_postprocessing,
+            "fc_preprocessor": llama_70b_fc_preprocessing,
         },
     }
 
+    @staticmethod
+    def _get_models_url(url: str) -> str:
+        """Returns the URL for listing the models served by the LLM service."""
+        url_parts = urllib.parse.urlparse(url)
+        return f"{url_parts.scheme}://{url_parts.netloc}/v1/models"
+
+    @staticmethod
+    def _get_host(url: str) -> str:
+        """Returns the host and port of the LLM service."""
+        return urllib.parse.urlparse(url).netloc
+
     @classmethod
-    def _get_model_type(cls, url: str) -> str:
+    def _get_configured_model_type(cls, url: str) -> str | None:
+        """Returns the type of the LLM service known without a request to it.
+
+        The type is set in LLM_MODEL_TYPES for its host, None if it is not known.
+        """
+        if "stairs-llm-queue" in url:
+            return "llama-70b-int4"
+        return app_settings.llm_model_types.get(cls._get_host(url))
+
+    @classmethod
+    def _model_type_from_status(cls, url: str, status_code: int) -> Tuple[str, bool]:
+        """Returns the type of the LLM service by the status of its models endpoint.
+
+        The second value tells whether the status is definitive. A service without
+        the endpoint is llama-70b. A server error, a timeout or a rate limit does
+        not tell the type, llama-70b is assumed then.
+        """
+        if status_code == 200:
+            return "llama-8b", True
+        if status_code < 500 and status_code not in (408, 429):
+            return "llama-70b", True
+        logger.warning(
+            f"Could NOT discover the type of the LLM at {cls._get_host(url)}: "
+            f"status {status_code}, llama-70b is assumed for "
+            f"{app_settings.model_type_error_ttl} sec"
+        )
+        return "llama-70b", False
+
+    @classmethod
+    def _discover_model_type(cls, url: str) -> Tuple[str, bool]:
         """Checks the type of the LLM service by requesting the model name from it.
 
+        Args:
+            url: The LLM endpoint for making requests.
+
+        Returns: The type of the LLM service and whether the service told it,
+        see _model_type_from_status.
+        """
+        res = get_session().get(url=cls._get_models_url(url), timeout=llm_timeouts())
+        return cls._model_type_from_status(url, res.status_code)
+
+    @classmethod
+    async def _a_discover_model_type(cls, url: str) -> Tuple[str, bool]:
+        """Asynchronous version of the _discover_model_type method."""
+        res = await get_async_client().get(
+            url=cls._get_models_url(url), timeout=async_timeout()
+        )
+        return cls._model_type_from_status(url, res.status_code)
+
+    @classmethod
+    def _get_model_type(cls, url: str) -> str:
+        """Returns the type of the LLM service.
+
+        The type is taken from LLM_MODEL_TYPES or discovered once per host. It is
+        refreshed in the background after MODEL_TYPE_CACHE_TTL seconds, or after
+        MODEL_TYPE_ERROR_TTL seconds if the service did not tell it. A failed
+        discovery (e.g. the service is not reachable) is not cached.
+
         Args:
             url: The LLM endpoint for making requests.
 
         Returns: The type of the LLM service.
         """
-        if "stairs-llm-queue" in url:
-            return "llama-70b-int4"
+        model_type = cls._get_configured_model_type(url)
+        if model_type is not None:
+            return model_type
+        host = cls._get_host(url)
+        model_type, expired = model_type_cache.lookup(host)
+        if model_type is None:
+            try:
+                model_type, definitive = cls._discover_model_type(url)
+            except Exception as e:
+                logger.error(f"Could NOT discover the type of the LLM at {host}: {e}")
+                raise
+            model_type_cache.set(host, model_type, definitive)
+        elif expired:
+            model_type_cache.refresh(host, lambda: cls._discover_model_type(url))
+        return model_type
 
-        url_parts = urllib.parse.urlparse(url)
-        url = f"{url_parts.scheme}://{url_parts.netloc}/v1/models"
-        res = requests.get(url=url)
-        if res.status_code == 200:
-            return "llama-8b"
-        else:
-            return "llama-70b"
+    @classmethod
+    async def _a_get_model_type(cls, url: str) -> str:
+        """Asynchronous version of the _get_model_type method.
+
+        The concurrent discoveries of the same host are made once.
+        """
+        model_type = cls._get_configured_model_type(url)
+        if model_type is not None:
+            return model_type
+        host = cls._get_host(url)
+        model_type, expired = model_type_cache.lookup(host)
+        if model_type is None:
+            try:
+                model_type, definitive = await model_type_discoveries.do(
+                    host, lambda: cls._a_discover_model_type(url)
+                )
+            except Exception as e:
+                logger.error(f"Could NOT discover the type of the LLM at {host}: {e}")
+                raise
+            model_type_cache.set(host, model_type, definitive)
+        elif expired:
+            model_type_cache.refresh(host, lambda: cls._discover_model_type(url))
+        return model_type
+
+    @classmethod
+    def _create_connector_for_type(
+        cls, model_url: str, sys_prompt: str, model_type: str
+    ) -> BaseLanguageModelInterface:
+        """Creates a connector for a web LLM service of the given type."""
+        try:
+            settings = cls.model_settings[model_type]
+        except:
+            raise ValueError(f"No settings found for URL: {model_url}")
+        message_processor = BaseTextProcessor(
+            settings["template"],
+            settings["postprocessor"],
+            settings.get("stream_postprocessor"),
+            settings.get("fc_preprocessor"),
+            settings.get("fc_postprocessor"),
+        )
+        return WEBLanguageModel(sys_prompt, model_url, text_processor=message_processor)
+
+    @staticmethod
+    def _create_vsegpt_connector(
+        model_url: str, sys_prompt: str
+    ) -> BaseLanguageModelInterface:
+        """Creates a connector for a model hosted by the vsegpt service."""
+        model_name = model_url.split(";")[1]
+        message_processor = BaseTextProcessor(
+            all_gpt_template,
+            vsegpt_postprocessing,
+            fc_out_format=vsegpt_fc_postprocessing,
+        )
+        return GPTWebLanguageModel(sys_prompt, model_name, message_processor)
 
     @classmethod
     def create_llm_connector(
@@ -73,18 +221,25 @@ class LanguageModelCreator:
         Returns: The connector object that can be used to make requests to the LLM service.
         """
         if "vsegpt" in model_url:
-            model_name = model_url.split(";")[1]
-            message_processor = BaseTextProcessor(all_gpt_template, vsegpt_postprocessing)
-            return GPTWebLanguageModel(sys_prompt, model_name, message_processor)
-        else:
-            model_type = cls._get_model_type(model_url)
-            try:
-                settings = cls.model_settings[model_type]
-            except:
-                raise ValueError(f"No settings found for URL: {model_url}")
-            message_processor = BaseTextProcessor(
-                settings["template"], settings["postprocessor"]
-            )
-            return WEBLanguageModel(
-                sys_prompt, model_url, text_processor=message_processor
-            )
+            return cls._create_vsegpt_connector(model_url, sys_prompt)
+        model_type = cls._get_model_type(model_url)
+        return cls._create_connector_for_type(model_url, sys_prompt, model_type)
+
+    @classmethod
+    async def a_create_llm_connector(
+        cls, model_url: str, sys_prompt: str
+    ) -> BaseLanguageModelInterface:
+        """Asynchronous version of the create_llm_connector method.
+
+        The type of the LLM service is requested without blocking the event loop.
+
+        Args:
+            model_url: The LLM endpoint for making requests.
+            sys_prompt: System prompt.
+
+        Returns: The connector object that can make requests to the LLM service.
+        """
+        if "vsegpt" in model_url:
+            return cls._create_vsegpt_connector(model_url, sys_prompt)
+        model_type = await cls._a_get_model_type(model_url)
+        return cls._create_connector_for_type(model_url, sys_prompt, model_type)
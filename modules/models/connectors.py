@@ -1,15 +1,33 @@
 from abc import ABCMeta
 from abc import abstractmethod
+import logging
 import os
+from typing import AsyncIterator, Dict, List
 import uuid
 
 from dotenv import load_dotenv
+import httpx
+from openai import AsyncOpenAI
 from openai import OpenAI
 import requests
 
+from modules.preprocessing.default import FC_STOP_SEQUENCES
+from modules.preprocessing.default import function_call_tools
 from modules.preprocessing.text_preprocessor import TextProcessorInterface
 from modules.variables import ResponseMode
 from modules.variables import ROOT
+from modules.variables.settings import app_settings
+from utils.deadline import http_timeout
+from utils.http_sessions import async_timeout
+from utils.http_sessions import get_async_client
+from utils.http_sessions import get_client
+from utils.http_sessions import get_session
+from utils.http_sessions import llm_timeouts
+
+
+logger = logging.getLogger(__name__)
+
+VSEGPT_URL = "https://api.vsegpt.ru/v1"
 
 
 class BaseLanguageModelInterface(metaclass=ABCMeta):
@@ -56,10 +74,68 @@ class BaseLanguageModelInterface(metaclass=ABCMeta):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    async def a_generate(self, prompt: str, context: str, **kwargs: object) -> str:
+        """Asynchronous version of the generate method.
+
+        Does not block the event loop while waiting for the LLM response.
+
+        Args:
+            prompt (str): User's question.
+            context (str): Additional data containing information related to the question.
+            **kwargs: Parameters of the generation.
+        """
+        raise NotImplementedError
+
+    def generate_function_call(
+        self, prompt: str, tools: List[Dict], **kwargs: object
+    ) -> str:
+        """Asks the model to choose the functions for the given prompt.
+
+        By default the answer is generated as text with the FC_TOKENS_LIMIT tokens
+        limit, connectors to the models that support function calling override
+        this method.
+
+        Args:
+            prompt (str): User prompt with the question.
+            tools (List[Dict]): Tools to choose from in the OpenAI format.
+            **kwargs: Parameters of the generation.
+
+        Returns:
+            str: Names of the chosen functions.
+        """
+        return self.generate(prompt, tokens_limit=app_settings.fc_tokens_limit, **kwargs)
+
+    async def a_generate_function_call(
+        self, prompt: str, tools: List[Dict], **kwargs: object
+    ) -> str:
+        """Asynchronous version of the generate_function_call method."""
+        return await self.a_generate(
+            prompt, tokens_limit=app_settings.fc_tokens_limit, **kwargs
+        )
+
+    async def a_generate_stream(
+        self, prompt: str, context: str | None = None, **kwargs: object
+    ) -> AsyncIterator[str]:
+        """Yields the answer to the given prompt piece by piece as the LLM produces it.
+
+        By default the whole answer is yielded at once, connectors to the models that
+        support streaming override this method.
+
+        Args:
+            prompt (str): User's question.
+            context (str): Additional data containing information related to the question.
+            **kwargs: Parameters of the generation.
+        """
+        yield await self.a_generate(prompt, context, **kwargs)
+
 
 class WEBLanguageModel(BaseLanguageModelInterface):
     """Implementation of Large Language Model's connector.
     Intended for work with LLMs hosted in web services.
+
+    The calls reuse the keep-alive connections of the shared pool, see
+    utils/http_sessions.py.
     """
 
     def __init__(
@@ -127,6 +203,169 @@ class WEBLanguageModel(BaseLanguageModelInterface):
         Returns:
             Union[str, request.Response]: LLM's response for given prompt.
         """
+        message = self._prepare_message(
+            prompt, context, temperature, top_k, top_p, **kwargs
+        )
+        response = get_session().post(url=self.url, json=message, timeout=llm_timeouts())
+        return self._process_response(response, mode)
+
+    async def a_generate(
+        self,
+        prompt: str,
+        context: str | None = None,
+        temperature: float = 0.15,
+        top_k: int = 50,
+        top_p: float = 0.15,
+        mode: ResponseMode = ResponseMode.default,
+        **kwargs: object,
+    ) -> str | httpx.Response:
+        """Asynchronous version of the generate method. Takes the same arguments.
+
+        Returns:
+            Union[str, httpx.Response]: LLM's response for given prompt.
+        """
+        message = self._prepare_message(
+            prompt, context, temperature, top_k, top_p, **kwargs
+        )
+        response = await get_async_client().post(
+            url=self.url, json=message, timeout=async_timeout()
+        )
+        return self._process_response(response, mode)
+
+    def generate_function_call(
+        self,
+        prompt: str,
+        tools: List[Dict],
+        temperature: float = 0.15,
+        top_k: int = 50,
+        top_p: float = 0.15,
+        **kwargs: object,
+    ) -> str:
+        """Asks the model to choose the functions for the given prompt.
+
+        The answer is limited to FC_TOKENS_LIMIT tokens. The OpenAI compatible
+        services get the tools natively if FC_NATIVE_TOOLS is set, the others
+        answer in text that is cut by the stop sequences. If the service rejects
+        the native tools, the request is repeated with the text answer.
+
+        Args:
+            prompt (str): User prompt with the question.
+            tools (List[Dict]): Tools to choose from in the OpenAI format.
+            temperature (float, optional): Generation temperature. Defaults to 0.15.
+            top_k (int, optional): Amount of tokens that are considered while
+                sampling. Defaults to 50.
+            top_p (float, optional): Parameter to manage randomness of the LLM
+                output. Defaults to 0.15.
+            **kwargs: Parameters of the generation.
+
+        Returns:
+            str: Names of the chosen functions.
+        """
+        message = self._prepare_function_call(
+            prompt, tools, temperature, top_k, top_p, **kwargs
+        )
+        response = get_session().post(url=self.url, json=message, timeout=llm_timeouts())
+        if self._native_tools_rejected(message, response):
+            message = self._prepare_function_call(
+                prompt, None, temperature, top_k, top_p, **kwargs
+            )
+            response = get_session().post(
+                url=self.url, json=message, timeout=llm_timeouts()
+            )
+        return self.text_processor.preprocess_function_call_output(response)
+
+    async def a_generate_function_call(
+        self,
+        prompt: str,
+        tools: List[Dict],
+        temperature: float = 0.15,
+        top_k: int = 50,
+        top_p: float = 0.15,
+        **kwargs: object,
+    ) -> str:
+        """Asynchronous version of the generate_function_call method."""
+        message = self._prepare_function_call(
+            prompt, tools, temperature, top_k, top_p, **kwargs
+        )
+        response = await get_async_client().post(
+            url=self.url, json=message, timeout=async_timeout()
+        )
+        if self._native_tools_rejected(message, response):
+            message = self._prepare_function_call(
+                prompt, None, temperature, top_k, top_p, **kwargs
+            )
+            response = await get_async_client().post(
+                url=self.url, json=message, timeout=async_timeout()
+            )
+        return self.text_processor.preprocess_function_call_output(response)
+
+    def _native_tools_rejected(
+        self, message: dict, response: requests.Response | httpx.Response
+    ) -> bool:
+        """Checks if the request with the native tools failed, e.g. unsupported."""
+        if "tools" not in message or response.status_code < 400:
+            return False
+        logger.warning(
+            f"Could NOT choose the functions with the native tools at {self.url}: "
+            f"status {response.status_code}, the text answer is requested"
+        )
+        return True
+
+    async def a_generate_stream(
+        self,
+        prompt: str,
+        context: str | None = None,
+        temperature: float = 0.15,
+        top_k: int = 50,
+        top_p: float = 0.15,
+        **kwargs: object,
+    ) -> AsyncIterator[str]:
+        """Yields text tokens of the model response as soon as they are received.
+
+        Falls back to a single chunk with the whole answer if the model service
+        does not support streaming.
+
+        Args:
+            prompt (str): User prompt.
+            context (Optional[str], optional): Additional information to respond to
+                the user's prompt. Defaults to None.
+            temperature (float, optional): Generation temperature. Defaults to 0.15.
+            top_k (int, optional): Amount of tokens that are considered while
+                sampling. Defaults to 50.
+            top_p (float, optional): Parameter to manage randomness of the LLM output.
+                Defaults to 0.15.
+            **kwargs: Parameters of the generation, e.g. tokens_limit.
+
+        Yields:
+            str: Text tokens of the LLM's response.
+        """
+        if not self.text_processor.supports_streaming:
+            yield await self.a_generate(
+                prompt, context, temperature, top_k, top_p, **kwargs
+            )
+            return
+        message = self._prepare_message(
+            prompt, context, temperature, top_k, top_p, **kwargs
+        )
+        message["stream"] = True
+        async with get_async_client().stream(
+            "POST", url=self.url, json=message, timeout=async_timeout()
+        ) as response:
+            async for line in response.aiter_lines():
+                token = self.text_processor.preprocess_stream_chunk(line)
+                if token:
+                    yield token
+
+    def _prepare_message(
+        self,
+        prompt: str,
+        context: str | None,
+        temperature: float,
+        top_k: int,
+        top_p: float,
+        **kwargs: object,
+    ) -> dict:
+        """Fills the model template with the given prompt, context and parameters."""
         job_id = str(uuid.uuid4())
         token_limit = kwargs.get("tokens_limit", 64000)
         if context is None:
@@ -134,7 +373,7 @@ class WEBLanguageModel(BaseLanguageModelInterface):
         else:
             formatted_prompt = f"Context: {self.prep_context(context)} Question: {prompt}"
 
-        message = self.text_processor.preprocess_input(
+        return self.text_processor.preprocess_input(
             job_id=str(job_id),
             temperature=str(temperature),
             token_limit=str(token_limit),
@@ -143,7 +382,32 @@ class WEBLanguageModel(BaseLanguageModelInterface):
             system_prompt=str(self.system_prompt),
             user_prompt=str(formatted_prompt),
         )
-        response = requests.post(url=self.url, json=message)
+
+    def _prepare_function_call(
+        self,
+        prompt: str,
+        tools: List[Dict] | None,
+        temperature: float,
+        top_k: int,
+        top_p: float,
+        **kwargs: object,
+    ) -> dict:
+        """Fills the model template for a function calling request.
+
+        The tools are passed natively if FC_NATIVE_TOOLS is set and they are given.
+        """
+        tokens_limit = app_settings.fc_tokens_limit
+        message = self._prepare_message(
+            prompt, None, temperature, top_k, top_p, tokens_limit=tokens_limit
+        )
+        return self.text_processor.preprocess_function_call_input(
+            message, tools if app_settings.fc_native_tools else None, tokens_limit
+        )
+
+    def _process_response(
+        self, response: requests.Response | httpx.Response, mode: ResponseMode
+    ) -> str | requests.Response | httpx.Response:
+        """Returns the raw response or the text answer depending on the mode."""
         match mode:
             case ResponseMode.full:
                 return response
@@ -161,7 +425,18 @@ class GPTWebLanguageModel(BaseLanguageModelInterface):
         self.text_processor = text_processor
         self._model_name = model_name
         self._model = OpenAI(
-            api_key=os.environ.get("VSE_GPT_KEY"), base_url="https://api.vsegpt.ru/v1"
+            api_key=os.environ.get("VSE_GPT_KEY"),
+            base_url=VSEGPT_URL,
+            http_client=get_client(),
+        )
+
+    @property
+    def _async_model(self) -> AsyncOpenAI:
+        """Client of the service on the keep-alive client of the running event loop."""
+        return AsyncOpenAI(
+            api_key=os.environ.get("VSE_GPT_KEY"),
+            base_url=VSEGPT_URL,
+            http_client=get_async_client(),
         )
 
     def generate(
@@ -187,21 +462,155 @@ class GPTWebLanguageModel(BaseLanguageModelInterface):
         Returns:
             str: LLM's response for given prompt.
         """
+        message = self._prepare_message(prompt, context, temperature, top_k, top_p)
+        response = self._model.chat.completions.create(
+            model=self._model_name,
+            messages=message,
+            temperature=temperature,
+            max_tokens=kwargs.get("max_tokes", 8000),
+            timeout=app_settings.http_timeout,
+        )
+        return self.text_processor.preprocess_output(response)
+
+    async def a_generate(
+        self,
+        prompt: str,
+        context: str | None = None,
+        temperature: float = 0.15,
+        top_k: int = 50,
+        top_p: float = 0.15,
+        **kwargs: object,
+    ) -> str:
+        """Asynchronous version of the generate method. Takes the same arguments.
+
+        Returns:
+            str: LLM's response for given prompt.
+        """
+        message = self._prepare_message(prompt, context, temperature, top_k, top_p)
+        response = await self._async_model.chat.completions.create(
+            model=self._model_name,
+            messages=message,
+            temperature=temperature,
+            max_tokens=kwargs.get("max_tokes", 8000),
+            timeout=http_timeout(),
+        )
+        return self.text_processor.preprocess_output(response)
+
+    async def a_generate_stream(
+        self,
+        prompt: str,
+        context: str | None = None,
+        temperature: float = 0.15,
+        top_k: int = 50,
+        top_p: float = 0.15,
+        **kwargs: object,
+    ) -> AsyncIterator[str]:
+        """Yields text tokens of the model response as soon as they are received.
+
+        Takes the same arguments as the generate method.
+
+        Yields:
+            str: Text tokens of the LLM's response.
+        """
+        message = self._prepare_message(prompt, context, temperature, top_k, top_p)
+        stream = await self._async_model.chat.completions.create(
+            model=self._model_name,
+            messages=message,
+            temperature=temperature,
+            max_tokens=kwargs.get("max_tokes", 8000),
+            stream=True,
+            timeout=http_timeout(),
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def generate_function_call(
+        self,
+        prompt: str,
+        tools: List[Dict],
+        temperature: float = 0.15,
+        top_k: int = 50,
+        top_p: float = 0.15,
+        **kwargs: object,
+    ) -> str:
+        """Asks the model to choose the functions for the given prompt.
+
+        The tools are given natively if FC_NATIVE_TOOLS is set, otherwise the model
+        answers in text that is cut by the stop sequences. The answer is limited
+        to FC_TOKENS_LIMIT tokens.
+
+        Args:
+            prompt (str): User prompt with the question.
+            tools (List[Dict]): Tools to choose from in the OpenAI format.
+            temperature (float, optional): Generation temperature. Defaults to 0.15.
+            top_k (int, optional): Amount of tokens that are considered while
+                sampling. Defaults to 50.
+            top_p (float, optional): Parameter to manage randomness of the LLM
+                output. Defaults to 0.15.
+            **kwargs: Not used, the answer is limited by FC_TOKENS_LIMIT.
+
+        Returns:
+            str: Names of the chosen functions.
+        """
+        message = self._prepare_message(prompt, None, temperature, top_k, top_p)
+        response = self._model.chat.completions.create(
+            model=self._model_name,
+            messages=message,
+            temperature=temperature,
+            timeout=app_settings.http_timeout,
+            **self._function_call_params(tools),
+        )
+        return self.text_processor.preprocess_function_call_output(response)
+
+    async def a_generate_function_call(
+        self,
+        prompt: str,
+        tools: List[Dict],
+        temperature: float = 0.15,
+        top_k: int = 50,
+        top_p: float = 0.15,
+        **kwargs: object,
+    ) -> str:
+        """Asynchronous version of the generate_function_call method."""
+        message = self._prepare_message(prompt, None, temperature, top_k, top_p)
+        response = await self._async_model.chat.completions.create(
+            model=self._model_name,
+            messages=message,
+            temperature=temperature,
+            timeout=http_timeout(),
+            **self._function_call_params(tools),
+        )
+        return self.text_processor.preprocess_function_call_output(response)
+
+    @staticmethod
+    def _function_call_params(tools: List[Dict]) -> dict:
+        """Returns the parameters of a function calling request."""
+        params = {"max_tokens": app_settings.fc_tokens_limit}
+        if app_settings.fc_native_tools:
+            params["tools"] = function_call_tools(tools)
+            params["tool_choice"] = "required"
+        else:
+            params["stop"] = FC_STOP_SEQUENCES
+        return params
+
+    def _prepare_message(
+        self,
+        prompt: str,
+        context: str | None,
+        temperature: float,
+        top_k: int,
+        top_p: float,
+    ) -> list:
+        """Fills the chat template with the given prompt and context."""
         if context is None:
             prompt = f"Question: {prompt}"
         else:
             prompt = f"Context: {self.prep_context(context)}. Question: {prompt}"
-        message = self.text_processor.preprocess_input(
+        return self.text_processor.preprocess_input(
             system_prompt=self.system_prompt,
             user_prompt=prompt,
             temperature=temperature,
             top_k=top_k,
             top_p=top_p,
         )
-        response = self._model.chat.completions.create(
-            model=self._model_name,
-            messages=message,
-            temperature=temperature,
-            max_tokens=kwargs.get("max_tokes", 8000),
-        )
-        return self.text_processor.preprocess_output(response)
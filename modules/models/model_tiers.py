@@ -0,0 +1,146 @@
+from collections import deque
+import logging
+import re
+import threading
+from typing import Any, Deque, Dict, Tuple
+
+from agents.toolset import count_tokens
+from modules.variables.settings import app_settings
+from utils.measure_time import latency_summary
+
+
+logger = logging.getLogger(__name__)
+
+# Environment variables with the URLs of the models of each tier
+TIER_URLS = {"fast": "LLAMA_FC_URL", "large": "LLAMA_URL"}
+# Questions answered by looking up a value in the context
+LOOKUP_PATTERN = re.compile(
+    r"^\W*(сколько|какое количество|какова|каково|каков|какая|какой|какие|где|"
+    r"how many|how much|what is the|what are the|where)\b",
+    re.IGNORECASE,
+)
+# Questions that need reasoning over the context
+ANALYSIS_PATTERN = re.compile(
+    r"\b(почему|зачем|сравн\w*|анализ\w*|оцени\w*|проблем\w*|стратеги\w*|"
+    r"рекоменд\w*|предлож\w*|перспектив\w*|как улучшить|why|compare\w*|"
+    r"analy[sz]\w*|assess\w*|evaluat\w*|problems?|strateg\w*|recommend\w*|"
+    r"suggest\w*|improve\w*)\b",
+    re.IGNORECASE,
+)
+# Chunks of the documents in the context of the strategy pipeline
+CHUNK_PATTERN = re.compile(r"\bChunk \d+:")
+
+
+def count_context_parts(context: str) -> int:
+    """Returns the number of summary tables and document chunks in the context.
+
+    The tables are the top-level dictionaries returned by the summary tables API.
+    """
+    tables, depth = 0, 0
+    for char in context:
+        if char == "{":
+            tables += depth == 0
+            depth += 1
+        elif char == "}" and depth:
+            depth -= 1
+    return tables + len(CHUNK_PATTERN.findall(context))
+
+
+def question_complexity(question: str, context: str) -> Tuple[int, Dict[str, Any]]:
+    """Scores the complexity of answering the question with the context.
+
+    A point is added for a question longer than MODEL_TIER_MAX_QUESTION_TOKENS,
+    for a context longer than MODEL_TIER_MAX_CONTEXT_TOKENS, for more tables and
+    chunks than MODEL_TIER_MAX_CONTEXT_PARTS and for a question that needs
+    analysis. A point is subtracted for a lookup question that needs no analysis.
+
+    Args:
+        question: A question from the user.
+        context: Context collected by a pipeline.
+
+    Returns: A tuple (score, features) with the score and the features it is based on.
+    """
+    analysis = ANALYSIS_PATTERN.search(question) is not None
+    features = {
+        "question_tokens": count_tokens(question),
+        "context_tokens": count_tokens(context),
+        "context_parts": count_context_parts(context),
+        "lookup": not analysis and LOOKUP_PATTERN.search(question) is not None,
+        "analysis": analysis,
+    }
+    score = (
+        (features["question_tokens"] > app_settings.model_tier_max_question_tokens)
+        + (features["context_tokens"] > app_settings.model_tier_max_context_tokens)
+        + (features["context_parts"] > app_settings.model_tier_max_context_parts)
+        + features["analysis"]
+        - features["lookup"]
+    )
+    return score, features
+
+
+class ModelTiers:
+    """Routes the answer generation to the fast or to the large model.
+
+    The tier is chosen by the complexity of the question, the routing and the
+    latency of each tier are recorded.
+    """
+
+    def __init__(self, window: int = 1000) -> None:
+        """Creates the tiers without history.
+
+        Args:
+            window: Number of recent generations of each tier used for the latency.
+        """
+        self._routed = dict.fromkeys(TIER_URLS, 0)
+        self._latencies: Dict[str, Deque[float]] = {
+            tier: deque(maxlen=window) for tier in TIER_URLS
+        }
+        self._lock = threading.Lock()
+
+    def choose(self, question: str, context: str) -> str:
+        """Chooses the tier of the model to answer the question.
+
+        The fast tier is chosen if MODEL_TIERS_ENABLED is set and the complexity
+        score is at most MODEL_TIER_FAST_MAX_SCORE, otherwise the large one.
+
+        Args:
+            question: A question from the user.
+            context: Context collected by a pipeline.
+
+        Returns: Name of the tier, see TIER_URLS.
+        """
+        if not app_settings.model_tiers_enabled:
+            tier = "large"
+        else:
+            score, features = question_complexity(question, context)
+            tier = "fast" if score <= app_settings.model_tier_fast_max_score else "large"
+            logger.info(f"Model tier: {tier}, complexity {score}, {features}")
+        with self._lock:
+            self._routed[tier] += 1
+        return tier
+
+    def record(self, tier: str, seconds: float) -> None:
+        """Records the time of an answer generation by the model of the tier."""
+        with self._lock:
+            self._latencies[tier].append(seconds)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the number and the share of the generations routed to each tier.
+
+        The latency summary of the recent generations is returned as well.
+        """
+        with self._lock:
+            routed = dict(self._routed)
+            latencies = {tier: list(values) for tier, values in self._latencies.items()}
+        total = sum(routed.values())
+        return {
+            tier: {
+                "routed": routed[tier],
+                "rate": routed[tier] / total if total else 0.0,
+                "latency": latency_summary(latencies[tier]),
+            }
+            for tier in TIER_URLS
+        }
+
+
+model_tiers = ModelTiers()
@@ -1,10 +1,20 @@
 import json
+from typing import Dict, List
 
 from requests import Response
 
 
+# Stop sequences of the function calling answers given as text, the names of the
+# functions are expected in one line
+FC_STOP_SEQUENCES = ["\n\n"]
+
+
+# Separator of the answer from the explanation in the LLM output
+ANSWER_SEPARATOR = "ANSWER: "
+
+
 def parse_answer(res):
-    answer_separator = "ANSWER: "
+    answer_separator = ANSWER_SEPARATOR
 
     if answer_separator in res:
         return res.split(answer_separator)[1].strip()
@@ -12,6 +22,61 @@ def parse_answer(res):
         return res
 
 
+class AnswerStreamParser:
+    """Streaming version of parse_answer.
+
+    The tokens are held back until the answer separator, then the answer is passed
+    on as it is generated. The pieces returned by feed and flush add up to
+    parse_answer of the whole output.
+    """
+
+    def __init__(self) -> None:
+        """Creates a parser for one LLM output."""
+        self._buffer = ""
+        self._in_answer = False
+        self._started = False
+        self._finished = False
+
+    def feed(self, token: str) -> str:
+        """Takes the next token of the LLM output.
+
+        Returns: The piece of the answer that can be sent, may be empty.
+        """
+        if self._finished:
+            return ""
+        self._buffer += token
+        if not self._in_answer:
+            start = self._buffer.find(ANSWER_SEPARATOR)
+            if start < 0:
+                return ""
+            self._in_answer = True
+            self._buffer = self._buffer[start + len(ANSWER_SEPARATOR) :]
+        if not self._started:
+            self._buffer = self._buffer.lstrip()
+            self._started = bool(self._buffer)
+        end = self._buffer.find(ANSWER_SEPARATOR)
+        if end >= 0:
+            self._finished = True
+            piece, self._buffer = self._buffer[:end].rstrip(), ""
+            return piece
+        # The tail may be the beginning of the next separator, and the spaces
+        # before it may be trailing ones
+        cut = max(len(self._buffer.rstrip()) - len(ANSWER_SEPARATOR) + 1, 0)
+        cut = len(self._buffer[:cut].rstrip())
+        piece, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return piece
+
+    def flush(self) -> str:
+        """Returns the rest of the answer after the last token.
+
+        The whole output is the answer if it has no separator.
+        """
+        piece, self._buffer = self._buffer, ""
+        if self._finished:
+            return ""
+        return piece.rstrip() if self._in_answer else piece
+
+
 def llama_70b_postprocessing(response: Response) -> str:
     """Postprocessing function to retrieve text answer from hosted llama response.
 
@@ -36,6 +101,135 @@ def llama_8b_postprocessing(response: Response) -> str:
     return parse_answer(json.loads(response.text)["choices"][0]["message"]["content"])
 
 
+def llama_8b_stream_postprocessing(line: str) -> str | None:
+    """Postprocessing function to retrieve a text token from a streamed llama response.
+
+    The service sends server-sent events in the OpenAI chat completions format.
+
+    Args:
+        line (str): One line of the response stream.
+
+    Returns:
+        Optional[str]: Text token or None for service lines and empty deltas.
+    """
+    data_prefix = "data: "
+    if not line.startswith(data_prefix) or line == "data: [DONE]":
+        return None
+    delta = json.loads(line[len(data_prefix) :])["choices"][0]["delta"]
+    return delta.get("content")
+
+
+def function_call_tools(tools: List[Dict]) -> List[Dict]:
+    """Leaves only the names and descriptions of the tools for a function calling request.
+
+    The model does not have to generate the arguments.
+
+    Args:
+        tools (List[Dict]): Tools in the OpenAI format.
+
+    Returns:
+        List[Dict]: Tools without parameters.
+    """
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": tool["function"]["name"],
+                "description": tool["function"].get("description", ""),
+                "parameters": {"type": "object", "properties": {}},
+            },
+        }
+        for tool in tools
+    ]
+
+
+def llama_8b_fc_preprocessing(
+    message: Dict, tools: List[Dict] | None, tokens_limit: int
+) -> Dict:
+    """Turns a llama request into a function calling one.
+
+    The request gets the native tools if they are given, otherwise a text answer
+    with stop sequences, and a small token limit.
+
+    Args:
+        message (Dict): Request to the OpenAI compatible service.
+        tools (Optional[List[Dict]]): Tools to choose from, None to get a text answer.
+        tokens_limit (int): Max number of tokens in the answer.
+
+    Returns:
+        Dict: Function calling request.
+    """
+    message["max_tokens"] = tokens_limit
+    if tools:
+        message["tools"] = function_call_tools(tools)
+        message["tool_choice"] = "required"
+    else:
+        message["stop"] = FC_STOP_SEQUENCES
+    return message
+
+
+def llama_70b_fc_preprocessing(
+    message: Dict, tools: List[Dict] | None, tokens_limit: int
+) -> Dict:
+    """Turns a hosted llama request into a function calling one.
+
+    The service has no native tools, so the answer is limited by the tokens limit
+    and stop words.
+
+    Args:
+        message (Dict): Request to the hosted llama service.
+        tools (Optional[List[Dict]]): Not used, the tools are in the system prompt.
+        tokens_limit (int): Max number of tokens in the answer.
+
+    Returns:
+        Dict: Function calling request.
+    """
+    message["meta"]["tokens_limit"] = str(tokens_limit)
+    message["meta"]["stop_words"] = FC_STOP_SEQUENCES + ["<|eot_id|>"]
+    return message
+
+
+def llama_8b_fc_postprocessing(response: Response) -> str:
+    """Postprocessing function to retrieve the chosen functions.
+
+    The functions are taken from a function calling llama response.
+
+    Args:
+        response (Response): Recieved model's response.
+
+    Returns:
+        str: Names of the called tools separated by spaces, or the text answer
+        if the model did not call the tools.
+
+    Raises:
+        HTTPError: If the service answered with an error.
+    """
+    response.raise_for_status()
+    message = json.loads(response.text)["choices"][0]["message"]
+    tool_calls = message.get("tool_calls") or []
+    if tool_calls:
+        return " ".join(call["function"]["name"] for call in tool_calls)
+    return message.get("content") or ""
+
+
+def vsegpt_fc_postprocessing(response: Response) -> str:
+    """Postprocessing function to retrieve the chosen functions.
+
+    The functions are taken from a function calling response of vsegpt service.
+
+    Args:
+        response (Response): Recieved model's response.
+
+    Returns:
+        str: Names of the called tools separated by spaces, or the text answer
+        if the model did not call the tools.
+    """
+    message = response.choices[0].message
+    if message.tool_calls:
+        return " ".join(call.function.name for call in message.tool_calls)
+    return message.content or ""
+
+
 def vsegpt_postprocessing(response: Response) -> str:
     """Postprocessing function to retrieve text answer from vsegpt service.
 
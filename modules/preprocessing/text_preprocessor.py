@@ -31,16 +31,40 @@ class BaseTextProcessor(TextProcessorInterface):
     Transforms LLM response to str type.
     """
 
-    def __init__(self, input_format: StrTemplateType, out_format: Callable) -> None:
+    def __init__(
+        self,
+        input_format: StrTemplateType,
+        out_format: Callable,
+        stream_format: Callable | None = None,
+        fc_input_format: Callable | None = None,
+        fc_out_format: Callable | None = None,
+    ) -> None:
         """Initialize preprocessor with required input template and output template.
 
         Args:
             input_format (StrTemplateType): Required format of input data for LLM usage.
             out_format (Callable): Function which describes how to transform LLM's response
             to str.
+            stream_format (Optional[Callable]): Function which extracts a text token from
+            one line of a streamed LLM response. None if the model does not support
+            streaming. Defaults to None.
+            fc_input_format (Optional[Callable]): Function which turns a processed input
+            into a function calling request, see preprocess_function_call_input.
+            None if the request is sent as is. Defaults to None.
+            fc_out_format (Optional[Callable]): Function which extracts the chosen
+            functions from a function calling response. None if out_format is used.
+            Defaults to None.
         """
         self.input_format = input_format
         self.out_format = out_format
+        self.stream_format = stream_format
+        self.fc_input_format = fc_input_format
+        self.fc_out_format = fc_out_format
+
+    @property
+    def supports_streaming(self) -> bool:
+        """Returns True if the responses of the model can be streamed."""
+        return self.stream_format is not None
 
     def preprocess_input(self, **kwargs) -> StrTemplateType:
         """Process prompt to acceptable for LLM format in accordance to given format.
@@ -81,3 +105,45 @@ class BaseTextProcessor(TextProcessorInterface):
             str: LLM's response in text format.
         """
         return self.out_format(text)
+
+    def preprocess_function_call_input(
+        self, message: StrTemplateType, tools: List[Dict] | None, tokens_limit: int
+    ) -> StrTemplateType:
+        """Turns a processed input into a function calling request.
+
+        Args:
+            message (StrTemplateType): Input processed with preprocess_input.
+            tools (Optional[List[Dict]]): Tools to choose from, None if the model
+            must answer with the names of the functions in text.
+            tokens_limit (int): Max number of tokens in the answer.
+
+        Returns:
+            StrTemplateType: Function calling request.
+        """
+        if self.fc_input_format is None:
+            return message
+        return self.fc_input_format(message, tools, tokens_limit)
+
+    def preprocess_function_call_output(self, response: Response) -> str:
+        """Retrieves the names of the chosen functions from the received response.
+
+        Args:
+            response (Response): Response received from the model.
+
+        Returns:
+            str: Names of the chosen functions in text format.
+        """
+        if self.fc_out_format is None:
+            return self.out_format(response)
+        return self.fc_out_format(response)
+
+    def preprocess_stream_chunk(self, line: str) -> str | None:
+        """Retrieves a text token from one line of a streamed response.
+
+        Args:
+            line (str): Line received from the model's response stream.
+
+        Returns:
+            Optional[str]: Text token or None if the line does not contain one.
+        """
+        return self.stream_format(line)
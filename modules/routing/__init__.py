@@ -0,0 +1 @@
+"""Local models that choose the pipelines and the functions for the questions."""
@@ -0,0 +1,182 @@
+from functools import lru_cache
+import logging
+from pathlib import Path
+from typing import List, Tuple
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.multiclass import OneVsRestClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.pipeline import Pipeline
+
+from modules.routing.text_features import build_text_features
+from modules.variables import ROOT
+
+
+logger = logging.getLogger(__name__)
+
+FUNCTION_SELECTOR_PATH = Path(
+    ROOT, "modules", "routing", "artifacts", "function_selector.joblib"
+)
+# Candidate thresholds of the labels, a label that is never selected gets 1.0
+THRESHOLD_GRID = np.arange(0.1, 0.95, 0.05)
+# Min number of training questions of a label to tune its threshold
+MIN_LABEL_QUESTIONS = 2
+
+
+def tune_thresholds(probabilities: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """Chooses the threshold of each label that maximizes its F1 score.
+
+    Args:
+        probabilities: Out-of-fold probabilities of the labels, one row per question.
+        labels: Correct labels of the questions, 0 or 1.
+
+    Returns: Threshold of each label.
+    """
+    thresholds = np.ones(labels.shape[1])
+    for label in range(labels.shape[1]):
+        positives = labels[:, label] == 1
+        if positives.sum() < MIN_LABEL_QUESTIONS:
+            continue
+        f1 = []
+        for threshold in THRESHOLD_GRID:
+            selected = probabilities[:, label] >= threshold
+            f1.append(2 * selected[positives].sum() / (selected.sum() + positives.sum()))
+        thresholds[label] = THRESHOLD_GRID[int(np.argmax(f1))]
+    return thresholds
+
+
+class FunctionSelector:
+    """Chooses the summary table functions with a local multi-label text classifier.
+
+    Every function has its own logistic regression over TF-IDF features and its
+    own probability threshold, see train_function_selector. The functions with
+    less than MIN_LABEL_QUESTIONS training questions are never chosen, so the
+    selector is not confident if it chooses no functions.
+    """
+
+    def __init__(
+        self,
+        functions: List[str],
+        model: Pipeline | None = None,
+        thresholds: np.ndarray | None = None,
+        coverage: np.ndarray | None = None,
+    ) -> None:
+        """Creates a selector.
+
+        Args:
+            functions: Names of the functions to choose from.
+            model: Fitted classifier, a new unfitted one is created if None.
+            thresholds: Probability threshold of each function, 0.5 if None.
+            coverage: Number of training questions of each function, the functions
+                with the threshold of 1.0 are considered not covered if None.
+        """
+        if model is None:
+            model = make_pipeline(
+                build_text_features(),
+                OneVsRestClassifier(
+                    LogisticRegression(C=100, max_iter=1000, class_weight="balanced")
+                ),
+            )
+        if thresholds is None:
+            thresholds = np.full(len(functions), 0.5)
+        self.functions = functions
+        self.model = model
+        self.thresholds = thresholds
+        self.coverage = coverage
+
+    @property
+    def covered(self) -> np.ndarray:
+        """Whether each function has enough training questions to be chosen."""
+        if self.coverage is None:
+            return self.thresholds < 1.0
+        return self.coverage >= MIN_LABEL_QUESTIONS
+
+    def binarize(self, function_sets: List[List[str]]) -> np.ndarray:
+        """Converts the function names of each question to a row of 0 and 1."""
+        return np.array(
+            [
+                [int(function in function_set) for function in self.functions]
+                for function_set in function_sets
+            ]
+        )
+
+    def fit(
+        self, questions: List[str], function_sets: List[List[str]]
+    ) -> "FunctionSelector":
+        """Trains the classifier.
+
+        Args:
+            questions: Questions from the users.
+            function_sets: Names of the correct functions for each question,
+                the functions that are not in self.functions are ignored.
+
+        Returns: The selector itself.
+        """
+        labels = self.binarize(function_sets)
+        self.model.fit(questions, labels)
+        self.coverage = labels.sum(axis=0)
+        return self
+
+    def select(self, probabilities: np.ndarray) -> Tuple[List[str], float]:
+        """Chooses the functions by their probabilities.
+
+        Args:
+            probabilities: Probability of each function.
+
+        Returns: A tuple (functions, confidence) with the chosen functions and the
+        confidence of the choice: the smallest distance of a probability of a covered
+        function from its threshold, relative to the distance from the threshold
+        to 0 or 1. The confidence is 0 if no functions are chosen, as the question
+        may need a function that is not covered.
+        """
+        covered = self.covered
+        selected = (probabilities >= self.thresholds) & covered
+        if not selected.any():
+            return [], 0.0
+        margins = np.where(
+            selected,
+            (probabilities - self.thresholds) / np.maximum(1 - self.thresholds, 1e-9),
+            (self.thresholds - probabilities) / self.thresholds,
+        )
+        functions = [self.functions[i] for i in np.flatnonzero(selected)]
+        return functions, float(margins[covered].min())
+
+    def predict(self, question: str) -> Tuple[List[str], float]:
+        """Chooses the functions for the question.
+
+        Args:
+            question: A question from the user.
+
+        Returns: A tuple (functions, confidence), see select().
+        """
+        return self.select(self.model.predict_proba([question])[0])
+
+    def save(self, path: Path = FUNCTION_SELECTOR_PATH) -> None:
+        """Serializes the fitted classifier and the thresholds to the file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump(
+            {
+                "functions": self.functions,
+                "model": self.model,
+                "thresholds": self.thresholds,
+                "coverage": self.coverage,
+            },
+            path,
+        )
+
+    @classmethod
+    def load(cls, path: Path = FUNCTION_SELECTOR_PATH) -> "FunctionSelector":
+        """Loads the selector serialized with save()."""
+        return cls(**joblib.load(path))
+
+
+@lru_cache(maxsize=1)
+def get_function_selector() -> FunctionSelector | None:
+    """Returns the trained selector, None if its model could not be loaded."""
+    try:
+        return FunctionSelector.load()
+    except Exception as e:
+        logger.warning(f"Could NOT load the function selector: {e}")
+        return None
@@ -0,0 +1,84 @@
+from functools import lru_cache
+import logging
+from pathlib import Path
+from typing import List, Tuple
+
+import joblib
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.pipeline import Pipeline
+
+from modules.routing.text_features import build_text_features
+from modules.variables import ROOT
+
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_ROUTER_PATH = Path(
+    ROOT, "modules", "routing", "artifacts", "pipeline_router.joblib"
+)
+
+
+class PipelineRouter:
+    """Chooses the pipeline for a question with a local text classifier.
+
+    The classifier is a logistic regression over TF-IDF features trained on
+    the questions labelled with the correct pipeline, see train_pipeline_router.
+    """
+
+    def __init__(self, model: Pipeline | None = None) -> None:
+        """Creates a router.
+
+        Args:
+            model: Fitted classifier, a new unfitted one is created if None.
+        """
+        if model is None:
+            model = make_pipeline(
+                build_text_features(), LogisticRegression(C=10, max_iter=1000)
+            )
+        self.model = model
+
+    def fit(self, questions: List[str], pipelines: List[str]) -> "PipelineRouter":
+        """Trains the classifier.
+
+        Args:
+            questions: Questions from the users.
+            pipelines: Names of the correct pipelines for the questions.
+
+        Returns: The router itself.
+        """
+        self.model.fit(questions, pipelines)
+        return self
+
+    def predict(self, question: str) -> Tuple[str, float]:
+        """Chooses the pipeline for the question.
+
+        Args:
+            question: A question from the user.
+
+        Returns: A tuple (pipeline, confidence) with the name of the most probable
+        pipeline and its probability.
+        """
+        probabilities = self.model.predict_proba([question])[0]
+        best = probabilities.argmax()
+        return self.model.classes_[best], float(probabilities[best])
+
+    def save(self, path: Path = PIPELINE_ROUTER_PATH) -> None:
+        """Serializes the fitted classifier to the file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump(self.model, path)
+
+    @classmethod
+    def load(cls, path: Path = PIPELINE_ROUTER_PATH) -> "PipelineRouter":
+        """Loads the classifier serialized with save()."""
+        return cls(joblib.load(path))
+
+
+@lru_cache(maxsize=1)
+def get_pipeline_router() -> PipelineRouter | None:
+    """Returns the trained router, None if its model could not be loaded."""
+    try:
+        return PipelineRouter.load()
+    except Exception as e:
+        logger.warning(f"Could NOT load the pipeline router: {e}")
+        return None
@@ -0,0 +1,17 @@
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.pipeline import FeatureUnion
+from sklearn.pipeline import make_union
+
+
+def build_text_features() -> FeatureUnion:
+    """Builds TF-IDF features of the questions for the local classifiers.
+
+    Character n-grams within the words are robust to the Russian inflections
+    and typos, word unigrams and bigrams keep the service names.
+
+    Returns: Unfitted feature extractor.
+    """
+    return make_union(
+        TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 5), sublinear_tf=True),
+        TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True),
+    )
@@ -0,0 +1,158 @@
+"""Trains the local selector of the accessibility functions.
+
+Writes the accuracy and latency report of the selector.
+
+Run from the project root:
+
+    python -m modules.routing.train_function_selector
+"""
+
+import logging
+from pathlib import Path
+import re
+from typing import List
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import KFold
+
+from agents.tools.accessibility_tools import accessibility_tools
+from modules.routing.function_selector import FUNCTION_SELECTOR_PATH
+from modules.routing.function_selector import FunctionSelector
+from modules.routing.function_selector import MIN_LABEL_QUESTIONS
+from modules.routing.function_selector import tune_thresholds
+from modules.variables import ROOT
+from modules.variables.settings import app_settings
+from utils.measure_time import latency_summary
+from utils.measure_time import Timer
+
+
+path_to_data = Path(ROOT, "pipelines", "tests", "test_data")
+path_to_results = Path(
+    ROOT,
+    "pipelines",
+    "tests",
+    "test_results",
+    "accessibility_pipeline",
+    "local_function_selector_results.txt",
+)
+functions = [tool["function"]["name"] for tool in accessibility_tools]
+logger = logging.getLogger(__name__)
+
+
+def parse_functions(value: str) -> List[str]:
+    """Extracts the function names from the label of a question."""
+    return re.findall(r"get_general_stats_\w+", value)
+
+
+def load_questions() -> pd.DataFrame:
+    """Loads the unique questions labelled with the correct functions.
+
+    The questions labelled only with the default functions of the territory
+    (get_general_stats_city etc.) have no accessibility functions to choose.
+    """
+    data_eng = pd.read_csv(Path(path_to_data, "accessibility_dataset_eng.csv"))
+    data_rus = pd.read_csv(Path(path_to_data, "urb_accessibility_questions.csv"))
+    data_rus = data_rus.rename(
+        columns={"Вопрос": "question", "Датасет": "correct_functions"}
+    )
+    data = pd.concat([data_eng, data_rus])[["question", "correct_functions"]].dropna()
+    data = data.drop_duplicates("question").reset_index(drop=True)
+    data["correct_functions"] = data["correct_functions"].apply(parse_functions)
+    return data
+
+
+def train_function_selector(folds: int = 5) -> str:
+    """Trains the selector on all the questions and saves the model and the report.
+
+    The thresholds are tuned and the selector is evaluated with cross-validation.
+
+    Args:
+        folds: Number of cross-validation folds.
+
+    Returns: The report.
+    """
+    data = load_questions()
+    questions = data["question"]
+    labels = FunctionSelector(functions).binarize(data["correct_functions"])
+    threshold = app_settings.function_selector_threshold
+
+    probabilities = np.zeros(labels.shape)
+    for train, test in KFold(folds, shuffle=True, random_state=0).split(questions):
+        model = FunctionSelector(functions).model.fit(questions[train], labels[train])
+        probabilities[test] = model.predict_proba(questions[test])
+    thresholds = tune_thresholds(probabilities, labels)
+    # The thresholds are tuned on the same folds, so the estimate is optimistic
+    coverage = labels.sum(axis=0)
+    cv_selector = FunctionSelector(functions, thresholds=thresholds, coverage=coverage)
+    predictions = [cv_selector.select(row) for row in probabilities]
+    predicted = cv_selector.binarize([funcs for funcs, _ in predictions])
+    confidence = np.array([confidence for _, confidence in predictions])
+    correct = (predicted == labels).all(axis=1)
+    # The metric of choose_functions_test: all the correct functions are chosen
+    covered = ((predicted == 1) | (labels == 0)).all(axis=1)
+    confident = confidence >= threshold
+    # Below the threshold the LLM chooses the functions
+    correct_confident = correct[confident].mean() if confident.any() else 0.0
+    covered_confident = covered[confident].mean() if confident.any() else 0.0
+
+    selector = FunctionSelector(functions, thresholds=thresholds)
+    selector.fit(questions.tolist(), data["correct_functions"].tolist())
+    selector.save()
+    latencies = []
+    for question in questions:
+        with Timer() as t:
+            selector.predict(question)
+            latencies.append(t.seconds_from_start)
+    latency = latency_summary(latencies)
+
+    thresholds_report = "\n".join(
+        f"  {function}: {round(threshold, 2)} ({int(positives)} questions)"
+        + ("" if is_covered else ", not covered")
+        for function, threshold, positives, is_covered in zip(
+            functions, thresholds, coverage, selector.covered
+        )
+    )
+    not_covered = [
+        f for f, is_covered in zip(functions, selector.covered) if not is_covered
+    ]
+    if not_covered:
+        logger.warning(
+            f"Functions without {MIN_LABEL_QUESTIONS} training questions are never "
+            f"chosen locally: {not_covered}"
+        )
+    not_covered_report = ", ".join(not_covered) or "none"
+    report = "\n".join(
+        [
+            f"Total questions: {len(data)}",
+            "Questions without accessibility functions: "
+            f"{int((labels.sum(axis=1) == 0).sum())}",
+            f"Cross-validation folds: {folds}",
+            f"Function thresholds (functions with less than {MIN_LABEL_QUESTIONS} "
+            "questions are not covered):",
+            thresholds_report,
+            "Functions not covered, chosen only by the LLM when no functions are "
+            f"chosen locally: {not_covered_report}",
+            f"Percentage of exactly chosen functions: {round(correct.mean() * 100, 2)}",
+            "Percentage of questions with all correct functions chosen: "
+            f"{round(covered.mean() * 100, 2)}",
+            f"Confidence threshold: {threshold}",
+            "Percentage of questions with functions chosen locally: "
+            f"{round(confident.mean() * 100, 2)}",
+            "Percentage of exactly chosen functions when chosen locally: "
+            f"{round(correct_confident * 100, 2)}",
+            "Percentage of questions with all correct functions chosen locally: "
+            f"{round(covered_confident * 100, 2)}",
+            f"Average function choosing time, ms: {round(latency['mean'] * 1000, 3)}",
+            f"P95 function choosing time, ms: {round(latency['p95'] * 1000, 3)}",
+            f"Model: {FUNCTION_SELECTOR_PATH.relative_to(ROOT)}",
+        ]
+    )
+    path_to_results.parent.mkdir(parents=True, exist_ok=True)
+    with open(path_to_results, "w") as f:
+        print(report, file=f)
+    return report
+
+
+if __name__ == "__main__":
+    print(train_function_selector())
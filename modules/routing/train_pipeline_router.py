@@ -0,0 +1,98 @@
+"""Trains the local pipeline router and writes its accuracy and latency report.
+
+Run from the project root:
+
+    python -m modules.routing.train_pipeline_router
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import cross_val_predict
+from sklearn.model_selection import StratifiedKFold
+
+from modules.routing.pipeline_router import PIPELINE_ROUTER_PATH
+from modules.routing.pipeline_router import PipelineRouter
+from modules.variables import ROOT
+from modules.variables.settings import app_settings
+from utils.measure_time import latency_summary
+from utils.measure_time import Timer
+
+
+path_to_data = Path(ROOT, "pipelines", "tests", "test_data")
+path_to_results = Path(
+    ROOT,
+    "pipelines",
+    "tests",
+    "test_results",
+    "pipeline_selection",
+    "local_pipeline_router_results.txt",
+)
+datasets = ["questions_for_test.csv", "complete_dataset.csv"]
+
+
+def load_questions() -> pd.DataFrame:
+    """Loads the unique questions labelled with the correct pipeline."""
+    data = pd.concat([pd.read_csv(Path(path_to_data, dataset)) for dataset in datasets])
+    data = data[["question", "correct_pipeline"]].dropna()
+    return data.drop_duplicates("question").reset_index(drop=True)
+
+
+def train_pipeline_router(folds: int = 5) -> str:
+    """Evaluates the router with cross-validation and trains it on all the questions.
+
+    The model and the report are saved.
+
+    Args:
+        folds: Number of cross-validation folds.
+
+    Returns: The report.
+    """
+    data = load_questions()
+    questions, pipelines = data["question"], data["correct_pipeline"].to_numpy()
+    threshold = app_settings.pipeline_router_threshold
+
+    probabilities = cross_val_predict(
+        PipelineRouter().model,
+        questions,
+        pipelines,
+        cv=StratifiedKFold(folds, shuffle=True, random_state=0),
+        method="predict_proba",
+    )
+    classes = np.unique(pipelines)
+    predicted = classes[probabilities.argmax(axis=1)]
+    confidence = probabilities.max(axis=1)
+    correct = predicted == pipelines
+    confident = confidence >= threshold
+    # Below the threshold the LLM chooses the pipeline
+    accuracy_confident = correct[confident].mean() if confident.any() else 0.0
+
+    router = PipelineRouter().fit(questions.tolist(), pipelines.tolist())
+    router.save()
+    latencies = []
+    for question in questions:
+        with Timer() as t:
+            router.predict(question)
+            latencies.append(t.seconds_from_start)
+    latency = latency_summary(latencies)
+    local_accuracy = round(accuracy_confident * 100, 2)
+
+    report = f"""Total questions: {len(data)}
+Questions per pipeline: {data["correct_pipeline"].value_counts().to_dict()}
+Cross-validation folds: {folds}
+Percentage of correctly chosen pipeline: {round(correct.mean() * 100, 2)}
+Confidence threshold: {threshold}
+Percentage of questions routed locally: {round(confident.mean() * 100, 2)}
+Percentage of correctly chosen pipeline when routed locally: {local_accuracy}
+Average pipeline choosing time, ms: {round(latency["mean"] * 1000, 3)}
+P95 pipeline choosing time, ms: {round(latency["p95"] * 1000, 3)}
+Model: {PIPELINE_ROUTER_PATH.relative_to(ROOT)}"""
+    path_to_results.parent.mkdir(parents=True, exist_ok=True)
+    with open(path_to_results, "w") as f:
+        print(report, file=f)
+    return report
+
+
+if __name__ == "__main__":
+    print(train_pipeline_router())
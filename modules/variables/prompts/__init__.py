@@ -1,5 +1,4 @@
 from modules.variables.prompts.prompts import accessibility_sys_prompt
-from modules.variables.prompts.prompts import buildings_sys_prompt
 from modules.variables.prompts.prompts import strategy_sys_prompt
 from modules.variables.prompts.templates import all_gpt_template
 from modules.variables.prompts.templates import llama_8b_template
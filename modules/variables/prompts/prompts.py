@@ -38,3 +38,23 @@ with keyword ’ANSWER’, and explanation with ’EXPLANATION’.
 as are necessary to answer the
 question given the context, but not more five sentences. 
 """
+
+multi_intent_sys_prompt = r"""Answer the question following the rules below. For answer
+you must use context provided by the user. The context consists of several parts
+collected from different sources, each part starts with its title.
+Rules:
+1. You must use only provided information for the answer.
+2. The question may ask about several things, answer each of them using
+the relevant part of the context.
+3. Add a unit of measurement to the numbers in the answer.
+4. If data for an answer is absent, answer that
+data was not provided or absent and
+mention for what field there was no data.
+5. If you do not know how to answer the questions, say so.
+6. Before giving an answer to the user question,
+provide an explanation. Mark the answer
+with keyword ’ANSWER’, and explanation with ’EXPLANATION’.
+7. The answer should consist of as many sentences
+as are necessary to answer all parts of the
+question given the context, but not more six sentences.
+"""
@@ -2,7 +2,7 @@ llama_70b_template = (
     r'{"job_id":"${job_id}",'
     r'"meta":{"temperature":"${temperature}",'
     r'"tokens_limit":"${token_limit}",'
-    r'"stop_words":["string"]},'
+    r'"stop_words":[]},'
     r'"content":"<|begin_of_text|><|start_header_id|>system<|end_header_id|>${system_prompt}'
     r"<|eot_id|><|start_header_id|>user<|end_header_id|>${user_prompt}"
     r'<|eot_id|><|start_header_id|>assistant<|end_header_id|>"}'
@@ -0,0 +1,131 @@
+from typing import Dict
+
+from pydantic_settings import BaseSettings
+from pydantic_settings import SettingsConfigDict
+
+from modules.variables.definitions import ROOT
+
+
+class AppSettings(BaseSettings):
+    """Settings of the question answering service.
+
+    Every field can be overridden in config.env or with an environment variable
+    of the same name (case-insensitive).
+    """
+
+    model_config = SettingsConfigDict(
+        env_file=ROOT / "config.env", env_file_encoding="utf-8", extra="ignore"
+    )
+
+    # Admission control of the user requests
+    max_concurrent_requests: int = 32
+    max_queued_requests: int = 64
+    request_queue_timeout: float = 30.0
+
+    # Time budget of a request, split across routing, context retrieval and generation
+    request_timeout: float = 120.0
+    routing_time_share: float = 0.25
+    context_time_share: float = 0.5
+    http_timeout: float = 60.0
+    # Keep-alive connections to the LLM services: max connections kept open per host,
+    # number of hosts, idle time before a connection is closed and connect timeout
+    llm_pool_size: int = 32
+    llm_pool_hosts: int = 4
+    llm_keepalive_expiry: float = 30.0
+    llm_connect_timeout: float = 5.0
+    # Types of the LLM services by their host:port, e.g. {"10.0.0.1:8000": "llama-8b"},
+    # the types of the other services are requested from them and refreshed after the TTL
+    # (or after the error TTL if the service answered with an error)
+    llm_model_types: Dict[str, str] = {}
+    model_type_cache_ttl: float = 3600.0
+    model_type_error_ttl: float = 30.0
+    # Timeout of a single summary table request, the other tables are still used
+    table_timeout: float = 30.0
+    # Budget of the summary tables of a question: max number of tables, max p95
+    # latency of a table in seconds and max total size of the tables in tokens
+    table_max_calls: int = 5
+    table_latency_budget: float = 20.0
+    table_token_budget: int = 8000
+    # Age in seconds after which the latency of a table is not used by the budget
+    # and the interval in seconds between the probes of a table dropped by it
+    table_metrics_max_age: float = 600.0
+    table_probe_interval: float = 60.0
+    # Summary tables requested at the same time for a question and the cache of
+    # the tables in the tool registry
+    table_max_parallel: int = 4
+    table_cache_enabled: bool = True
+    table_cache_max_size: int = 1024
+    table_cache_ttl: float = 3600.0
+    # Time to live of the cached tables by the tables (e.g. {"complaints": 600}),
+    # the others use TABLE_CACHE_TTL
+    table_cache_ttls: Dict[str, float] = {}
+
+    # Concurrency limits of the upstream services
+    llm_max_concurrency: int = 8
+    llm_fc_max_concurrency: int = 16
+    chroma_max_concurrency: int = 8
+    embeddings_max_concurrency: int = 16
+    tables_max_concurrency: int = 16
+
+    # Function calling requests: max tokens in the answer and native tools for the
+    # OpenAI compatible services, enable if the service supports them
+    fc_tokens_limit: int = 128
+    fc_native_tools: bool = False
+
+    # Background jobs settings
+    jobs_workers: int = 4
+    jobs_max_queued: int = 256
+    jobs_retention: float = 3600.0
+    jobs_timeout: float = 900.0
+
+    # Plan cache: the functions chosen by the LLM for a question template
+    plan_cache_enabled: bool = True
+    plan_cache_max_size: int = 4096
+    plan_cache_ttl: float = 86400.0
+
+    # Speculative retrieval for both pipelines while the LLM chooses the pipeline,
+    # only if the ChromaDB and summary tables slots in use are below the max load
+    speculative_routing: bool = False
+    speculation_max_load: float = 0.5
+
+    # Multi-intent questions: all the chosen pipelines collect the context concurrently
+    # for one answer generation, otherwise only the first chosen pipeline is run
+    multi_intent: bool = False
+
+    # Answer generation by the fast model (LLAMA_FC_URL) for the simple questions
+    # and by the large one (LLAMA_URL) for the others, see modules/models/model_tiers.py
+    model_tiers_enabled: bool = False
+    model_tier_fast_max_score: int = 0
+    model_tier_max_question_tokens: int = 30
+    model_tier_max_context_tokens: int = 3000
+    model_tier_max_context_parts: int = 4
+
+    # Local pipeline router, the LLM chooses the pipeline below the threshold
+    pipeline_router_enabled: bool = True
+    pipeline_router_threshold: float = 0.8
+
+    # Local selector of the accessibility functions, the LLM chooses below the threshold
+    function_selector_enabled: bool = True
+    function_selector_threshold: float = 0.5
+
+    # Batch questions settings
+    batch_max_size: int = 100
+    batch_max_parallelism: int = 4
+
+    # Concurrent identical questions share one execution of the pipelines
+    coalesce_questions: bool = True
+
+    # Exact-match answer cache settings
+    answer_cache_enabled: bool = True
+    answer_cache_max_size: int = 1024
+    answer_cache_ttl: float = 3600.0
+
+    # Semantic answer cache settings, disabled until the threshold is measured
+    # on the test questions
+    semantic_cache_enabled: bool = False
+    semantic_cache_threshold: float = 0.95
+    semantic_cache_max_size: int = 1024
+    semantic_cache_ttl: float = 3600.0
+
+
+app_settings = AppSettings()
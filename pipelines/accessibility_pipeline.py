@@ -1,5 +1,5 @@
+import asyncio
 import logging
-import os
 from pathlib import Path
 from typing import List
 
@@ -7,10 +7,16 @@ from agents.agent import Agent
 from agents.prompts import fc_sys_prompt
 from agents.prompts import fc_user_prompt
 from agents.tools.accessibility_tools import accessibility_tools
-from modules.models.connector_creator import LanguageModelCreator
+from modules.cache.plan_cache import cache_plan
+from modules.cache.plan_cache import get_cached_plan
+from modules.cache.plan_cache import plan_cache_key
+from modules.routing.function_selector import get_function_selector
 from modules.variables import ROOT
 from modules.variables.prompts import *
+from modules.variables.settings import app_settings
+from pipelines.generation import generate_answer
 from utils.measure_time import Timer
+from utils.shared_calls import sharing_calls
 
 
 path_to_config = Path(ROOT, "config.env")
@@ -39,13 +45,61 @@ def set_default_value_if_empty(res_funcs: List[str]) -> List[str]:
     return res_funcs
 
 
-def service_accessibility_pipeline(
+async def prefetch_default_tables(coordinates: List, t_type: str, t_id: str) -> str:
+    """Requests the summary tables of the default functions of the territory.
+
+    The tables are requested before the other functions are chosen.
+
+    Each table is requested the same way as in service_accessibility_context,
+    so inside a sharing_calls() block the context collection reuses them.
+
+    Args:
+        coordinates: The coordinates of the territory selected on the map.
+        t_type: The type of territory that was selected on the map.
+        t_id: The name of selected territory.
+
+    Returns: The context from the default tables.
+    """
+    default_funcs = define_default_functions(t_type, t_id, coordinates)
+    if not default_funcs:
+        return ""
+    return await Agent.a_retrieve_context_from_api(
+        t_id, t_type, coordinates, default_funcs
+    )
+
+
+def choose_functions_locally(question: str) -> List[str] | None:
+    """Chooses the accessibility functions with the local selector.
+
+    Args:
+        question: A question from the user.
+
+    Returns: The chosen functions, None if the selector is not confident
+    or chooses no functions.
+    """
+    selector = get_function_selector() if app_settings.function_selector_enabled else None
+    if selector is None:
+        return None
+    with Timer() as t:
+        res_funcs, confidence = selector.predict(question)
+    if confidence < app_settings.function_selector_threshold:
+        logger.info(f"Local function selector is not confident ({confidence:.2f})")
+        return None
+    logger.info(f"Function choose time: {t.seconds_from_start} sec")
+    logger.info(f"Functions chosen by the local selector ({confidence:.2f}): {res_funcs}")
+    return res_funcs
+
+
+async def service_accessibility_context(
     question: str, coordinates: List, t_type: str, t_id: str
 ) -> str:
-    """Pipeline designed to handle service accessibility data.
-    Uses a function calling LLM to choose the correct data source
-    to collect the context for the given question. Extracts the
-    context and passes it to another LLM to answer the question.
+    """Collects the context for the given question.
+
+    The data sources are chosen with the plan cache, the local selector or a
+    function calling LLM if the selector is not confident.
+
+    The default tables of the territory do not depend on the choice, so they are
+    requested while the functions are chosen and merged with the chosen tables.
 
     Args:
         question: A question from the user.
@@ -53,12 +107,36 @@ def service_accessibility_pipeline(
         t_type: The type of territory that was selected on the map.
         t_id: The name of selected territory.
 
-    Returns: Answer to the question.
+    Returns: The context for the LLM.
     """
+    with sharing_calls():
+        # The chosen tables are requested in the same block and reuse the default ones
+        prefetch = asyncio.create_task(prefetch_default_tables(coordinates, t_type, t_id))
+        try:
+            return await _collect_accessibility_context(
+                question, coordinates, t_type, t_id
+            )
+        finally:
+            if not prefetch.done():
+                prefetch.cancel()
+
+
+async def _collect_accessibility_context(
+    question: str, coordinates: List, t_type: str, t_id: str
+) -> str:
+    """Chooses the functions and requests their tables with the default ones."""
     agent = Agent("LLAMA_FC_URL", accessibility_tools)
-    with Timer() as t:
-        res_funcs = agent.choose_functions(question, fc_sys_prompt, fc_user_prompt)
-        logger.info(f"Function choose time: {t.seconds_from_start} sec")
+    plan_key = plan_cache_key("functions", accessibility_tools, question, t_id)
+    res_funcs = get_cached_plan(plan_key)
+    if res_funcs is None:
+        res_funcs = choose_functions_locally(question)
+    if res_funcs is None:
+        with Timer() as t:
+            res_funcs = await agent.a_choose_functions(
+                question, fc_sys_prompt, fc_user_prompt
+            )
+            logger.info(f"Function choose time: {t.seconds_from_start} sec")
+        cache_plan(plan_key, res_funcs)
     # with Timer() as t:
     #     res_funcs = agent.check_functions(
     #         question, llm_res_funcs, base_sys_prompt, ac_cor_user_prompt
@@ -68,15 +146,28 @@ def service_accessibility_pipeline(
     res_funcs = set_default_value_if_empty(res_funcs)
 
     with Timer() as t:
-        context = agent.retrieve_context_from_api(t_id, t_type, coordinates, res_funcs)
+        context = await agent.a_retrieve_context_from_api(
+            t_id, t_type, coordinates, res_funcs
+        )
         logger.info(f"Context retrieve time: {t.seconds_from_start} sec")
+    return context
 
-    model_url = os.environ.get("LLAMA_URL")
-    model_connector = LanguageModelCreator.create_llm_connector(
-        model_url, accessibility_sys_prompt
-    )
-    with Timer() as t:
-        response = model_connector.generate(question, context)
-        logger.info(f"Answer generation time: {t.seconds_from_start} sec")
 
-    return response
+async def service_accessibility_pipeline(
+    question: str, coordinates: List, t_type: str, t_id: str
+) -> str:
+    """Pipeline designed to handle service accessibility data.
+    Uses a function calling LLM to choose the correct data source
+    to collect the context for the given question. Extracts the
+    context and passes it to another LLM to answer the question.
+
+    Args:
+        question: A question from the user.
+        coordinates: The coordinates of the territory selected on the map.
+        t_type: The type of territory that was selected on the map.
+        t_id: The name of selected territory.
+
+    Returns: Answer to the question.
+    """
+    context = await service_accessibility_context(question, coordinates, t_type, t_id)
+    return await generate_answer(question, context, accessibility_sys_prompt)
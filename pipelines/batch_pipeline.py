@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from typing import Any, Dict, List
+import uuid
+
+from asgi_correlation_id.context import correlation_id
+
+from pipelines.master_pipeline import answer_question_with_llm
+from utils.admission import OverloadedError
+from utils.admission import request_admission
+from utils.measure_time import latency_summary
+from utils.measure_time import Timer
+from utils.shared_calls import sharing_calls
+from utils.streaming import stage_events
+
+
+logger = logging.getLogger(__name__)
+
+
+async def answer_batch_item(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+    """Answers one question of a batch.
+
+    The question gets its own correlation id, so its stage records are collected
+    separately from the other questions of the batch.
+
+    Args:
+        index: Position of the question in the batch.
+        item: Arguments of answer_question_with_llm.
+
+    Returns: A dictionary with the answer (llm_res), the stage records of the question
+    (request_logs), its processing time in seconds and the error message if the
+    question could not be answered.
+    """
+    batch_id = correlation_id.get()
+    correlation_id.set(uuid.uuid4().hex)
+    logger.info(f"Batch {batch_id} question {index}: {item['question']}")
+    queue = asyncio.Queue()
+    llm_res, error = None, None
+    with stage_events(queue), Timer() as t:
+        try:
+            llm_res = await answer_question_with_llm(**item)
+        except Exception as e:
+            logger.error(f"Could NOT answer the question: {e}")
+            error = str(e)
+        seconds = t.seconds_from_start
+    stage_messages = []
+    while not queue.empty():
+        stage_messages.append(queue.get_nowait())
+    return {
+        "llm_res": llm_res,
+        "request_logs": "\n".join(stage_messages),
+        "seconds": seconds,
+        "error": error,
+    }
+
+
+async def answer_questions_with_llm(
+    questions: List[Dict[str, Any]], max_parallelism: int
+) -> Dict[str, Any]:
+    """Answers a batch of questions concurrently.
+
+    Identical summary tables and ChromaDB lookups requested by the questions
+    of the batch are fetched once and shared. Every running question takes a slot
+    of the request admission, a question rejected by the admission gets an error.
+
+    Args:
+        questions: Arguments of answer_question_with_llm for each question.
+        max_parallelism: Maximum number of questions processed at the same time.
+
+    Returns: A dictionary with the results of each question (see answer_batch_item)
+    and the latency summary of the batch.
+    """
+    semaphore = asyncio.Semaphore(max_parallelism)
+
+    async def answer_with_limit(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            with Timer() as t:
+                try:
+                    await request_admission.acquire()
+                except OverloadedError as e:
+                    logger.warning(f"Batch question {index} is rejected: {e}")
+                    return {
+                        "llm_res": None,
+                        "request_logs": "",
+                        "seconds": t.seconds_from_start,
+                        "error": str(e),
+                    }
+            try:
+                return await answer_batch_item(index, item)
+            finally:
+                request_admission.release()
+
+    with sharing_calls(), Timer() as t:
+        results = await asyncio.gather(
+            *[answer_with_limit(index, item) for index, item in enumerate(questions)]
+        )
+        batch_seconds = t.seconds_from_start
+    summary = {
+        "seconds": batch_seconds,
+        "failed": sum(result["error"] is not None for result in results),
+        "questions": latency_summary([result["seconds"] for result in results]),
+    }
+    logger.info(f"Batch latency: {summary}")
+    return {"results": results, "summary": summary}
@@ -0,0 +1,66 @@
+import logging
+import os
+from typing import AsyncIterator
+
+from modules.models.connector_creator import LanguageModelCreator
+from modules.models.model_tiers import model_tiers
+from modules.models.model_tiers import TIER_URLS
+from utils.admission import upstream
+from utils.measure_time import Timer
+
+
+logger = logging.getLogger(__name__)
+
+
+async def generate_answer(question: str, context: str, sys_prompt: str) -> str:
+    """Passes the collected context to the LLM to answer the question.
+
+    The LLM is chosen by the complexity of the question, see ModelTiers.
+
+    Args:
+        question: A question from the user.
+        context: Context collected by a pipeline.
+        sys_prompt: System prompt of the pipeline.
+
+    Returns: Answer to the question.
+    """
+    tier = model_tiers.choose(question, context)
+    model_url = os.environ.get(TIER_URLS[tier])
+    model_connector = await LanguageModelCreator.a_create_llm_connector(
+        model_url, sys_prompt
+    )
+    async with upstream(TIER_URLS[tier]).slot():
+        with Timer() as t:
+            response = await model_connector.a_generate(question, context)
+            logger.info(f"Answer generation time: {t.seconds_from_start} sec")
+            model_tiers.record(tier, t.seconds_from_start)
+    return response
+
+
+async def stream_answer(
+    question: str, context: str, sys_prompt: str
+) -> AsyncIterator[str]:
+    """Passes the collected context to the LLM and yields the answer tokens.
+
+    The tokens are yielded as soon as the LLM produces them. The LLM is chosen
+    by the complexity of the question, see ModelTiers.
+
+    Args:
+        question: A question from the user.
+        context: Context collected by a pipeline.
+        sys_prompt: System prompt of the pipeline.
+
+    Yields:
+        Tokens of the raw LLM answer.
+    """
+    tier = model_tiers.choose(question, context)
+    model_url = os.environ.get(TIER_URLS[tier])
+    model_connector = await LanguageModelCreator.a_create_llm_connector(
+        model_url, sys_prompt
+    )
+    async with upstream(TIER_URLS[tier]).slot():
+        with Timer() as t:
+            async for token in model_connector.a_generate_stream(question, context):
+                yield token
+            logger.info(f"Answer generation time: {t.seconds_from_start} sec")
+            model_tiers.record(tier, t.seconds_from_start)
@@ -1,26 +1,62 @@
+import asyncio
 import logging
 from pathlib import Path
-from typing import List
+from typing import AsyncIterator, Dict, List, Tuple
+
+from asgi_correlation_id.context import correlation_id
+import numpy as np
 
 from agents.agent import Agent
 from agents.prompts import binary_fc_user_prompt
 from agents.prompts import fc_sys_prompt
+from agents.prompts import multi_fc_user_prompt
 from agents.tools.pipeline_tools import pipeline_tools
+import chroma_rag.loading as chroma_connector
+from modules.cache.answer_cache import answer_cache_key
+from modules.cache.answer_cache import AnswerCacheKey
+from modules.cache.answer_cache import cache_answer
+from modules.cache.answer_cache import get_cached_answer
+from modules.cache.plan_cache import cache_plan
+from modules.cache.plan_cache import get_cached_plan
+from modules.cache.plan_cache import plan_cache_key
+from modules.cache.semantic_cache import cache_semantic_answer
+from modules.cache.semantic_cache import get_semantic_answer
+from modules.preprocessing.default import AnswerStreamParser
+from modules.preprocessing.default import parse_answer
+from modules.routing.pipeline_router import get_pipeline_router
 from modules.variables import ROOT
+from modules.variables.prompts import accessibility_sys_prompt
+from modules.variables.prompts import strategy_sys_prompt
+from modules.variables.prompts.prompts import multi_intent_sys_prompt
+from modules.variables.settings import app_settings
 from pipelines import accessibility_pipeline
 from pipelines import strategy_pipeline
+from pipelines.generation import generate_answer
+from pipelines.generation import stream_answer
+from pipelines.speculation import Speculation
+from utils.admission import upstream
+from utils.deadline import DeadlineExceededError
+from utils.deadline import remaining_time
+from utils.deadline import request_budget
+from utils.deadline import run_stage
+from utils.deadline import run_stream_stage
+from utils.get_logs import filter_records
+from utils.get_logs import request_logs_buffer
 from utils.measure_time import Timer
+from utils.shared_calls import sharing_calls
+from utils.single_flight import SingleFlight
 
 
 path_to_config = Path(ROOT, "config.env")
 logger = logging.getLogger(__name__)
+# Questions that are being answered now, identical questions wait for their answers
+in_flight_questions = SingleFlight()
 
 
-def answer_question_with_llm(
+async def lookup_cached_answer(
     question: str, coordinates: List, t_type: str, t_id: str, chunk_num: int
-) -> str:
-    """Chooses and runs all pipelines that are required to get
-    the answer to the user's question.
+) -> Tuple[str | None, AnswerCacheKey, np.ndarray | None]:
+    """Looks for the answer in the exact-match cache and then in the semantic cache.
 
     Args:
         question: A question from the user.
@@ -30,11 +66,96 @@ def answer_question_with_llm(
         chunk_num: Number of chunks that will be returned by the DB and used as
             a context.
 
-    Returns: Answer to the question.
+    Returns: A tuple (answer, cache_key, embedding) with the cached answer (None if
+    not found), the exact-match cache key and the question embedding (None if
+    the semantic cache is not used) to store the new answer with store_answer.
+    """
+    cache_key = answer_cache_key(question, coordinates, t_type, t_id, chunk_num)
+    llm_res = get_cached_answer(cache_key)
+    if llm_res is not None or not app_settings.semantic_cache_enabled:
+        return llm_res, cache_key, None
+    try:
+        async with upstream("embeddings").slot():
+            embedding = np.array(await chroma_connector.a_embed_query(question))
+    except Exception as e:
+        logger.warning(f"Could NOT embed the question for the semantic cache: {e}")
+        return None, cache_key, None
+    # The same territory is described by the cache key without the question
+    llm_res = get_semantic_answer(cache_key[1:], embedding)
+    if llm_res is not None:
+        cache_answer(cache_key, llm_res)
+    return llm_res, cache_key, embedding
+
+
+def store_answer(
+    cache_key: AnswerCacheKey, embedding: np.ndarray | None, llm_res: str
+) -> None:
+    """Stores the new answer in the answer caches."""
+    cache_answer(cache_key, llm_res)
+    if embedding is not None:
+        cache_semantic_answer(cache_key[1:], cache_key[0], embedding, llm_res)
+
+
+def choose_pipeline_locally(question: str) -> List[str] | None:
+    """Chooses the pipeline with the local router.
+
+    Args:
+        question: A question from the user.
+
+    Returns: The chosen pipeline in a list, None if the router is not confident.
     """
-    agent = Agent("LLAMA_FC_URL", pipeline_tools)
+    router = get_pipeline_router() if app_settings.pipeline_router_enabled else None
+    if router is None:
+        return None
+    pipeline, confidence = router.predict(question)
+    if confidence < app_settings.pipeline_router_threshold:
+        logger.info(f"Local router is not confident ({confidence:.2f}), asking the LLM")
+        return None
+    logger.info(f"Pipeline chosen by the local router ({confidence:.2f})")
+    return [pipeline]
+
+
+async def choose_pipelines(
+    question: str, t_id: str | None = None, speculation: Speculation | None = None
+) -> List[str]:
+    """Chooses the pipelines that are required to get the answer to the user's question.
+
+    The plan cache is checked first, then the local router, and the LLM chooses
+    the pipelines only if the router is not confident. Only the first chosen
+    pipeline is returned unless MULTI_INTENT is set.
+
+    Args:
+        question: A question from the user.
+        t_id: The name of selected territory, masked in the plan cache key.
+        speculation: Branches of the pipelines started if the LLM is asked.
+
+    Returns: Names of the chosen pipelines.
+    """
+    multi_intent = app_settings.multi_intent
+    # The choices of the LLM depend on the prompt, so they are cached separately
+    stage = "pipelines" if multi_intent else "pipeline"
     with Timer() as t:
-        res_funcs = agent.choose_functions(question, fc_sys_prompt, binary_fc_user_prompt)
+        plan_key = plan_cache_key(stage, pipeline_tools, question, t_id)
+        res_funcs = get_cached_plan(plan_key)
+        if res_funcs is None:
+            res_funcs = choose_pipeline_locally(question)
+        if res_funcs is None:
+            if speculation is not None:
+                speculation.start()
+            agent = Agent("LLAMA_FC_URL", pipeline_tools)
+            try:
+                res_funcs = await run_stage(
+                    "routing",
+                    agent.a_choose_functions(
+                        question,
+                        fc_sys_prompt,
+                        multi_fc_user_prompt if multi_intent else binary_fc_user_prompt,
+                    ),
+                    app_settings.routing_time_share,
+                )
+            except DeadlineExceededError:
+                res_funcs = []
+            cache_plan(plan_key, res_funcs)
         logger.info(f"Pipeline choose time: {t.seconds_from_start} sec")
     # with Timer() as t:
     #     checked_res_funcs = agent.check_functions(
@@ -42,18 +163,278 @@ def answer_question_with_llm(
     #     )
     #     logger.info(f"Pipeline check time: {t.seconds_from_start} sec")
 
-    # Set a default value if the LLM could not come up with an answer
+    # Set a default value if the LLM could not come up with an answer in time
     if not res_funcs:
         res_funcs.append("strategy_development_pipeline")
     logger.info(f"Selected pipeline: {res_funcs}")
+    return res_funcs if multi_intent else res_funcs[:1]
+
+
+async def collect_pipeline_context(
+    pipeline: str,
+    question: str,
+    coordinates: List,
+    t_type: str,
+    t_id: str,
+    chunk_num: int,
+) -> Tuple[str, str]:
+    """Runs the context collection stage of the given pipeline.
+
+    Args:
+        pipeline: Name of the pipeline.
+        question: A question from the user.
+        coordinates: The coordinates of the territory selected on the map.
+        t_type: The type of territory that was selected on the map.
+        t_id: The name of selected territory.
+        chunk_num: Number of chunks that will be returned by the DB and used as
+            a context.
+
+    Returns: A tuple (context, sys_prompt) with the collected context and the system
+    prompt of the pipeline for the answer generation.
+    """
+    if pipeline == "strategy_development_pipeline":
+        context = await strategy_pipeline.strategy_development_context(
+            question, chunk_num
+        )
+        return context, strategy_sys_prompt
+    elif pipeline == "service_accessibility_pipeline":
+        context = await accessibility_pipeline.service_accessibility_context(
+            question, coordinates, t_type, t_id
+        )
+        return context, accessibility_sys_prompt
+    raise ValueError(f"Unknown pipeline: {pipeline}")
 
-    if res_funcs[0] == "strategy_development_pipeline":
-        fun_handle = getattr(strategy_pipeline, res_funcs[0])
-        llm_res = str(fun_handle(question, chunk_num))
-    elif res_funcs[0] == "service_accessibility_pipeline":
-        fun_handle = getattr(accessibility_pipeline, res_funcs[0])
-        llm_res = str(fun_handle(question, coordinates, t_type, t_id))
+
+# Titles of the context parts collected by the pipelines for a multi-intent question
+PIPELINE_CONTEXT_TITLES = {
+    "strategy_development_pipeline": "Development strategy",
+    "service_accessibility_pipeline": "Statistics of the territory",
+}
+
+
+async def collect_pipelines_context(
+    pipelines: List[str],
+    question: str,
+    coordinates: List,
+    t_type: str,
+    t_id: str,
+    chunk_num: int,
+) -> Tuple[str, str]:
+    """Runs the context collection stages of the given pipelines concurrently.
+
+    The contexts of several pipelines are merged into one with the titles of
+    the parts. A pipeline that failed is skipped if the others succeeded.
+
+    Args:
+        pipelines: Names of the pipelines.
+        question: A question from the user.
+        coordinates: The coordinates of the territory selected on the map.
+        t_type: The type of territory that was selected on the map.
+        t_id: The name of selected territory.
+        chunk_num: Number of chunks that will be returned by the DB and used as
+            a context.
+
+    Returns: A tuple (context, sys_prompt), see collect_pipeline_context.
+    """
+    if len(pipelines) == 1:
+        return await collect_pipeline_context(
+            pipelines[0], question, coordinates, t_type, t_id, chunk_num
+        )
+    results = await asyncio.gather(
+        *[
+            collect_pipeline_context(
+                pipeline, question, coordinates, t_type, t_id, chunk_num
+            )
+            for pipeline in pipelines
+        ],
+        return_exceptions=True,
+    )
+    parts = []
+    for pipeline, result in zip(pipelines, results):
+        if isinstance(result, BaseException):
+            logger.error(f"Could NOT collect the context of {pipeline}: {result}")
+            continue
+        parts.append(f"{PIPELINE_CONTEXT_TITLES[pipeline]}: {result[0]}")
+    if not parts:
+        raise results[0]
+    return "\n".join(parts), multi_intent_sys_prompt
+
+
+async def answer_question_with_llm(
+    question: str, coordinates: List, t_type: str, t_id: str, chunk_num: int
+) -> str:
+    """Chooses and runs all pipelines that are required to get
+    the answer to the user's question.
+
+    Concurrent identical questions with the same time budget share one execution
+    of the pipelines. Every request waits for it within its own deadline and gets
+    the stage records of the execution in its request logs.
+
+    Args:
+        question: A question from the user.
+        coordinates: The coordinates of the territory selected on the map.
+        t_type: The type of territory that was selected on the map.
+        t_id: The name of selected territory.
+        chunk_num: Number of chunks that will be returned by the DB and used as
+            a context.
+
+    Returns: Answer to the question.
+    """
+    if not app_settings.coalesce_questions:
+        llm_res = await _answer_question_with_llm(
+            question, coordinates, t_type, t_id, chunk_num
+        )
+    else:
+        # The execution runs within the deadline of the request that started it
+        key = (
+            answer_cache_key(question, coordinates, t_type, t_id, chunk_num),
+            request_budget(),
+        )
+        if in_flight_questions.is_in_flight(key):
+            logger.info("Coalesced with an identical question in flight")
+        timeout = remaining_time()
+        try:
+            llm_res, records = await in_flight_questions.do(
+                key,
+                lambda: _answer_question_with_records(
+                    question, coordinates, t_type, t_id, chunk_num
+                ),
+                None if timeout is None else max(timeout, 0.0),
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Stage timeout: coalesced question did not finish in {timeout:.2f} sec"
+            )
+            raise DeadlineExceededError(
+                f"coalesced question did not finish in {timeout:.2f} sec"
+            )
+        if records is not None and records[0] != correlation_id.get():
+            # The stage records of the request that executed the pipelines
+            for record in records[1]:
+                logger.info(record)
 
     logger.info(f"Final answer: {llm_res}")
 
     return llm_res
+
+
+async def choose_and_collect_context(
+    question: str, coordinates: List, t_type: str, t_id: str, chunk_num: int
+) -> Tuple[str, str]:
+    """Chooses the pipelines and runs their context collection stages.
+
+    In the speculative mode the first steps of both pipelines run while the LLM
+    chooses the pipelines, the chosen pipelines reuse the results of their branches.
+
+    Args:
+        question: A question from the user.
+        coordinates: The coordinates of the territory selected on the map.
+        t_type: The type of territory that was selected on the map.
+        t_id: The name of selected territory.
+        chunk_num: Number of chunks that will be returned by the DB and used as
+            a context.
+
+    Returns: A tuple (context, sys_prompt), see collect_pipeline_context.
+    """
+    speculation = None
+    if app_settings.speculative_routing:
+        speculation = Speculation(question, coordinates, t_type, t_id, chunk_num)
+    with sharing_calls():
+        try:
+            pipelines = await choose_pipelines(question, t_id, speculation)
+            if speculation is not None:
+                speculation.resolve(pipelines)
+            return await run_stage(
+                "context retrieval",
+                collect_pipelines_context(
+                    pipelines, question, coordinates, t_type, t_id, chunk_num
+                ),
+                app_settings.context_time_share,
+            )
+        finally:
+            if speculation is not None:
+                speculation.cancel()
+
+
+async def _answer_question_with_records(
+    question: str, coordinates: List, t_type: str, t_id: str, chunk_num: int
+) -> Tuple[str, Tuple[str, List[str]] | None]:
+    """Runs _answer_question_with_llm for the requests coalesced with this one.
+
+    Returns: A tuple (answer, records) with the answer and the correlation id of
+    the request with its stage records, None if it is not a request.
+    """
+    llm_res = await _answer_question_with_llm(
+        question, coordinates, t_type, t_id, chunk_num
+    )
+    corr_id = correlation_id.get()
+    if corr_id is None:
+        return llm_res, None
+    records = filter_records(request_logs_buffer.get_records(corr_id))
+    return llm_res, (corr_id, records.split("\n") if records else [])
+
+
+async def _answer_question_with_llm(
+    question: str, coordinates: List, t_type: str, t_id: str, chunk_num: int
+) -> str:
+    """Runs the pipelines for the question, the answer caches are checked first."""
+    llm_res, cache_key, embedding = await lookup_cached_answer(
+        question, coordinates, t_type, t_id, chunk_num
+    )
+    if llm_res is None:
+        context, sys_prompt = await choose_and_collect_context(
+            question, coordinates, t_type, t_id, chunk_num
+        )
+        llm_res = str(
+            await run_stage("generation", generate_answer(question, context, sys_prompt))
+        )
+        store_answer(cache_key, embedding, llm_res)
+    return llm_res
+
+
+async def stream_answer_question_with_llm(
+    question: str, coordinates: List, t_type: str, t_id: str, chunk_num: int
+) -> AsyncIterator[Dict[str, str]]:
+    """Streaming version of answer_question_with_llm.
+
+    The pipeline stages are the same, but the answer tokens are yielded as soon
+    as the LLM produces them. Stage results (chosen pipeline and functions, retrieved
+    context) are reported in the request logs.
+
+    Args:
+        question: A question from the user.
+        coordinates: The coordinates of the territory selected on the map.
+        t_type: The type of territory that was selected on the map.
+        t_id: The name of selected territory.
+        chunk_num: Number of chunks that will be returned by the DB and used as
+            a context.
+
+    Yields:
+        Dicts with the 'token' key for every piece of the answer after the
+        ANSWER: separator (the explanation is not sent) and a final dict with
+        the 'answer' key that holds the processed answer.
+        A cached answer is yielded only as the final dict.
+    """
+    llm_res, cache_key, embedding = await lookup_cached_answer(
+        question, coordinates, t_type, t_id, chunk_num
+    )
+    if llm_res is None:
+        context, sys_prompt = await choose_and_collect_context(
+            question, coordinates, t_type, t_id, chunk_num
+        )
+        tokens = []
+        answer_parser = AnswerStreamParser()
+        async for token in run_stream_stage(
+            "generation", stream_answer(question, context, sys_prompt)
+        ):
+            tokens.append(token)
+            if piece := answer_parser.feed(token):
+                yield {"token": piece}
+        if piece := answer_parser.flush():
+            yield {"token": piece}
+        llm_res = parse_answer("".join(tokens))
+        store_answer(cache_key, embedding, llm_res)
+
+    logger.info(f"Final answer: {llm_res}")
+
+    yield {"answer": llm_res}
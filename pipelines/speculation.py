@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from typing import Dict, List
+
+from modules.variables.settings import app_settings
+from pipelines import accessibility_pipeline
+from pipelines import strategy_pipeline
+from utils.admission import upstream
+
+
+logger = logging.getLogger(__name__)
+
+
+def speculation_allowed() -> bool:
+    """Checks that the upstream services used by the speculative branches are not busy.
+
+    Returns: True if the ChromaDB and summary tables slots in use are below
+    SPECULATION_MAX_LOAD of their limits.
+    """
+    for name in ("chroma", "tables"):
+        bulkhead = upstream(name)
+        if (
+            bulkhead.in_use
+            >= app_settings.speculation_max_load * bulkhead.max_concurrency
+        ):
+            logger.info(f"Speculation skipped: {name} is busy")
+            return False
+    return True
+
+
+class Speculation:
+    """Cheap first steps of both pipelines started while the LLM chooses the pipeline.
+
+    The branches must run inside a sharing_calls() block, so the chosen pipeline
+    reuses the results of its branch. The branch of the other pipeline is cancelled.
+    """
+
+    def __init__(
+        self, question: str, coordinates: List, t_type: str, t_id: str, chunk_num: int
+    ) -> None:
+        """Creates a speculation for the question, the branches are started by start().
+
+        Args:
+            question: A question from the user.
+            coordinates: The coordinates of the territory selected on the map.
+            t_type: The type of territory that was selected on the map.
+            t_id: The name of selected territory.
+            chunk_num: Number of chunks that will be returned by the DB.
+        """
+        self.question = question
+        self.coordinates = coordinates
+        self.t_type = t_type
+        self.t_id = t_id
+        self.chunk_num = chunk_num
+        self.branches: Dict[str, asyncio.Task] = {}
+
+    def start(self) -> None:
+        """Starts the branches of both pipelines if the upstream services are not busy."""
+        if self.branches or not speculation_allowed():
+            return
+        self.branches = {
+            "strategy_development_pipeline": asyncio.create_task(
+                strategy_pipeline.a_retrieve_context_from_chroma(
+                    self.question, strategy_pipeline.STRATEGY_COLLECTION, self.chunk_num
+                )
+            ),
+            "service_accessibility_pipeline": asyncio.create_task(
+                accessibility_pipeline.prefetch_default_tables(
+                    self.coordinates, self.t_type, self.t_id
+                )
+            ),
+        }
+        for branch in self.branches.values():
+            # Errors are raised for the pipeline that reuses the branch
+            branch.add_done_callback(lambda task: task.cancelled() or task.exception())
+        logger.info("Speculation started for both pipelines")
+
+    def resolve(self, pipelines: List[str]) -> None:
+        """Cancels the branches of the pipelines that were not chosen.
+
+        Args:
+            pipelines: Names of the chosen pipelines.
+        """
+        for name, branch in self.branches.items():
+            if name not in pipelines and not branch.done():
+                branch.cancel()
+                logger.info(f"Speculation discarded: {name}")
+
+    def cancel(self) -> None:
+        """Cancels all the unfinished branches."""
+        for branch in self.branches.values():
+            if not branch.done():
+                branch.cancel()
@@ -1,13 +1,18 @@
+import asyncio
 import logging
 import os
 
 import chroma_rag.loading as chroma_connector
-from modules.models.connector_creator import LanguageModelCreator
 from modules.variables.prompts import strategy_sys_prompt
+from pipelines.generation import generate_answer
+from utils.admission import upstream
 from utils.measure_time import Timer
+from utils.shared_calls import shared_call
 
 
 logger = logging.getLogger(__name__)
+# ChromaDB collection with the strategy documents
+STRATEGY_COLLECTION = "strategy-spb"
 
 
 def retrieve_context_from_chroma(q: str, collect_name: str, c_num: int) -> str:
@@ -29,7 +34,44 @@ def retrieve_context_from_chroma(q: str, collect_name: str, c_num: int) -> str:
     return context
 
 
-def strategy_development_pipeline(
+async def a_retrieve_context_from_chroma(q: str, collect_name: str, c_num: int) -> str:
+    """Asynchronous version of retrieve_context_from_chroma.
+
+    The Chroma client is synchronous, so the request runs in a worker thread
+    to keep the event loop free. Identical lookups in one batch of questions
+    are made once.
+    """
+
+    async def query_chroma() -> str:
+        async with upstream("chroma").slot():
+            return await asyncio.to_thread(
+                retrieve_context_from_chroma, q, collect_name, c_num
+            )
+
+    return await shared_call(("chroma", q, collect_name, c_num), query_chroma)
+
+
+async def strategy_development_context(question: str, chunk_num: int = 4) -> str:
+    """Extracts the context for the given question from ChromaDB.
+
+    Args:
+        question: A question from the user.
+        chunk_num: Number of chunks that will be returned by the DB.
+
+    Returns: The context for the LLM.
+    """
+    collection_name = STRATEGY_COLLECTION
+    logger.info(f"Chroma collection name: {collection_name}")
+    logger.info(f"Chunks num: {chunk_num}")
+    with Timer() as t:
+        context = await a_retrieve_context_from_chroma(
+            question, collection_name, chunk_num
+        )
+        logger.info(f"Retrieve context time: {t.seconds_from_start} sec")
+    return context
+
+
+async def strategy_development_pipeline(
     question: str,
     chunk_num: int = 4,
 ) -> str:
@@ -42,20 +84,7 @@ def strategy_development_pipeline(
 
     Returns: Answer to the question.
     """
-    collection_name = "strategy-spb"
-    logger.info(f"Chroma collection name: {collection_name}")
-    logger.info(f"Chunks num: {chunk_num}")
     # Get context from ChromaDB
-    with Timer() as t:
-        context = retrieve_context_from_chroma(question, collection_name, chunk_num)
-        logger.info(f"Retrieve context time: {t.seconds_from_start} sec")
+    context = await strategy_development_context(question, chunk_num)
     # Get question answer from model
-    model_url = os.environ.get("LLAMA_URL")
-    model_connector = LanguageModelCreator.create_llm_connector(
-        model_url, strategy_sys_prompt
-    )
-    with Timer() as t:
-        response = model_connector.generate(question, context)
-        logger.info(f"Answer generation time: {t.seconds_from_start} sec")
-
-    return response
+    return await generate_answer(question, context, strategy_sys_prompt)
@@ -0,0 +1,64 @@
+import asyncio
+from typing import Dict, List
+
+import pytest
+
+from pipelines import batch_pipeline
+from utils.admission import Bulkhead
+
+
+@pytest.fixture
+def running(monkeypatch: pytest.MonkeyPatch) -> Dict[str, int]:
+    """Replaces the pipelines with a short answer that counts the running questions."""
+    counts = {"running": 0, "max_running": 0}
+
+    async def answer(question: str, **kwargs: object) -> str:
+        counts["running"] += 1
+        counts["max_running"] = max(counts["max_running"], counts["running"])
+        await asyncio.sleep(0.05)
+        counts["running"] -= 1
+        return f"answer to {question}"
+
+    monkeypatch.setattr(batch_pipeline, "answer_question_with_llm", answer)
+    return counts
+
+
+def batch(size: int) -> List[Dict[str, object]]:
+    """Returns the arguments of answer_question_with_llm for each question."""
+    return [
+        {
+            "question": f"q{index}",
+            "coordinates": [],
+            "t_type": "district",
+            "t_id": "Kolpino",
+            "chunk_num": 4,
+        }
+        for index in range(size)
+    ]
+
+
+def test_every_running_question_takes_an_admission_slot(
+    running: Dict[str, int], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """A batch does not run more questions than the request admission allows."""
+    admission = Bulkhead("requests", 2)
+    monkeypatch.setattr(batch_pipeline, "request_admission", admission)
+    res = asyncio.run(batch_pipeline.answer_questions_with_llm(batch(6), 4))
+    assert [result["llm_res"] for result in res["results"]] == [
+        f"answer to q{index}" for index in range(6)
+    ]
+    assert running["max_running"] == 2
+    assert admission.admitted == 6 and admission.in_use == 0
+
+
+def test_rejected_question_gets_an_error(
+    running: Dict[str, int], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """A question rejected by the admission fails, the others are answered."""
+    admission = Bulkhead("requests", 1, max_queue=0)
+    monkeypatch.setattr(batch_pipeline, "request_admission", admission)
+    res = asyncio.run(batch_pipeline.answer_questions_with_llm(batch(2), 2))
+    first, second = res["results"]
+    assert first["llm_res"] == "answer to q0" and first["error"] is None
+    assert second["llm_res"] is None and "already waiting" in second["error"]
+    assert res["summary"]["failed"] == 1 and admission.rejected == 1
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from typing import Any, Iterator, List
+
+from asgi_correlation_id import CorrelationIdFilter
+from asgi_correlation_id.context import correlation_id
+import pytest
+
+from pipelines import master_pipeline
+from utils.deadline import DeadlineExceededError
+from utils.deadline import remaining_time
+from utils.deadline import request_deadline
+from utils.get_logs import request_logs_buffer
+from utils.get_logs import RequestLogsBuffer
+from utils.get_logs import RequestLogsHandler
+
+
+@pytest.fixture
+def slow_answer(monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    """Replaces the pipelines with a 0.3 sec answer that respects the deadline."""
+    executions = []
+
+    async def answer(question: str, *args: object) -> str:
+        executions.append(question)
+        remaining = remaining_time()
+        if remaining is not None and remaining < 0.3:
+            await asyncio.sleep(max(remaining, 0))
+            raise DeadlineExceededError("generation did not finish")
+        master_pipeline.logger.info("Selected pipeline: strategy_development_pipeline")
+        await asyncio.sleep(0.3)
+        return f"answer to {question}"
+
+    monkeypatch.setattr(master_pipeline, "_answer_question_with_llm", answer)
+    monkeypatch.setattr(master_pipeline.app_settings, "coalesce_questions", True)
+    return executions
+
+
+@pytest.fixture
+def request_logs() -> Iterator[RequestLogsBuffer]:
+    """Keeps the records of the master pipeline in the request logs buffer."""
+    handler = RequestLogsHandler()
+    handler.addFilter(CorrelationIdFilter())
+    handler.setFormatter(
+        logging.Formatter(
+            "%(levelname)s: %(asctime)s %(name)s:%(lineno)d "
+            "[%(correlation_id)s] %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        )
+    )
+    master_pipeline.logger.addHandler(handler)
+    master_pipeline.logger.setLevel(logging.INFO)
+    yield request_logs_buffer
+    master_pipeline.logger.removeHandler(handler)
+
+
+async def ask(question: str, budget: float, corr_id: str, delay: float = 0.0) -> str:
+    """Asks the question as a request with the time budget after the delay."""
+    await asyncio.sleep(delay)
+    correlation_id.set(corr_id)
+    with request_deadline(budget):
+        return await master_pipeline.answer_question_with_llm(
+            question, [], "district", "Kolpino", 4
+        )
+
+
+def test_follower_with_longer_budget_is_not_failed_by_the_leader(
+    slow_answer: List[str],
+) -> None:
+    """A request with a longer budget does not share the execution of a shorter one."""
+
+    async def run() -> List[Any]:
+        return await asyncio.gather(
+            ask("q", 0.1, "leader"),
+            ask("q", 5.0, "follower", delay=0.01),
+            return_exceptions=True,
+        )
+
+    leader, follower = asyncio.run(run())
+    assert isinstance(leader, DeadlineExceededError)
+    assert follower == "answer to q"
+
+
+def test_follower_gets_the_stage_records_of_the_leader(
+    slow_answer: List[str], request_logs: RequestLogsBuffer
+) -> None:
+    """The coalesced request gets the stage records of the shared execution."""
+    for corr_id in ("leader", "follower"):
+        request_logs.start(corr_id)
+
+    async def run() -> List[str]:
+        return await asyncio.gather(
+            ask("q", 5.0, "leader"), ask("q", 5.0, "follower", delay=0.01)
+        )
+
+    try:
+        assert asyncio.run(run()) == ["answer to q", "answer to q"]
+        assert slow_answer == ["q"]
+        follower_records = request_logs.get_records("follower")
+        assert any("Coalesced with" in record for record in follower_records)
+        assert any("Selected pipeline" in record for record in follower_records)
+    finally:
+        for corr_id in ("leader", "follower"):
+            request_logs.release(corr_id)
+
+
+def test_follower_waits_only_within_its_own_deadline(
+    slow_answer: List[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """The coalesced request fails at its own deadline, the shared execution goes on."""
+    monkeypatch.setattr(master_pipeline, "request_budget", lambda: "same class")
+
+    async def run() -> List[Any]:
+        return await asyncio.gather(
+            ask("q", 5.0, "leader"),
+            ask("q", 0.1, "follower", delay=0.01),
+            return_exceptions=True,
+        )
+
+    leader, follower = asyncio.run(run())
+    assert leader == "answer to q"
+    assert isinstance(follower, DeadlineExceededError)
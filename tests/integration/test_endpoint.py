@@ -0,0 +1,24 @@
+import asyncio
+
+from api.endpoint import GetEndpoint
+from modules.models.benchmark_connectors import LLMServer
+from utils.http_sessions import close_async_client
+
+
+def test_async_calls_reuse_the_connection() -> None:
+    """The asynchronous table requests share the pooled client."""
+    server = LLMServer(handshake_delay=0)
+    endpoint = GetEndpoint(server.url)
+
+    async def calls() -> list:
+        try:
+            return [await endpoint.a_call() for _ in range(3)]
+        finally:
+            await close_async_client()
+
+    try:
+        assert asyncio.run(calls()) == [{"choices": [{"text": ""}]}] * 3
+        assert server.connections == 1
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -1,3 +1,5 @@
+import asyncio
+
 from pipelines.accessibility_pipeline import service_accessibility_pipeline
 from pipelines.master_pipeline import answer_question_with_llm
 from pipelines.strategy_pipeline import strategy_development_pipeline
@@ -5,7 +7,7 @@ from pipelines.strategy_pipeline import strategy_development_pipeline
 
 def test_strategy_development_pipeline():
     question = "What are the demographic development problems of Saint Petersburg?"
-    answer = strategy_development_pipeline(question)
+    answer = asyncio.run(strategy_development_pipeline(question))
     print(f"\nStrategy development pipeline\nQuestion: {question}\nAnswer: {answer}\n")
     assert answer != ""
 
@@ -15,8 +17,10 @@ def test_service_accessibility_pipeline():
     territory_type = "city"
     territory_name = "Saint Petersburg"
     territory_coords = None
-    answer = service_accessibility_pipeline(
-        question, territory_coords, territory_type, territory_name
+    answer = asyncio.run(
+        service_accessibility_pipeline(
+            question, territory_coords, territory_type, territory_name
+        )
     )
     print(f"\nService accessibility pipeline\nQuestion: {question}\nAnswer: {answer}\n")
     assert answer != ""
@@ -28,15 +32,19 @@ def test_master_pipeline():
     territory_type = "city"
     territory_name = "Saint Petersburg"
     territory_coords = None
-    answer = answer_question_with_llm(
-        question, territory_coords, territory_type, territory_name, chunk_num
+    answer = asyncio.run(
+        answer_question_with_llm(
+            question, territory_coords, territory_type, territory_name, chunk_num
+        )
     )
     print(f"\nMaster pipeline\nQuestion: {question}\nAnswer: {answer}\n")
     assert answer != ""
 
     question = "What is the average accessibility time of hospitals and schools?"
-    answer = answer_question_with_llm(
-        question, territory_coords, territory_type, territory_name, chunk_num
+    answer = asyncio.run(
+        answer_question_with_llm(
+            question, territory_coords, territory_type, territory_name, chunk_num
+        )
     )
     print(f"\nMaster pipeline\nQuestion: {question}\nAnswer: {answer}\n")
     assert answer != ""
@@ -0,0 +1,96 @@
+import asyncio
+import time
+from typing import Dict, List
+
+import pytest
+
+from agents import agent
+from agents.agent import Agent
+from agents.tool_registry import ToolRegistry
+from modules.variables.settings import app_settings
+
+
+class FakeTables:
+    """Table functions that sleep for the given delay, a None delay raises an error.
+
+    Keeps the names of the called functions and the max number of the calls
+    running at the same time.
+    """
+
+    def __init__(self, registry: ToolRegistry, delays: Dict[str, float | None]) -> None:
+        """Registers the functions in the registry.
+
+        Args:
+            registry: Registry of the tools.
+            delays: Delay of every function in seconds.
+        """
+        self.calls: List[str] = []
+        self.running = 0
+        self.max_running = 0
+        for name, delay in delays.items():
+            a_table, table = self._make_table(name, delay)
+            registry.register(name, table, a_table)
+
+    def _start(self, name: str, delay: float | None) -> None:
+        self.calls.append(name)
+        if delay is None:
+            raise ValueError("no such table")
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+
+    def _make_table(self, name: str, delay: float | None) -> tuple:
+        async def a_table(name_id: str, territory_type: str, coordinates: object) -> str:
+            self._start(name, delay)
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.running -= 1
+            return f"<{name}>"
+
+        def table(name_id: str, territory_type: str, coordinates: object) -> str:
+            self._start(name, delay)
+            try:
+                time.sleep(delay)
+            finally:
+                self.running -= 1
+            return f"<{name}>"
+
+        return a_table, table
+
+
+@pytest.fixture
+def registry(monkeypatch: pytest.MonkeyPatch) -> ToolRegistry:
+    """Replaces the tool registry of the agent with an empty one for the test."""
+    registry = ToolRegistry()
+    monkeypatch.setattr(agent, "tool_registry", registry)
+    monkeypatch.setattr(agent.table_budget, "registry", registry)
+    return registry
+
+
+def test_tables_are_retrieved_concurrently_once(registry: ToolRegistry) -> None:
+    """The repeated function is called once, all the tables are requested at once."""
+    tables = FakeTables(registry, {"t1": 0.1, "t2": 0.1, "t3": 0.1})
+    context = asyncio.run(
+        Agent.a_retrieve_context_from_api(
+            "Kolpino", "district", [], ["t1", "t2", "t1", "t3"]
+        )
+    )
+    assert context == "<t1><t2><t3>"
+    assert tables.calls == ["t1", "t2", "t3"]
+    assert tables.max_running == 3
+
+
+def test_failed_tables_are_skipped(
+    registry: ToolRegistry, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """The tables that failed or timed out are left out of the context."""
+    monkeypatch.setattr(app_settings, "table_timeout", 0.05)
+    FakeTables(registry, {"t1": 0.0, "t2": None, "t3": 1.0})
+    context = asyncio.run(
+        Agent.a_retrieve_context_from_api("Kolpino", "district", [], ["t1", "t2", "t3"])
+    )
+    assert context == "<t1>"
+    context = Agent.retrieve_context_from_api(
+        "Kolpino", "district", [], ["t3", "t2", "t1"]
+    )
+    assert context == "<t1>"
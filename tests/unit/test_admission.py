@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from utils.admission import Bulkhead
+from utils.admission import QueueFullError
+from utils.admission import QueueTimeoutError
+
+
+def test_concurrency_is_limited() -> None:
+    """No more than max_concurrency calls run at the same time."""
+    bulkhead = Bulkhead("llm", max_concurrency=2)
+    running, max_running = 0, 0
+
+    async def call() -> None:
+        nonlocal running, max_running
+        async with bulkhead.slot():
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def run() -> None:
+        await asyncio.gather(*[call() for _ in range(6)])
+
+    asyncio.run(run())
+    stats = bulkhead.stats()
+    assert max_running == 2
+    assert stats["admitted"] == 6
+    assert stats["in_use"] == 0
+    assert stats["queue_depth"] == 0
+
+
+def test_call_is_rejected_when_queue_is_full() -> None:
+    """A call that does not fit the queue is rejected at once."""
+    bulkhead = Bulkhead("requests", max_concurrency=1, max_queue=1)
+
+    async def call() -> None:
+        async with bulkhead.slot():
+            await asyncio.sleep(0.01)
+
+    async def run() -> list:
+        return await asyncio.gather(call(), call(), call(), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert results[:2] == [None, None]
+    assert isinstance(results[2], QueueFullError)
+    assert bulkhead.stats()["rejected"] == 1
+
+
+def test_call_is_rejected_after_queue_timeout() -> None:
+    """A call that waited in the queue too long is rejected."""
+    bulkhead = Bulkhead("requests", max_concurrency=1, queue_timeout=0.01)
+
+    async def run() -> None:
+        async with bulkhead.slot():
+            with pytest.raises(QueueTimeoutError):
+                await bulkhead.acquire()
+
+    asyncio.run(run())
+    stats = bulkhead.stats()
+    assert stats["timed_out"] == 1
+    assert stats["in_use"] == 0
+    assert stats["queue_depth"] == 0
@@ -0,0 +1,67 @@
+from modules.cache.answer_cache import answer_cache_key
+from modules.cache.answer_cache import TTLCache
+
+
+class FakeClock:
+    """Clock that returns the time set by the test."""
+
+    def __init__(self) -> None:
+        """Starts the clock at 0."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Returns the current time."""
+        return self.now
+
+
+def test_ttl_expiration() -> None:
+    """An entry is returned until its time to live is over."""
+    clock = FakeClock()
+    cache = TTLCache(max_size=10, ttl=60, clock=clock)
+    cache.set("key", "answer")
+    clock.now = 59
+    assert cache.get("key") == "answer"
+    clock.now = 61
+    assert cache.get("key") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_eviction() -> None:
+    """The least recently used entry is evicted from a full cache."""
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.keys() == ["a", "c"]
+
+
+def test_hit_miss_counters_and_purge() -> None:
+    """The hits and misses are counted, the purge removes the matching entries."""
+    cache = TTLCache(max_size=10, ttl=60)
+    cache.set(("q", "Saint Petersburg"), 1)
+    cache.set(("q", "Moscow"), 2)
+    cache.get(("q", "Moscow"))
+    cache.get(("q", "Kazan"))
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+    assert cache.purge(lambda key: key[1] == "Moscow") == 1
+    assert cache.keys() == [("q", "Saint Petersburg")]
+
+
+def test_answer_cache_key_normalization() -> None:
+    """The same question in another case or spacing has the same key."""
+    zone = [[[30.26, 60.11], [30.27, 60.12], [30.26, 60.11]]]
+    key = answer_cache_key(
+        "What are the  problems of Saint Petersburg?", zone, "city", "SPb", 4
+    )
+    same_key = answer_cache_key(
+        "what are the problems of saint petersburg", zone, "city", "SPb", 4
+    )
+    assert key == same_key
+    assert key != answer_cache_key(
+        "What are the problems of Saint Petersburg?", None, "city", "SPb", 4
+    )
+    assert key != answer_cache_key(
+        "What are the problems of Saint Petersburg?", zone, "city", "SPb", 5
+    )
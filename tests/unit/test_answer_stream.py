@@ -0,0 +1,36 @@
+import pytest
+
+from modules.preprocessing.default import AnswerStreamParser
+from modules.preprocessing.default import parse_answer
+
+
+OUTPUTS = [
+    "EXPLANATION: The table has 12 schools.\nANSWER: There are 12 schools.",
+    "EXPLANATION: no data ANSWER:   \n 12 schools  \n",
+    "There are 12 schools.",
+    "EXPLANATION: a ANSWER: first ANSWER: second",
+    "EXPLANATION: a ANSWER: ANSWER",
+    "",
+]
+
+
+def stream(output: str, size: int) -> list:
+    """Passes the output through the parser in tokens of the given size."""
+    parser = AnswerStreamParser()
+    pieces = [parser.feed(output[i : i + size]) for i in range(0, len(output), size)]
+    return [*pieces, parser.flush()]
+
+
+@pytest.mark.parametrize("output", OUTPUTS)
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_streamed_answer_is_the_parsed_answer(output: str, size: int) -> None:
+    """The streamed pieces add up to the answer of parse_answer."""
+    assert "".join(stream(output, size)) == parse_answer(output)
+
+
+def test_explanation_is_not_streamed() -> None:
+    """Nothing is sent before the separator, the answer is sent as it comes."""
+    pieces = stream("EXPLANATION: counted ANSWER: There are 12 schools in it.", 4)
+    sent = [piece for piece in pieces if piece]
+    assert "EXPLANATION" not in "".join(sent)
+    assert len(sent) > 2
@@ -0,0 +1,53 @@
+import asyncio
+from typing import AsyncGenerator, List
+
+import pytest
+
+from utils.admission import Bulkhead
+from utils.deadline import DeadlineExceededError
+from utils.deadline import request_deadline
+from utils.deadline import run_stream_stage
+
+
+def test_stream_timed_out_mid_stream_releases_its_slot() -> None:
+    """A stream stopped by the deadline exits its contexts in the consumer task."""
+    bulkhead = Bulkhead("LLAMA_URL", 1)
+    tasks = []
+
+    async def tokens() -> AsyncGenerator[str, None]:
+        async with bulkhead.slot():
+            tasks.append(asyncio.current_task())
+            try:
+                yield "first"
+                await asyncio.sleep(10)
+                yield "second"
+            finally:
+                tasks.append(asyncio.current_task())
+
+    async def run() -> List[str]:
+        items = []
+        with request_deadline(0.1):
+            with pytest.raises(DeadlineExceededError):
+                async for item in run_stream_stage("generation", tokens()):
+                    items.append(item)
+        tasks.append(asyncio.current_task())
+        return items
+
+    assert asyncio.run(run()) == ["first"]
+    assert bulkhead.in_use == 0
+    assert tasks[0] is tasks[1] is tasks[2]
+
+
+def test_stream_within_the_deadline_is_received_whole() -> None:
+    """A stream that finishes in time yields all its items."""
+
+    async def tokens() -> AsyncGenerator[str, None]:
+        for token in ("a", "b", "c"):
+            await asyncio.sleep(0.01)
+            yield token
+
+    async def run() -> List[str]:
+        with request_deadline(5.0):
+            return [item async for item in run_stream_stage("generation", tokens())]
+
+    assert asyncio.run(run()) == ["a", "b", "c"]
@@ -0,0 +1,129 @@
+import json
+from typing import Any, Callable, Dict, List
+
+import pytest
+import requests
+
+from modules.models import connectors
+from modules.models.connector_creator import LanguageModelCreator
+from modules.preprocessing.default import FC_STOP_SEQUENCES
+from modules.preprocessing.default import llama_8b_fc_postprocessing
+from modules.preprocessing.default import llama_8b_fc_preprocessing
+from modules.preprocessing.default import llama_8b_postprocessing
+from modules.preprocessing.default import llama_70b_fc_preprocessing
+from modules.preprocessing.text_preprocessor import BaseTextProcessor
+from modules.variables.prompts import llama_8b_template
+from modules.variables.prompts import llama_70b_template
+from modules.variables.settings import app_settings
+
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_general_stats_sports",
+            "description": "Sports facilities.",
+            "parameters": {"type": "object", "properties": {"coordinates": {}}},
+        },
+    }
+]
+
+
+class FakeResponse:
+    """Response of the LLM service with the given JSON body."""
+
+    def __init__(self, body: Dict[str, Any], status_code: int = 200) -> None:
+        """Serializes the body."""
+        self.text = json.dumps(body)
+        self.status_code = status_code
+
+    def raise_for_status(self) -> None:
+        """Raises an HTTP error if the status is an error one."""
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+
+def prepare(template: str, fc_input_format: Callable, tools: List[Dict] | None) -> Dict:
+    """Builds a function calling request with the template of the service."""
+    processor = BaseTextProcessor(
+        template, llama_8b_postprocessing, None, fc_input_format
+    )
+    message = processor.preprocess_input(
+        job_id="1",
+        temperature="0.15",
+        token_limit="64000",
+        top_p="0.15",
+        top_k="50",
+        system_prompt="Choose the functions",
+        user_prompt="Question: How many stadiums are there?",
+    )
+    return processor.preprocess_function_call_input(message, tools, 128)
+
+
+def test_native_tools_request_without_arguments() -> None:
+    """The native tools are sent without their parameters."""
+    message = prepare(llama_8b_template, llama_8b_fc_preprocessing, TOOLS)
+    assert message["max_tokens"] == 128
+    assert message["tool_choice"] == "required"
+    assert message["tools"][0]["function"]["name"] == "get_general_stats_sports"
+    assert message["tools"][0]["function"]["parameters"]["properties"] == {}
+    assert "stop" not in message
+
+
+def test_text_request_is_cut_by_stop_sequences() -> None:
+    """A text answer is limited by the stop sequences."""
+    message = prepare(llama_8b_template, llama_8b_fc_preprocessing, None)
+    assert message["stop"] == FC_STOP_SEQUENCES and "tools" not in message
+
+    message = prepare(llama_70b_template, llama_70b_fc_preprocessing, TOOLS)
+    assert message["meta"]["tokens_limit"] == "128"
+    assert "<|eot_id|>" in message["meta"]["stop_words"]
+    assert "string" not in message["meta"]["stop_words"]
+
+
+def test_chosen_functions_are_parsed_from_tool_calls() -> None:
+    """The chosen functions are taken from the tool calls or the text."""
+    call = {"function": {"name": "get_general_stats_sports", "arguments": "{}"}}
+    response = FakeResponse(
+        {"choices": [{"message": {"content": None, "tool_calls": [call, call]}}]}
+    )
+    assert llama_8b_fc_postprocessing(response) == (
+        "get_general_stats_sports get_general_stats_sports"
+    )
+    response = FakeResponse(
+        {"choices": [{"message": {"content": "get_general_stats_sports"}}]}
+    )
+    assert llama_8b_fc_postprocessing(response) == "get_general_stats_sports"
+
+
+def test_error_response_is_not_parsed() -> None:
+    """An error of the service is raised as an HTTP error, not a KeyError."""
+    response = FakeResponse(
+        {"object": "error", "message": "tools are not supported"}, 400
+    )
+    with pytest.raises(requests.HTTPError):
+        llama_8b_fc_postprocessing(response)
+
+
+def test_rejected_native_tools_fall_back_to_text(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A service without the native tools is asked again for a text answer."""
+    requests_sent = []
+
+    class FakeSession:
+        def post(self, url: str, json: dict, timeout: object) -> FakeResponse:
+            requests_sent.append(json)
+            if "tools" in json:
+                return FakeResponse({"object": "error"}, 400)
+            return FakeResponse(
+                {"choices": [{"message": {"content": "get_general_stats_sports"}}]}
+            )
+
+    monkeypatch.setattr(app_settings, "fc_native_tools", True)
+    monkeypatch.setattr(connectors, "get_session", FakeSession)
+    connector = LanguageModelCreator._create_connector_for_type(
+        "http://llm:80/v1/chat/completions", "Choose the functions", "llama-8b"
+    )
+    assert connector.generate_function_call("Stadiums?", TOOLS) == (
+        "get_general_stats_sports"
+    )
+    assert "tools" in requests_sent[0] and "stop" in requests_sent[1]
@@ -0,0 +1,39 @@
+from agents.function_matcher import FunctionNameMatcher
+from agents.function_matcher import get_function_matcher
+
+
+FUNCTIONS = (
+    "get_general_stats_sports",
+    "get_general_stats_services",
+    "get_general_stats_housing_and_communal_services",
+)
+
+
+def test_exact_names_are_found_in_order() -> None:
+    """Exact names are found once each in the order of the answer."""
+    matcher = FunctionNameMatcher(FUNCTIONS)
+    answer = (
+        "I would call get_general_stats_housing_and_communal_services, "
+        "then get_general_stats_services and "
+        "get_general_stats_housing_and_communal_services."
+    )
+    assert matcher.match(answer) == [
+        "get_general_stats_housing_and_communal_services",
+        "get_general_stats_services",
+    ]
+
+
+def test_misspelled_names_are_matched_within_max_distance() -> None:
+    """Misspelled names are matched only within the maximum distance."""
+    matcher = FunctionNameMatcher(FUNCTIONS)
+    assert matcher.match("[Correct answer]: get_general_stat_sport") == [
+        "get_general_stats_sports"
+    ]
+    # Other words and far identifiers are not matched to the nearest name
+    assert matcher.match("the sports stats, see get_population_density") == []
+
+
+def test_matcher_is_compiled_once_per_toolset() -> None:
+    """The matcher of a toolset is compiled once and reused."""
+    assert get_function_matcher(FUNCTIONS) is get_function_matcher(FUNCTIONS)
+    assert FunctionNameMatcher(()).match("get_general_stats_sports") == []
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import numpy as np
+
+from modules.routing.function_selector import FunctionSelector
+from modules.routing.function_selector import tune_thresholds
+
+
+functions = ["get_general_stats_education", "get_general_stats_healthcare"]
+
+
+def test_thresholds_maximize_f1_of_each_label() -> None:
+    """Every label gets the threshold with the best F1 score."""
+    probabilities = np.array([[0.9, 0.4], [0.6, 0.3], [0.2, 0.35], [0.1, 0.1]])
+    labels = np.array([[1, 1], [1, 0], [0, 1], [0, 0]])
+    thresholds = tune_thresholds(probabilities, labels)
+    assert 0.2 < thresholds[0] <= 0.6
+    assert 0.3 < thresholds[1] <= 0.35
+
+
+def test_label_without_examples_is_never_selected() -> None:
+    """A label without enough examples gets the threshold of 1.0."""
+    probabilities = np.array([[0.9, 0.9], [0.1, 0.1]])
+    labels = np.array([[1, 0], [0, 0]])
+    assert tune_thresholds(probabilities, labels)[1] == 1.0
+
+
+def test_selection_and_confidence() -> None:
+    """The confidence is the smallest relative margin from the thresholds."""
+    selector = FunctionSelector(functions, thresholds=np.array([0.5, 0.8]))
+    chosen, confidence = selector.select(np.array([0.75, 0.4]))
+    assert chosen == ["get_general_stats_education"]
+    assert np.isclose(confidence, 0.5)
+    _, confidence = selector.select(np.array([0.95, 0.75]))
+    assert np.isclose(confidence, 0.0625)
+
+
+def test_selector_is_restored_from_file(tmp_path: Path) -> None:
+    """The saved selector predicts the same functions."""
+    questions = [
+        "How many schools are in the district?",
+        "What is the provision of kindergartens?",
+        "How many hospitals are in the city?",
+        "What is the accessibility of polyclinics?",
+        "What is the population of the city?",
+        "How many residents live in the district?",
+    ]
+    function_sets = [functions[:1]] * 2 + [functions[1:]] * 2 + [[]] * 2
+    selector = FunctionSelector(functions).fit(questions, function_sets)
+    path = tmp_path / "selector.joblib"
+    selector.save(path)
+    restored = FunctionSelector.load(path)
+    question = "How many schools are in the city?"
+    assert restored.predict(question) == selector.predict(question)
+    assert restored.functions == functions
+
+
+def test_empty_choice_is_not_confident() -> None:
+    """A question may need a function that the selector never chooses."""
+    selector = FunctionSelector(functions, thresholds=np.array([0.5, 0.8]))
+    assert selector.select(np.array([0.05, 0.05])) == ([], 0.0)
+
+
+def test_functions_without_questions_do_not_add_confidence() -> None:
+    """The margin of a function that is never chosen says nothing of the question."""
+    selector = FunctionSelector(
+        functions, thresholds=np.array([0.5, 0.5]), coverage=np.array([10, 0])
+    )
+    assert not selector.covered[1]
+    chosen, confidence = selector.select(np.array([0.75, 0.9]))
+    assert chosen == ["get_general_stats_education"]
+    assert np.isclose(confidence, 0.5)
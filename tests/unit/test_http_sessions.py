@@ -0,0 +1,73 @@
+import asyncio
+import threading
+
+import pytest
+
+from modules.models.benchmark_connectors import LLMServer
+from modules.models.connector_creator import LanguageModelCreator
+from utils.deadline import request_deadline
+from utils.http_sessions import close_async_client
+from utils.http_sessions import get_async_client
+from utils.http_sessions import get_client
+from utils.http_sessions import get_session
+from utils.http_sessions import llm_timeouts
+
+
+def test_threads_share_the_connection_pool() -> None:
+    """The sessions of the threads share one connection pool."""
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(get_session()))
+    thread.start()
+    thread.join()
+    assert sessions[0] is not get_session()
+    assert sessions[0].get_adapter("http://") is get_session().get_adapter("http://")
+
+
+def test_calls_reuse_the_connection() -> None:
+    """The sync and the async calls reuse their keep-alive connections."""
+    server = LLMServer(handshake_delay=0)
+    try:
+        for _ in range(3):
+            assert get_session().post(server.url, json={}, timeout=5).status_code == 200
+
+        async def calls() -> None:
+            try:
+                for _ in range(3):
+                    response = await get_async_client().post(server.url, json={})
+                    assert response.status_code == 200
+            finally:
+                await close_async_client()
+
+        asyncio.run(calls())
+        assert server.connections == 2
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_timeouts_are_limited_by_the_deadline() -> None:
+    """The timeouts of an LLM call do not exceed the request deadline."""
+    with request_deadline(1.0):
+        connect, read = llm_timeouts()
+    assert connect <= read <= 1.0
+
+
+def test_vsegpt_connectors_share_the_pooled_clients(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """The openai clients of the connectors do not open their own pools."""
+    monkeypatch.setenv("VSE_GPT_KEY", "key")
+    first, second = (
+        LanguageModelCreator.create_llm_connector("vsegpt;openai/gpt-4o-mini", "")
+        for _ in range(2)
+    )
+    assert first._model._client is get_client() is second._model._client
+
+    async def async_clients() -> list:
+        try:
+            return [first._async_model._client, get_async_client()]
+        finally:
+            await close_async_client()
+
+    model_client, pooled_client = asyncio.run(async_clients())
+    assert model_client is pooled_client
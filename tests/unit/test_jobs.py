@@ -0,0 +1,99 @@
+import asyncio
+import logging
+
+import pytest
+
+from utils.admission import QueueFullError
+from utils.jobs import Job
+from utils.jobs import JobQueue
+
+
+class FakeClock:
+    """Clock that returns the time set by the test."""
+
+    def __init__(self) -> None:
+        """Starts the clock at 0."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Returns the current time."""
+        return self.now
+
+
+def test_job_result_and_stages_are_recorded() -> None:
+    """The job keeps its answer and the stage records of the pipeline."""
+    job_queue = JobQueue(workers=2, max_queued=10, retention=60)
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+
+    async def answer() -> str:
+        logger.info("Selected pipeline: strategy_development")
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def run() -> dict:
+        job = job_queue.submit(answer)
+        assert job.status == "queued"
+        while job.status in ("queued", "running"):
+            await asyncio.sleep(0.01)
+        await job_queue.stop()
+        return job.to_dict()
+
+    job_state = asyncio.run(run())
+    assert job_state["status"] == "done"
+    assert job_state["result"] == "answer"
+    assert job_state["run_seconds"] >= 0.01
+    assert [stage["message"] for stage in job_state["stages"]] == [
+        "Selected pipeline: strategy_development"
+    ]
+
+
+def test_failed_job_keeps_error() -> None:
+    """A failed job keeps the error message."""
+    job_queue = JobQueue(workers=1, max_queued=10, retention=60)
+
+    async def fail() -> str:
+        raise ValueError("LLM is not available")
+
+    async def run() -> Job:
+        job = job_queue.submit(fail)
+        while job.status in ("queued", "running"):
+            await asyncio.sleep(0.01)
+        await job_queue.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert job.status == "failed"
+    assert job.error == "LLM is not available"
+
+
+def test_queue_is_bounded() -> None:
+    """A job that does not fit the queue is rejected."""
+    job_queue = JobQueue(workers=1, max_queued=1, retention=60)
+
+    async def run() -> None:
+        job_queue.submit(lambda: asyncio.sleep(0.01))
+        with pytest.raises(QueueFullError):
+            job_queue.submit(lambda: asyncio.sleep(0.01))
+        await job_queue.stop()
+
+    asyncio.run(run())
+
+
+def test_finished_jobs_expire_after_retention() -> None:
+    """A finished job is kept for the retention window."""
+    clock = FakeClock()
+    job_queue = JobQueue(workers=1, max_queued=10, retention=60, clock=clock)
+
+    async def run() -> Job:
+        job = job_queue.submit(lambda: asyncio.sleep(0))
+        while job.status != "done":
+            await asyncio.sleep(0.01)
+        await job_queue.stop()
+        return job
+
+    job = asyncio.run(run())
+    clock.now = 60
+    assert job_queue.get(job.id) is job
+    clock.now = 61
+    assert job_queue.get(job.id) is None
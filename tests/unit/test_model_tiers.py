@@ -0,0 +1,55 @@
+import pytest
+
+from modules.models.model_tiers import count_context_parts
+from modules.models.model_tiers import ModelTiers
+from modules.models.model_tiers import question_complexity
+from modules.variables.settings import app_settings
+
+
+def test_tables_and_chunks_are_counted() -> None:
+    """The tables and the document chunks are counted as context parts."""
+    tables = str({"a": {"b": 1}}) + str({"c": [{"d": 2}]})
+    assert count_context_parts(tables) == 2
+    assert count_context_parts("Chunk 0: text Chunk 1: {text}") == 3
+    assert count_context_parts("") == 0
+
+
+def test_complexity_of_lookup_and_analysis_questions() -> None:
+    """Lookup questions are simple and analysis questions are complex."""
+    context = str({"population": 1000})
+    score, features = question_complexity("Сколько школ в районе?", context)
+    assert score == -1 and features["lookup"]
+    # A lookup word does not make an analysis question simple
+    score, features = question_complexity(
+        "What are the problems of demographic development?", context
+    )
+    assert score == 1 and features["analysis"] and not features["lookup"]
+
+
+def test_large_context_adds_complexity(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A large context makes a lookup question complex."""
+    monkeypatch.setattr(app_settings, "model_tier_max_context_tokens", 10)
+    monkeypatch.setattr(app_settings, "model_tier_max_context_parts", 1)
+    context = str({"a": 1}) + str({"b": 2}) + " word" * 20
+    score, _ = question_complexity("Сколько школ в районе?", context)
+    assert score == 1
+
+
+def test_questions_are_routed_by_complexity(monkeypatch: pytest.MonkeyPatch) -> None:
+    """The questions are routed by complexity and the routing is recorded."""
+    monkeypatch.setattr(app_settings, "model_tiers_enabled", True)
+    tiers = ModelTiers()
+    assert tiers.choose("Сколько школ в районе?", "") == "fast"
+    assert tiers.choose("Почему падает рождаемость?", "") == "large"
+    tiers.record("fast", 1.0)
+    stats = tiers.stats()
+    assert stats["fast"]["routed"] == 1 and stats["fast"]["rate"] == 0.5
+    assert stats["fast"]["latency"]["count"] == 1
+    assert stats["large"]["latency"] == {"count": 0}
+
+
+def test_large_tier_is_used_when_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    """All the questions go to the large tier when the tiers are disabled."""
+    monkeypatch.setattr(app_settings, "model_tiers_enabled", False)
+    tiers = ModelTiers()
+    assert tiers.choose("Сколько школ в районе?", "") == "large"
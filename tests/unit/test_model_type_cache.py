@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+import pytest
+
+from modules.cache.model_type_cache import ModelTypeCache
+from modules.models.connector_creator import LanguageModelCreator
+from modules.models.connector_creator import model_type_cache
+from modules.variables.settings import app_settings
+
+
+class Clock:
+    """Time that moves only when the test sets it."""
+
+    def __init__(self) -> None:
+        """Starts the time at 0."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Returns the current time."""
+        return self.now
+
+
+def wait_for_refresh(cache: ModelTypeCache, host: str, model_type: str) -> None:
+    """Waits up to a second until the background refresh stores the type."""
+    for _ in range(100):
+        if cache.lookup(host)[0] == model_type:
+            return
+        time.sleep(0.01)
+
+
+def test_expired_type_is_returned_while_refreshed() -> None:
+    """An expired type is returned while it is refreshed in the background."""
+    clock = Clock()
+    cache = ModelTypeCache(ttl=10, clock=clock)
+    assert cache.lookup("llm:80") == (None, True)
+    cache.set("llm:80", "llama-8b")
+    assert cache.lookup("llm:80") == ("llama-8b", False)
+
+    clock.now = 11
+    assert cache.lookup("llm:80") == ("llama-8b", True)
+    cache.refresh("llm:80", lambda: ("llama-70b", True))
+    wait_for_refresh(cache, "llm:80", "llama-70b")
+    assert cache.lookup("llm:80") == ("llama-70b", False)
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_failed_refresh_keeps_the_expired_type() -> None:
+    """The expired type is kept if the refresh fails."""
+    clock = Clock()
+    cache = ModelTypeCache(ttl=10, clock=clock)
+    cache.set("llm:80", "llama-8b")
+    clock.now = 11
+
+    def fail() -> str:
+        raise ConnectionError("no route to host")
+
+    cache.refresh("llm:80", fail)
+    time.sleep(0.05)
+    assert cache.lookup("llm:80") == ("llama-8b", True)
+
+
+def test_type_is_discovered_once_per_host(monkeypatch: pytest.MonkeyPatch) -> None:
+    """The concurrent requests to a host make one discovery."""
+    calls = []
+
+    async def discover(url: str) -> tuple:
+        calls.append(url)
+        await asyncio.sleep(0.01)
+        return "llama-8b", True
+
+    monkeypatch.setattr(model_type_cache, "_entries", {})
+    monkeypatch.setattr(LanguageModelCreator, "_a_discover_model_type", discover)
+
+    async def get_types() -> list:
+        return await asyncio.gather(
+            LanguageModelCreator._a_get_model_type("http://llm:80/generate"),
+            LanguageModelCreator._a_get_model_type("http://llm:80/v1/completions"),
+        )
+
+    assert asyncio.run(get_types()) == ["llama-8b", "llama-8b"]
+    assert LanguageModelCreator._get_model_type("http://llm:80/generate") == "llama-8b"
+    assert len(calls) == 1
+
+
+def test_configured_type_skips_discovery(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A type set in LLM_MODEL_TYPES is not requested from the service."""
+
+    def discover(url: str) -> str:
+        raise AssertionError("The type must not be requested")
+
+    monkeypatch.setattr(app_settings, "llm_model_types", {"llm:81": "llama-70b"})
+    monkeypatch.setattr(LanguageModelCreator, "_discover_model_type", discover)
+    assert LanguageModelCreator._get_model_type("http://llm:81/generate") == "llama-70b"
+
+
+def test_guessed_type_expires_sooner_and_does_not_replace_a_known_one() -> None:
+    """A type guessed from an error is refreshed after error_ttl.
+
+    A refresh that only guesses keeps the type told by the service.
+    """
+    clock = Clock()
+    cache = ModelTypeCache(ttl=100, error_ttl=10, clock=clock)
+    cache.set("llm:80", "llama-70b", definitive=False)
+    clock.now = 11
+    assert cache.lookup("llm:80") == ("llama-70b", True)
+    cache.refresh("llm:80", lambda: ("llama-8b", True))
+    wait_for_refresh(cache, "llm:80", "llama-8b")
+    assert cache.lookup("llm:80") == ("llama-8b", False)
+
+    clock.now = 200
+    cache.refresh("llm:80", lambda: ("llama-70b", False))
+    time.sleep(0.05)
+    assert cache.lookup("llm:80") == ("llama-8b", True)
+
+
+def test_only_definitive_statuses_tell_the_type() -> None:
+    """Server errors, timeouts and rate limits do not tell the type."""
+    url = "http://llm:80/generate"
+    assert LanguageModelCreator._model_type_from_status(url, 200) == ("llama-8b", True)
+    assert LanguageModelCreator._model_type_from_status(url, 404) == ("llama-70b", True)
+    for status in (408, 429, 500, 503):
+        assert LanguageModelCreator._model_type_from_status(url, status) == (
+            "llama-70b",
+            False,
+        )
+
+
+def test_failed_discovery_is_not_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A service that could not be reached is requested again by the next call."""
+    calls = []
+
+    def discover(url: str) -> tuple:
+        calls.append(url)
+        if len(calls) == 1:
+            raise ConnectionError("connection refused")
+        return "llama-8b", True
+
+    monkeypatch.setattr(model_type_cache, "_entries", {})
+    monkeypatch.setattr(LanguageModelCreator, "_discover_model_type", discover)
+    with pytest.raises(ConnectionError):
+        LanguageModelCreator._get_model_type("http://llm:82/generate")
+    assert LanguageModelCreator._get_model_type("http://llm:82/generate") == "llama-8b"
+    assert len(calls) == 2
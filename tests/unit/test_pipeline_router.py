@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from modules.routing.pipeline_router import PipelineRouter
+
+
+questions = [
+    "How many schools are in the district?",
+    "What is the accessibility of hospitals by public transport?",
+    "How many kindergartens are in the city?",
+    "What is the provision of the population with polyclinics?",
+    "What are the goals of the development strategy?",
+    "What measures are planned to develop tourism?",
+    "What are the priorities of the strategy for the economy?",
+    "What tasks are set for the development of culture?",
+]
+pipelines = ["service_accessibility_pipeline"] * 4 + ["strategy_development_pipeline"] * 4
+
+
+def test_router_chooses_pipeline_with_confidence() -> None:
+    """The router chooses the pipeline of the similar training questions."""
+    router = PipelineRouter().fit(questions, pipelines)
+    pipeline, confidence = router.predict("How many schools are in the city?")
+    assert pipeline == "service_accessibility_pipeline"
+    assert 0.5 < confidence <= 1.0
+
+
+def test_router_is_restored_from_file(tmp_path: Path) -> None:
+    """The saved router makes the same predictions."""
+    path = tmp_path / "router.joblib"
+    router = PipelineRouter().fit(questions, pipelines)
+    router.save(path)
+    restored = PipelineRouter.load(path)
+    question = "What are the goals of the strategy for tourism?"
+    assert restored.predict(question) == router.predict(question)
@@ -0,0 +1,72 @@
+from modules.cache.plan_cache import cache_plan
+from modules.cache.plan_cache import get_cached_plan
+from modules.cache.plan_cache import plan_cache
+from modules.cache.plan_cache import plan_cache_key
+from modules.cache.plan_cache import question_template
+
+
+tools = [{"type": "function", "function": {"name": "get_general_stats_education"}}]
+
+
+def test_template_masks_territory_numbers_and_quotes() -> None:
+    """The territory, numbers and quoted entities are masked."""
+    first = question_template(
+        "How many schools are in Saint Petersburg in 2023?", "Saint Petersburg"
+    )
+    second = question_template("How many schools are in kolpino in 2024", "Kolpino")
+    assert first == second == "how many schools are in <territory> in <number>"
+    assert question_template('What are the measures of the task "Tourism"?', None) == (
+        "what are the measures of the task <quoted>"
+    )
+
+
+def test_only_the_selected_territory_is_masked() -> None:
+    """Other territories keep their names, a longer word with the name is kept."""
+    assert question_template("How many schools are in Pushkin?", "Kolpino") == (
+        "how many schools are in pushkin"
+    )
+    assert (
+        question_template("Compare Kolpino and Pushkinsky district", "Pushkin")
+        == "compare kolpino and pushkinsky district"
+    )
+    assert question_template("Compare Kolpino and Pushkin", "Pushkin") == (
+        "compare kolpino and <territory>"
+    )
+
+
+def test_plan_is_shared_by_question_template() -> None:
+    """Questions with the same template share a copy of the plan."""
+    plan_cache.purge()
+    key = plan_cache_key(
+        "functions", tools, "How many schools are in Kolpino?", "Kolpino"
+    )
+    cache_plan(key, ["get_general_stats_education"])
+    other_key = plan_cache_key(
+        "functions", tools, "How many schools are in Pushkin?", "Pushkin"
+    )
+    plan = get_cached_plan(other_key)
+    assert plan == ["get_general_stats_education"]
+    plan.append("get_general_stats_city")
+    assert get_cached_plan(other_key) == ["get_general_stats_education"]
+
+
+def test_empty_plan_is_not_cached() -> None:
+    """An empty choice of the LLM is not stored."""
+    plan_cache.purge()
+    key = plan_cache_key("functions", tools, "How many parks?", None)
+    cache_plan(key, [])
+    assert get_cached_plan(key) is None
+
+
+def test_plans_are_removed_when_tools_change() -> None:
+    """The plans of a stage are removed when its tools change."""
+    plan_cache.purge()
+    key = plan_cache_key("functions", tools, "How many schools?", None)
+    cache_plan(key, ["get_general_stats_education"])
+    changed_tools = tools + [
+        {"type": "function", "function": {"name": "get_general_stats_sports"}}
+    ]
+    changed_key = plan_cache_key("functions", changed_tools, "How many schools?", None)
+    assert changed_key != key
+    assert plan_cache.keys() == []
+    assert get_cached_plan(changed_key) is None
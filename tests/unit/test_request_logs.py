@@ -0,0 +1,57 @@
+import logging
+
+from utils.get_logs import filter_records
+from utils.get_logs import RequestLogsBuffer
+from utils.get_logs import RequestLogsHandler
+from utils.get_logs import request_logs_buffer
+
+
+def test_buffer_keeps_records_of_started_requests_only() -> None:
+    """Only the latest records of the started requests are kept."""
+    buffer = RequestLogsBuffer(max_records=2, max_requests=2)
+    buffer.start("request-1")
+    buffer.append("request-1", "first")
+    buffer.append("request-2", "not started")
+    buffer.append("request-1", "second")
+    buffer.append("request-1", "third")
+    assert buffer.get_records("request-1") == ["second", "third"]
+    assert buffer.get_records("request-2") == []
+    buffer.release("request-1")
+    assert buffer.get_records("request-1") == []
+
+
+def test_buffer_drops_oldest_requests() -> None:
+    """The records of the oldest request are dropped when the buffer is full."""
+    buffer = RequestLogsBuffer(max_records=10, max_requests=2)
+    for corr_id in ("request-1", "request-2", "request-3"):
+        buffer.start(corr_id)
+        buffer.append(corr_id, corr_id)
+    assert buffer.get_records("request-1") == []
+    assert buffer.get_records("request-3") == ["request-3"]
+
+
+def test_handler_records_are_filtered_like_log_file_lines() -> None:
+    """The buffered records have the format of the log file lines."""
+    logger = logging.getLogger("test_request_logs")
+    logger.setLevel(logging.INFO)
+    handler = RequestLogsHandler()
+    handler.addFilter(lambda record: setattr(record, "correlation_id", "abc") or True)
+    handler.setFormatter(
+        logging.Formatter(
+            "%(levelname)s: %(asctime)s %(name)s:%(lineno)d "
+            "[%(correlation_id)s] %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        )
+    )
+    logger.addHandler(handler)
+    request_logs_buffer.start("abc")
+    try:
+        logger.info("Selected pipeline: ['strategy_development_pipeline']")
+        logger.info("Final answer: 42")
+        records = request_logs_buffer.get_records("abc")
+    finally:
+        request_logs_buffer.release("abc")
+        logger.removeHandler(handler)
+    assert filter_records(records) == (
+        "Selected pipeline: ['strategy_development_pipeline']"
+    )
@@ -0,0 +1,37 @@
+import numpy as np
+
+from modules.cache.semantic_cache import SemanticCache
+
+
+def test_returns_answer_for_similar_question_about_same_territory() -> None:
+    """A similar question about the same territory gets the cached answer."""
+    cache = SemanticCache(threshold=0.9, max_size=10, ttl=60)
+    cache.set("SPb", "hospital accessibility time", np.array([1.0, 0.0, 0.1]), "15 min")
+    answer, similarity = cache.get("SPb", np.array([0.9, 0.0, 0.1]))
+    assert answer == "15 min"
+    assert similarity > 0.9
+    answer, _ = cache.get("Moscow", np.array([0.9, 0.0, 0.1]))
+    assert answer is None
+
+
+def test_ignores_questions_below_threshold() -> None:
+    """A question less similar than the threshold is a miss."""
+    cache = SemanticCache(threshold=0.9, max_size=10, ttl=60)
+    cache.set("SPb", "hospital accessibility time", np.array([1.0, 0.0]), "15 min")
+    answer, similarity = cache.get("SPb", np.array([1.0, 1.0]))
+    assert answer is None
+    assert np.isclose(similarity, np.sqrt(0.5))
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (0, 1)
+    assert stats["similarity_histogram"] == {"0.70-0.75": 1}
+
+
+def test_lru_eviction_and_purge() -> None:
+    """The least recently used entry is evicted, the purge removes a territory."""
+    cache = SemanticCache(threshold=0.9, max_size=2, ttl=60)
+    cache.set("SPb", "a", np.array([1.0, 0.0]), "a")
+    cache.set("SPb", "b", np.array([0.0, 1.0]), "b")
+    cache.set("Moscow", "c", np.array([1.0, 0.0]), "c")
+    assert cache.get("SPb", np.array([1.0, 0.0]))[0] is None
+    assert cache.purge(lambda territory: territory == "Moscow") == 1
+    assert cache.stats()["size"] == 1
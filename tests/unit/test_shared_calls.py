@@ -0,0 +1,56 @@
+import asyncio
+from typing import Tuple
+
+import pytest
+
+from utils.shared_calls import shared_call
+from utils.shared_calls import sharing_calls
+
+
+def test_identical_calls_are_executed_once() -> None:
+    """Identical calls inside a sharing_calls() block are executed once."""
+    executions = []
+
+    async def retrieve(key: str) -> str:
+        executions.append(key)
+        await asyncio.sleep(0.01)
+        return f"context of {key}"
+
+    async def run() -> Tuple[str, str, str]:
+        with sharing_calls():
+            first = asyncio.create_task(shared_call("a", lambda: retrieve("a")))
+            # A nested block reuses the calls of the outer one
+            with sharing_calls():
+                second = await shared_call("a", lambda: retrieve("a"))
+            return await first, second, await shared_call("b", lambda: retrieve("b"))
+
+    assert asyncio.run(run()) == ("context of a", "context of a", "context of b")
+    assert executions == ["a", "b"]
+
+
+def test_call_is_cancelled_with_its_last_caller_and_restarted() -> None:
+    """A shared call is cancelled only with its last caller and then started again."""
+    executions = []
+
+    async def retrieve() -> str:
+        executions.append("started")
+        await asyncio.sleep(0.05)
+        return "context"
+
+    async def run() -> str:
+        with sharing_calls():
+            first = asyncio.create_task(shared_call("a", retrieve))
+            second = asyncio.create_task(shared_call("a", retrieve))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            assert await second == "context"
+
+            third = asyncio.create_task(shared_call("b", retrieve))
+            await asyncio.sleep(0.01)
+            third.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await third
+            return await shared_call("b", retrieve)
+
+    assert asyncio.run(run()) == "context"
+    assert executions == ["started"] * 3
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_identical_calls_are_executed_once() -> None:
+    """The concurrent calls with the same key share one execution."""
+    single_flight = SingleFlight()
+    executions = []
+
+    async def answer(question: str) -> str:
+        executions.append(question)
+        await asyncio.sleep(0.01)
+        return f"answer to {question}"
+
+    async def run() -> list:
+        return await asyncio.gather(
+            single_flight.do("q1", lambda: answer("q1")),
+            single_flight.do("q1", lambda: answer("q1")),
+            single_flight.do("q2", lambda: answer("q2")),
+        )
+
+    results = asyncio.run(run())
+    assert results == ["answer to q1", "answer to q1", "answer to q2"]
+    assert executions == ["q1", "q2"]
+    assert single_flight.stats() == {"in_flight": 0, "executed": 2, "coalesced": 1}
+
+
+def test_error_is_raised_for_all_callers() -> None:
+    """The error of the execution is raised for every caller."""
+    single_flight = SingleFlight()
+
+    async def fail() -> str:
+        await asyncio.sleep(0.01)
+        raise ValueError("LLM is not available")
+
+    async def run() -> list:
+        return await asyncio.gather(
+            single_flight.do("q", fail),
+            single_flight.do("q", fail),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert not single_flight.is_in_flight("q")
+
+
+def test_cancelled_caller_does_not_cancel_others() -> None:
+    """The other callers get the result after one of them is cancelled."""
+    single_flight = SingleFlight()
+
+    async def answer() -> str:
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    async def run() -> str:
+        first = asyncio.ensure_future(single_flight.do("q", answer))
+        second = asyncio.ensure_future(single_flight.do("q", answer))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "answer"
+
+
+def test_call_is_cancelled_with_its_last_caller() -> None:
+    """The execution is cancelled when no caller waits for it."""
+    single_flight = SingleFlight()
+    finished = []
+
+    async def answer() -> str:
+        await asyncio.sleep(0.02)
+        finished.append("q")
+        return "answer"
+
+    async def run() -> None:
+        caller = asyncio.ensure_future(single_flight.do("q", answer))
+        await asyncio.sleep(0.005)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0.03)
+
+    asyncio.run(run())
+    assert finished == []
+    assert not single_flight.is_in_flight("q")
+
+
+def test_caller_waits_within_its_own_timeout() -> None:
+    """A caller with a short timeout does not cancel the call for the others."""
+    single_flight = SingleFlight()
+
+    async def answer() -> str:
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run() -> str:
+        leader = asyncio.ensure_future(single_flight.do("q", answer))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await single_flight.do("q", answer, timeout=0.01)
+        return await leader
+
+    assert asyncio.run(run()) == "answer"
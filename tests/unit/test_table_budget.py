@@ -0,0 +1,77 @@
+from typing import List
+
+import pytest
+
+from agents.table_budget import TableBudgetPlanner
+from agents.tool_registry import ToolMetrics
+from agents.tool_registry import ToolRegistry
+from modules.variables.settings import app_settings
+from utils.deadline import request_deadline
+
+
+def record(planner: TableBudgetPlanner, function: str, *args: object) -> None:
+    """Records a request of the function's table in the planner's registry."""
+    planner.registry.get(function).metrics.record(*args)
+
+
+def test_tables_without_history_are_capped_by_number(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Without metrics only TABLE_MAX_CALLS tables are planned."""
+    monkeypatch.setattr(app_settings, "table_max_calls", 2)
+    planner = TableBudgetPlanner()
+    assert planner.plan(["t1", "t2", "t3"]) == (["t1", "t2"], ["t3"])
+
+
+def test_slow_and_large_tables_are_dropped(monkeypatch: pytest.MonkeyPatch) -> None:
+    """The tables over the latency or the token budget are dropped."""
+    monkeypatch.setattr(app_settings, "table_latency_budget", 1.0)
+    monkeypatch.setattr(app_settings, "table_token_budget", 150)
+    planner = TableBudgetPlanner()
+    record(planner, "slow", 5.0)
+    record(planner, "large", 0.1, "word " * 100)
+    record(planner, "small", 0.1, "word " * 10)
+    record(planner, "medium", 0.1, "word " * 60)
+    assert planner.estimate("large") == (0.1, 100)
+
+    planned, dropped = planner.plan(["large", "slow", "medium", "small"])
+    assert planned == ["large", "small"]
+    assert dropped == ["slow", "medium"]
+    # The first table is requested even if it does not fit the budget
+    assert planner.plan(["slow", "small"]) == (["slow", "small"], [])
+
+
+def test_latency_budget_is_limited_by_the_request_deadline() -> None:
+    """A table slower than the time left until the deadline is dropped."""
+    planner = TableBudgetPlanner()
+    record(planner, "t1", 0.5, "table")
+    record(planner, "t2", 2.0, "table")
+    with request_deadline(1.0):
+        assert planner.plan(["t1", "t2"]) == (["t1"], ["t2"])
+
+
+def test_dropped_table_is_probed_and_recovers(monkeypatch: pytest.MonkeyPatch) -> None:
+    """One timeout does not drop a table forever."""
+    monkeypatch.setattr(app_settings, "table_metrics_max_age", 600.0)
+    monkeypatch.setattr(app_settings, "table_probe_interval", 60.0)
+    now: List[float] = [1000.0]
+    registry = ToolRegistry()
+    planner = TableBudgetPlanner(registry, clock=lambda: now[0])
+    registry.get("edu").metrics = ToolMetrics(clock=lambda: now[0])
+    for _ in range(10):
+        record(planner, "edu", 0.5, "table")
+    record(planner, "edu", 30.0)
+    assert planner.plan(["city", "edu"]) == (["city"], ["edu"])
+
+    # After the probe interval the table is requested once
+    now[0] += 60.0
+    assert planner.plan(["city", "edu"]) == (["city", "edu"], [])
+    assert planner.plan(["city", "edu"]) == (["city"], ["edu"])
+    # The probe was fast, but the timeout is still within the window
+    record(planner, "edu", 0.5, "table")
+    assert planner.plan(["city", "edu"]) == (["city"], ["edu"])
+
+    # The timeout is not used after TABLE_METRICS_MAX_AGE
+    now[0] += 600.0
+    record(planner, "edu", 0.5, "table")
+    assert planner.plan(["city", "edu"]) == (["city", "edu"], [])
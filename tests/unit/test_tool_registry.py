@@ -0,0 +1,104 @@
+import asyncio
+from typing import Any, Dict, NoReturn
+
+import pytest
+
+from agents.tool_registry import ToolRegistry
+from utils.shared_calls import sharing_calls
+
+
+SCHEMA = {"type": "function", "function": {"name": "table", "description": "A table."}}
+
+
+def test_tool_is_tied_to_its_schema_and_cached() -> None:
+    """A tool gets the schema with its name and caches its responses."""
+    calls = []
+
+    def table(name_id: str) -> Dict[str, Any]:
+        calls.append(name_id)
+        return {"rows": [name_id]}
+
+    async def a_table(name_id: str) -> Dict[str, Any]:
+        return table(name_id)
+
+    registry = ToolRegistry([SCHEMA])
+    tool = registry.register("table", table, a_table, cacheable=True, ttl=60)
+    assert tool.schema is SCHEMA
+
+    assert registry.call("table", name_id="Kolpino") == {"rows": ["Kolpino"]}
+    assert asyncio.run(registry.a_call("table", name_id="Kolpino")) == {
+        "rows": ["Kolpino"]
+    }
+    registry.call("table", name_id="Pushkin")
+    assert calls == ["Kolpino", "Pushkin"]
+    assert registry.stats()["table"]["calls"] == 2
+    assert registry.stats()["table"]["cache"]["hits"] == 1
+    assert registry.purge_cache() == 2
+
+
+def test_failed_calls_are_recorded_and_slow_tools_scheduled_first() -> None:
+    """Failed calls are counted as errors and the slowest tools start first."""
+
+    def fail(name_id: str) -> NoReturn:
+        raise ValueError("no table")
+
+    registry = ToolRegistry()
+    registry.register("fail", fail)
+    with pytest.raises(ValueError):
+        registry.call("fail", name_id="Kolpino")
+    with pytest.raises(AttributeError):
+        registry.call("unknown", name_id="Kolpino")
+    assert registry.stats()["fail"]["errors"] == 1
+    assert registry.stats()["fail"]["cacheable"] is False
+
+    registry.get("slow").metrics.record(2.0, "table")
+    registry.get("fast").metrics.record(0.1, "table")
+    assert registry.schedule(["fast", "new", "slow"]) == ["slow", "fast", "new"]
+
+
+def test_shared_async_calls_are_recorded_once() -> None:
+    """Identical calls in one batch make one upstream call and one record."""
+    calls = []
+
+    async def a_table(name_id: str) -> dict:
+        calls.append(name_id)
+        await asyncio.sleep(0.05)
+        return {"rows": [name_id]}
+
+    registry = ToolRegistry()
+    registry.register("table", a_func=a_table)
+
+    async def run() -> list:
+        with sharing_calls():
+            return await asyncio.gather(
+                registry.a_call("table", name_id="Kolpino"),
+                registry.a_call("table", name_id="Kolpino"),
+            )
+
+    assert asyncio.run(run()) == [{"rows": ["Kolpino"]}] * 2
+    assert calls == ["Kolpino"]
+    assert registry.stats()["table"]["calls"] == 1
+
+
+def test_timeouts_are_recorded_and_cancellations_are_not() -> None:
+    """A timed out call is a failed one, a cancelled call is not recorded."""
+
+    async def a_table(name_id: str) -> dict:
+        await asyncio.sleep(1)
+        return {"rows": [name_id]}
+
+    registry = ToolRegistry()
+    registry.register("table", a_func=a_table)
+
+    async def run() -> None:
+        with pytest.raises(asyncio.TimeoutError):
+            await registry.a_call("table", timeout=0.01, name_id="Kolpino")
+        task = asyncio.ensure_future(registry.a_call("table", name_id="Pushkin"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert registry.stats()["table"]["calls"] == 1
+    assert registry.stats()["table"]["errors"] == 1
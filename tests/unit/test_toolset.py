@@ -0,0 +1,23 @@
+import json
+
+from agents.toolset import compile_toolset
+from agents.tools.accessibility_tools import accessibility_tools
+from agents.tools.pipeline_tools import pipeline_tools
+
+
+def test_toolset_is_compact_and_compiled_once() -> None:
+    """The toolset is shorter than the legacy tools and compiled once."""
+    toolset = compile_toolset(accessibility_tools)
+    assert compile_toolset(json.loads(json.dumps(accessibility_tools))) is toolset
+    assert toolset.names == [tool["function"]["name"] for tool in accessibility_tools]
+    # The parameters shared by all the functions are rendered once
+    assert toolset.text.count("coordinates") == 1
+    assert '"' not in toolset.text
+    assert toolset.tokens < toolset.legacy_tokens
+
+
+def test_different_parameters_are_rendered_per_tool() -> None:
+    """The tools with different parameters are rendered on their own lines."""
+    toolset = compile_toolset(pipeline_tools)
+    assert len(toolset.text.splitlines()) == len(pipeline_tools)
+    assert toolset.stats()["tools"] == len(pipeline_tools)
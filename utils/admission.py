@@ -0,0 +1,155 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+import time
+from typing import Any, AsyncIterator, Dict
+
+from modules.variables.settings import app_settings
+from utils.measure_time import latency_summary
+
+
+class OverloadedError(Exception):
+    """Raised when a call is rejected because the service is overloaded."""
+
+
+class QueueFullError(OverloadedError):
+    """Raised when there are no free slots and the queue of waiting calls is full."""
+
+
+class QueueTimeoutError(OverloadedError):
+    """Raised when a call waited for a free slot longer than allowed."""
+
+
+class Bulkhead:
+    """Limits the number of concurrent calls to a resource.
+
+    Calls over the limit wait in a queue. If the queue is bounded, calls are
+    rejected with QueueFullError when it is full and with QueueTimeoutError
+    when they wait longer than the queue timeout.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int | None = None,
+        queue_timeout: float | None = None,
+        history_size: int = 1000,
+    ) -> None:
+        """Creates a bulkhead.
+
+        Args:
+            name: Name of the resource.
+            max_concurrency: Maximum number of concurrent calls.
+            max_queue: Maximum number of waiting calls, unbounded if None.
+            queue_timeout: Maximum waiting time in seconds, unbounded if None.
+            history_size: Number of the latest waiting times used for the statistics.
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wait_times = deque(maxlen=history_size)
+        self.in_use = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # asyncio primitives are bound to one event loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def acquire(self) -> None:
+        """Waits for a free slot. Every successful call must be followed by release()."""
+        semaphore = self._get_semaphore()
+        start = time.perf_counter()
+        if not semaphore.locked():
+            # A free slot is taken without suspending, so the calls started at
+            # the same time see the actual number of free slots
+            await semaphore.acquire()
+        else:
+            if self.max_queue is not None and self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(
+                    f"{self.name}: {self.waiting} calls are already waiting"
+                )
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise QueueTimeoutError(
+                    f"{self.name}: no free slot in {self.queue_timeout} sec"
+                )
+            finally:
+                self.waiting -= 1
+        self._wait_times.append(time.perf_counter() - start)
+        self.admitted += 1
+        self.in_use += 1
+
+    def release(self) -> None:
+        """Frees the slot taken by acquire()."""
+        self.in_use -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Holds a slot while the block is executed."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the load of the bulkhead and the waiting time summary in seconds."""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_use": self.in_use,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_time": latency_summary(list(self._wait_times)),
+        }
+
+
+# Admission of the user requests
+request_admission = Bulkhead(
+    "requests",
+    app_settings.max_concurrent_requests,
+    app_settings.max_queued_requests,
+    app_settings.request_queue_timeout,
+)
+
+# Concurrency limits of the upstream services
+upstream_bulkheads = {
+    "LLAMA_FC_URL": Bulkhead("LLAMA_FC_URL", app_settings.llm_fc_max_concurrency),
+    "LLAMA_URL": Bulkhead("LLAMA_URL", app_settings.llm_max_concurrency),
+    "chroma": Bulkhead("chroma", app_settings.chroma_max_concurrency),
+    "embeddings": Bulkhead("embeddings", app_settings.embeddings_max_concurrency),
+    "tables": Bulkhead("tables", app_settings.tables_max_concurrency),
+}
+
+
+def upstream(name: str) -> Bulkhead:
+    """Returns the bulkhead of the upstream service with the given name."""
+    return upstream_bulkheads[name]
+
+
+def admission_stats() -> Dict[str, Dict[str, Any]]:
+    """Returns the statistics of the request admission and all upstream bulkheads."""
+    return {
+        "requests": request_admission.stats(),
+        "upstreams": {
+            name: bulkhead.stats() for name, bulkhead in upstream_bulkheads.items()
+        },
+    }
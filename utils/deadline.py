@@ -0,0 +1,190 @@
+import asyncio
+from contextlib import asynccontextmanager
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import time
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Iterator, TypeVar
+
+from modules.variables.settings import app_settings
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Monotonic time by which the current request must be answered
+_request_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+# Whole time budget of the current request
+_request_budget: ContextVar[float | None] = ContextVar("request_budget", default=None)
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a stage of the request could not be finished in its time budget."""
+
+
+@contextmanager
+def request_deadline(seconds: float | None) -> Iterator[None]:
+    """Sets the time budget of the request executed in the block.
+
+    The budget is shared by the tasks started in the block.
+
+    Args:
+        seconds: time budget in seconds, no deadline if None.
+    """
+    deadline = None if seconds is None else time.monotonic() + seconds
+    token = _request_deadline.set(deadline)
+    budget_token = _request_budget.set(seconds)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+        _request_budget.reset(budget_token)
+
+
+def request_budget() -> float | None:
+    """Returns the whole time budget of the request, None if there is no deadline."""
+    return _request_budget.get()
+
+
+def remaining_time() -> float | None:
+    """Returns the time left until the request deadline, None if there is no deadline."""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def http_timeout() -> float:
+    """Returns the timeout of an upstream HTTP call.
+
+    The timeout is HTTP_TIMEOUT or the time left until the request deadline if it
+    is closer.
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return app_settings.http_timeout
+    return max(min(remaining, app_settings.http_timeout), 0.0)
+
+
+def _stage_timeout(stage: str, share: float) -> float | None:
+    remaining = remaining_time()
+    if remaining is None:
+        return None
+    if remaining <= 0:
+        logger.warning(
+            f"Stage timeout: {stage} skipped, the request deadline is exceeded"
+        )
+        raise DeadlineExceededError(f"{stage} skipped, the request deadline is exceeded")
+    return remaining * share
+
+
+async def run_stage(stage: str, awaitable: Awaitable[T], share: float = 1.0) -> T:
+    """Awaits a stage of the request within its share of the remaining time budget.
+
+    Args:
+        stage: name of the stage for the request logs.
+        awaitable: the stage to execute.
+        share: part of the remaining time budget given to the stage.
+
+    Returns:
+        The result of the stage.
+
+    Raises:
+        DeadlineExceededError: the stage was skipped or timed out.
+    """
+    try:
+        timeout = _stage_timeout(stage, share)
+    except DeadlineExceededError:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Stage timeout: {stage} did not finish in {timeout:.2f} sec")
+        raise DeadlineExceededError(f"{stage} did not finish in {timeout:.2f} sec")
+    except asyncio.CancelledError:
+        logger.warning(f"Stage cancelled: {stage}")
+        raise
+
+
+if hasattr(asyncio, "timeout"):
+    _timeout = asyncio.timeout
+else:
+
+    @asynccontextmanager
+    async def _timeout(delay: float | None) -> AsyncIterator[None]:
+        """Cancels the block in the current task after the delay.
+
+        A replacement of asyncio.timeout for Python 3.10.
+
+        Raises:
+            asyncio.TimeoutError: the block did not finish in time.
+        """
+        if delay is None:
+            yield
+            return
+        task = asyncio.current_task()
+        expired = False
+
+        def expire() -> None:
+            nonlocal expired
+            expired = True
+            task.cancel()
+
+        handle = asyncio.get_running_loop().call_later(max(delay, 0.0), expire)
+        try:
+            yield
+        except asyncio.CancelledError:
+            if expired:
+                raise asyncio.TimeoutError() from None
+            raise
+        finally:
+            handle.cancel()
+
+
+async def run_stream_stage(
+    stage: str, stream: AsyncGenerator[T, None], share: float = 1.0
+) -> AsyncGenerator[T, None]:
+    """Streaming version of run_stage.
+
+    The whole stream must be received within the share of the remaining time budget.
+    The stream is stepped in the current task, so the contexts it holds open
+    across the items (e.g. an HTTP stream or an upstream slot) are entered and
+    exited in the same task.
+
+    Args:
+        stage: name of the stage for the request logs.
+        stream: the stage to execute.
+        share: part of the remaining time budget given to the stage.
+
+    Yields:
+        The items of the stream.
+
+    Raises:
+        DeadlineExceededError: the stage was skipped or timed out.
+    """
+    try:
+        timeout = _stage_timeout(stage, share)
+        stage_end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            item_timeout = None if stage_end is None else stage_end - time.monotonic()
+            try:
+                async with _timeout(item_timeout):
+                    item = await stream.__anext__()
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"Stage timeout: {stage} did not finish in {timeout:.2f} sec"
+                )
+                raise DeadlineExceededError(
+                    f"{stage} did not finish in {timeout:.2f} sec"
+                )
+            except asyncio.CancelledError:
+                logger.warning(f"Stage cancelled: {stage}")
+                raise
+            yield item
+    finally:
+        await stream.aclose()
@@ -1,15 +1,109 @@
+from collections import deque
+from collections import OrderedDict
+import logging
 import os
 from pathlib import Path
-from typing import Dict, List
+import threading
+from typing import Deque, Dict, List
 
 from utils.logging_config import CORR_ID_LENGTH
 from utils.logging_config import PATH_TO_LOGS
+from utils.logging_config import REQUEST_LOGS_MAX_RECORDS
+from utils.logging_config import REQUEST_LOGS_MAX_REQUESTS
+
+
+class RequestLogsBuffer:
+    """In-memory storage of the log records of the requests being processed.
+
+    Records are kept only for the requests started with start() and are
+    dropped by release(). The number of records of one request and the number
+    of requests are bounded, the oldest ones are dropped first.
+    """
+
+    def __init__(self, max_records: int, max_requests: int) -> None:
+        """Creates an empty buffer.
+
+        Args:
+            max_records: max number of records kept for one request.
+            max_requests: max number of requests kept at the same time.
+        """
+        self.max_records = max_records
+        self.max_requests = max_requests
+        self._records: OrderedDict[str, Deque[str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, corr_id: str) -> None:
+        """Starts keeping the records of the request.
+
+        Args:
+            corr_id: correlation id for the request
+        """
+        with self._lock:
+            self._records[corr_id[:CORR_ID_LENGTH]] = deque(maxlen=self.max_records)
+            while len(self._records) > self.max_requests:
+                self._records.popitem(last=False)
+
+    def append(self, corr_id: str, record: str) -> None:
+        """Keeps the record if the request was started.
+
+        Args:
+            corr_id: correlation id for the request
+            record: formatted log record
+        """
+        with self._lock:
+            records = self._records.get(corr_id[:CORR_ID_LENGTH])
+            if records is not None:
+                records.append(record)
+
+    def get_records(self, corr_id: str) -> List[str]:
+        """Returns the records of the request.
+
+        Args:
+            corr_id: correlation id for the request
+
+        Returns:
+            List of the log records kept for the request
+        """
+        with self._lock:
+            return list(self._records.get(corr_id[:CORR_ID_LENGTH], ()))
+
+    def release(self, corr_id: str) -> None:
+        """Drops the records of the finished request.
+
+        Args:
+            corr_id: correlation id for the request
+        """
+        with self._lock:
+            self._records.pop(corr_id[:CORR_ID_LENGTH], None)
+
+
+request_logs_buffer = RequestLogsBuffer(
+    REQUEST_LOGS_MAX_RECORDS, REQUEST_LOGS_MAX_REQUESTS
+)
+
+
+class RequestLogsHandler(logging.Handler):
+    """Logging handler that passes the formatted records to the request_logs_buffer.
+
+    Requires the correlation_id filter.
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Passes the formatted record to the buffer."""
+        try:
+            request_logs_buffer.append(record.correlation_id, self.format(record))
+        except Exception:
+            self.handleError(record)
 
 
 def get_records_by_id(corr_id: str) -> List[str]:
-    """Finds log entries for the corresponding CorrelationID
+    """Finds log entries for the corresponding CorrelationID in the log file.
+
+    Reads the whole file, use request_logs_buffer for the requests being processed.
+
     Args:
         corr_id: correlation id for the request
+
     Returns:
         List of all log records for passed CorrelationID
     """
@@ -23,6 +117,45 @@ def get_records_by_id(corr_id: str) -> List[str]:
     return result_logs
 
 
+# Log messages with these keywords are sent with the response
+KEYWORDS_TO_KEEP = [
+    "Territory name",
+    "Territory type",
+    # 'Selected zone',
+    "Answer cache",
+    "Semantic cache",
+    "Plan cache",
+    "Speculation",
+    "Coalesced with",
+    "Selected pipeline",
+    "Selected functions",
+    "Chunk metadata",
+    "Pipeline choose time",
+    "Pipeline check time",
+    "Function choose time",
+    "Function check time",
+    "Retrieve context time",
+    "Context retrieve time",
+    "Could NOT retrieve the table",
+    "Tables dropped by the budget",
+    "Model tier",
+    "Answer generation time",
+    "Stage timeout",
+    "Stage cancelled",
+    "Request cancelled",
+]
+
+
+def is_record_to_keep(message: str) -> bool:
+    """Checks if the log message should be sent with the response
+    Args:
+        message: log message without the formatter prefix
+    Returns:
+        True if the message contains one of the KEYWORDS_TO_KEEP
+    """
+    return any(keyword in message for keyword in KEYWORDS_TO_KEEP)
+
+
 def filter_records(records_to_filter: List[str]) -> str:
     """Filters and removes unnecessary information from log entries
     Args:
@@ -31,23 +164,9 @@ def filter_records(records_to_filter: List[str]) -> str:
         Clean log records to be sent with the response
     """
     filtered_logs = []
-    keywords_to_keep = [
-        "Territory name",
-        "Territory type",
-        # 'Selected zone',
-        "Selected pipeline",
-        "Selected functions",
-        "Chunk metadata",
-        "Pipeline choose time",
-        "Pipeline check time",
-        "Function choose time",
-        "Function check time",
-        "Context retrieve time",
-        "Answer generation time",
-    ]
     for record in records_to_filter:
         record = " ".join(record.strip().split(" ")[5:])
-        if any(keyword in record for keyword in keywords_to_keep):
+        if is_record_to_keep(record):
             filtered_logs.append(record)
     return "\n".join(filtered_logs)
 
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+from typing import Tuple
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from modules.variables.settings import app_settings
+from utils.deadline import http_timeout
+
+
+# Connection pool shared by the sessions of all the threads
+_adapter: HTTPAdapter | None = None
+_adapter_lock = threading.Lock()
+# A requests session is not thread-safe, so every thread gets its own one
+_local = threading.local()
+# Synchronous httpx client of the libraries built on httpx (e.g. openai), shared
+# by the threads
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+# An httpx client is bound to the event loop it was first used in
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]"
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def llm_timeouts() -> Tuple[float, float]:
+    """Returns the (connect, read) timeouts of an LLM call.
+
+    The read timeout is HTTP_TIMEOUT or the time left until the request deadline
+    if it is closer, the connect timeout is LLM_CONNECT_TIMEOUT within the same limit.
+    """
+    read = http_timeout()
+    return min(app_settings.llm_connect_timeout, read), read
+
+
+def _get_adapter() -> HTTPAdapter:
+    global _adapter
+    with _adapter_lock:
+        if _adapter is None:
+            _adapter = HTTPAdapter(
+                pool_connections=app_settings.llm_pool_hosts,
+                pool_maxsize=app_settings.llm_pool_size,
+            )
+        return _adapter
+
+
+def get_session() -> requests.Session:
+    """Returns the keep-alive session of the current thread for the LLM calls.
+
+    The sessions of all the threads share one pool of LLM_POOL_SIZE connections
+    per host, so the connections opened by one call are reused by the next ones.
+    """
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+        adapter = _get_adapter()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    return session
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=app_settings.llm_pool_size * app_settings.llm_pool_hosts,
+        max_keepalive_connections=app_settings.llm_pool_size,
+        keepalive_expiry=app_settings.llm_keepalive_expiry,
+    )
+
+
+def _default_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        app_settings.http_timeout, connect=app_settings.llm_connect_timeout
+    )
+
+
+def get_client() -> httpx.Client:
+    """Returns the keep-alive httpx client for the libraries built on httpx.
+
+    The client (e.g. of the openai connectors) is shared by all the threads and
+    has the same limits as the asynchronous client, see get_async_client.
+    """
+    global _client
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(limits=_limits(), timeout=_default_timeout())
+        return _client
+
+
+def close_client() -> None:
+    """Closes the client of get_client, e.g. on the shutdown of the app."""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Returns the keep-alive client of the running event loop for the upstream calls.
+
+    The client is shared by the LLM calls, the summary table requests and the query
+    embeddings. It keeps up to LLM_POOL_SIZE connections per host open for
+    LLM_KEEPALIVE_EXPIRY seconds. The timeouts should be set per call, see
+    llm_timeouts.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _async_clients[loop] = httpx.AsyncClient(
+            limits=_limits(), timeout=_default_timeout()
+        )
+    return client
+
+
+def async_timeout() -> httpx.Timeout:
+    """Returns the timeouts of an LLM call for the httpx client, see llm_timeouts."""
+    connect, read = llm_timeouts()
+    return httpx.Timeout(read, connect=connect)
+
+
+async def close_async_client() -> None:
+    """Closes the client of the running event loop, e.g. on the shutdown of the app."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
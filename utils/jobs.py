@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+import uuid
+
+from asgi_correlation_id.context import correlation_id
+
+from modules.variables.settings import app_settings
+from utils.admission import QueueFullError
+from utils.streaming import stage_events
+
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    """A call executed in the background with its status, result and stage timings."""
+
+    def __init__(
+        self, func: Callable[[], Awaitable[Any]], clock: Callable[[], float]
+    ) -> None:
+        """Creates a queued job.
+
+        Args:
+            func: function that starts the call.
+            clock: function that returns the current time in seconds.
+        """
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.clock = clock
+        self.status = QUEUED
+        self.created_at = clock()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.result: Any = None
+        self.error: str | None = None
+        self.stages: List[Dict[str, Any]] = []
+
+    def put_nowait(self, message: str) -> None:
+        """Records a stage message with the time from the start of the job.
+
+        Allows to pass the job as the queue of utils.streaming.stage_events.
+        """
+        self.stages.append(
+            {"seconds": self.clock() - self.started_at, "message": message}
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the state of the job for the API response."""
+        now = self.clock()
+        queue_end = self.started_at if self.started_at is not None else now
+        run_seconds = None
+        if self.started_at is not None:
+            run_end = self.finished_at if self.finished_at is not None else now
+            run_seconds = run_end - self.started_at
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "queue_seconds": queue_end - self.created_at,
+            "run_seconds": run_seconds,
+            "stages": self.stages,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """Executes the submitted calls in a pool of background workers.
+
+    The finished jobs are kept for the retention window, so their results
+    can be fetched later.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_queued: int,
+        retention: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Creates a job queue. The workers are started by the first submitted job.
+
+        Args:
+            workers: Number of jobs executed at the same time.
+            max_queued: Maximum number of jobs waiting for a worker.
+            retention: Time in seconds for which the finished jobs are kept.
+            clock: Function that returns the current time in seconds.
+        """
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention = retention
+        self.clock = clock
+        self._jobs: Dict[str, Job] = {}
+        self._queue: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._worker_tasks: List[asyncio.Task] = []
+
+    def _start_workers(self) -> None:
+        # asyncio primitives are bound to one event loop
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._worker_tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            await self._run(job)
+
+    async def _run(self, job: Job) -> None:
+        # Records of the job are collected by its own correlation id
+        correlation_id.set(job.id)
+        job.status = RUNNING
+        job.started_at = self.clock()
+        logger.info(f"Job {job.id} started")
+        with stage_events(job):
+            try:
+                job.result = await job.func()
+                job.status = DONE
+            except Exception as e:
+                logger.error(f"Could NOT execute the job {job.id}: {e}")
+                job.error = str(e)
+                job.status = FAILED
+        job.finished_at = self.clock()
+        job.func = None
+        logger.info(f"Job {job.id} finished: {job.status}")
+
+    def _remove_expired(self) -> None:
+        now = self.clock()
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.retention
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, func: Callable[[], Awaitable[Any]]) -> Job:
+        """Queues the call for a background worker.
+
+        Args:
+            func: function that starts the call.
+
+        Returns:
+            The queued job.
+
+        Raises:
+            QueueFullError: max_queued jobs are already waiting.
+        """
+        self._start_workers()
+        self._remove_expired()
+        if self._queue.qsize() >= self.max_queued:
+            raise QueueFullError(f"jobs: {self._queue.qsize()} jobs are already waiting")
+        job = Job(func, self.clock)
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        """Returns the job with the given id or None if it is unknown or expired."""
+        self._remove_expired()
+        return self._jobs.get(job_id)
+
+    async def stop(self) -> None:
+        """Cancels the workers. The running jobs are cancelled as well."""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._loop = None
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of workers and the number of jobs in each status."""
+        self._remove_expired()
+        statuses = [job.status for job in self._jobs.values()]
+        return {
+            "workers": self.workers,
+            **{
+                status: statuses.count(status)
+                for status in (QUEUED, RUNNING, DONE, FAILED)
+            },
+        }
+
+
+job_queue = JobQueue(
+    app_settings.jobs_workers, app_settings.jobs_max_queued, app_settings.jobs_retention
+)
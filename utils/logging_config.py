@@ -34,6 +34,9 @@ def get_path_to_logs() -> Path:
 
 PATH_TO_LOGS = get_path_to_logs()
 CORR_ID_LENGTH = 16
+# Limits of the in-memory storage of the records of the requests being processed
+REQUEST_LOGS_MAX_RECORDS = 1000
+REQUEST_LOGS_MAX_REQUESTS = 1024
 
 
 def configure_logging() -> None:
@@ -68,6 +71,10 @@ def configure_logging() -> None:
     - number of backups is 5 (i.e. 5 files with log history will be stored
     simultaneously, which will overwrite each other one by one from 1 to 5 when
     the max size is reached)
+
+    The records of the requests being processed are also kept in memory by
+    the RequestLogsHandler (see utils.get_logs.request_logs_buffer), so the logs
+    of a request can be sent with the response without reading the log file.
     """
     dictConfig(
         {
@@ -104,11 +111,16 @@ def configure_logging() -> None:
                     "maxBytes": 10485760,
                     "backupCount": 5,
                 },
+                "request_buffer": {
+                    "()": "utils.get_logs.RequestLogsHandler",
+                    "filters": ["correlation_id"],
+                    "formatter": "console",
+                },
             },
             "loggers": {
                 # project logger (root)
                 "": {
-                    "handlers": ["console", "file"],
+                    "handlers": ["console", "file", "request_buffer"],
                     "level": "INFO",
                     "propagate": False,
                 },
@@ -1,5 +1,7 @@
 import datetime
+import math
 import time
+from typing import Dict, List
 
 
 def measure_execution_time(func):
@@ -35,3 +37,30 @@ class Timer:
 
     def __exit__(self, *args):
         return self.process_terminated
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Returns the q-th percentile (nearest-rank method) of the values."""
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    """Summarizes the latencies of a batch of operations.
+
+    Args:
+        seconds: latency of each operation in seconds.
+
+    Returns:
+        Dictionary with count, mean, p50, p95 and max latencies.
+    """
+    if not seconds:
+        return {"count": 0}
+    return {
+        "count": len(seconds),
+        "mean": sum(seconds) / len(seconds),
+        "p50": percentile(seconds, 50),
+        "p95": percentile(seconds, 95),
+        "max": max(seconds),
+    }
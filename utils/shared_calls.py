@@ -0,0 +1,67 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Hashable, Iterator, List, TypeVar
+
+
+T = TypeVar("T")
+
+# Future of each call and the number of its callers waiting for the result
+_shared_calls: ContextVar[Dict[Hashable, List] | None] = ContextVar(
+    "shared_calls", default=None
+)
+
+
+@contextmanager
+def sharing_calls() -> Iterator[None]:
+    """Makes identical calls inside the block be executed only once.
+
+    The calls of the tasks created in the block are shared too. A nested block
+    shares the calls of the outer one.
+
+    Example:
+        with sharing_calls():
+            await asyncio.gather(*[answer(q) for q in questions])
+    """
+    if _shared_calls.get() is not None:
+        yield
+        return
+    token = _shared_calls.set({})
+    try:
+        yield
+    finally:
+        _shared_calls.reset(token)
+
+
+async def shared_call(key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+    """Awaits func() or the result of an identical call made earlier.
+
+    The calls are shared inside the same sharing_calls() block.
+
+    The call is cancelled when all its callers are cancelled, the next identical
+    call starts it again.
+
+    Args:
+        key: key that identifies identical calls.
+        func: function that starts the call.
+
+    Returns:
+        The result of the call.
+    """
+    calls = _shared_calls.get()
+    if calls is None:
+        return await func()
+    if key not in calls or calls[key][0].cancelled():
+        calls[key] = [asyncio.ensure_future(func()), 0]
+    call = calls[key]
+    future = call[0]
+    call[1] += 1
+    try:
+        # Cancellation of one caller must not cancel the call for the others
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if call[1] == 1 and not future.done():
+            future.cancel()
+        raise
+    finally:
+        call[1] -= 1
@@ -0,0 +1,78 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one execution.
+
+    While a call with some key is in flight, the calls with the same key do not
+    start a new execution but wait for the result of the running one. The call
+    is cancelled when all its callers are cancelled.
+    """
+
+    def __init__(self) -> None:
+        """Creates an instance without calls in flight."""
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def is_in_flight(self, key: Hashable) -> bool:
+        """Checks if a call with the key is being executed now."""
+        return key in self._in_flight
+
+    async def do(
+        self,
+        key: Hashable,
+        func: Callable[[], Awaitable[T]],
+        timeout: float | None = None,
+    ) -> T:
+        """Awaits func() or the identical call that is already in flight.
+
+        The call runs in the context of the caller that started it (e.g. with its
+        request deadline), every caller waits for it only within its own timeout.
+
+        Args:
+            key: key that identifies identical calls.
+            func: function that starts the call.
+            timeout: max time to wait for the call in seconds, no limit if None.
+
+        Returns:
+            The result of the call. The exception of the call is raised
+            for all the callers.
+
+        Raises:
+            asyncio.TimeoutError: the call did not finish within the timeout, it is
+                cancelled if no other caller waits for it.
+        """
+        future = self._in_flight.get(key)
+        if future is None:
+            self.executed += 1
+            future = asyncio.ensure_future(func())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # Cancellation of one caller must not cancel the call for the others
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if self._waiters[key] == 1 and not future.done():
+                future.cancel()
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of calls in flight, executed and coalesced calls."""
+        return {
+            "in_flight": len(self._in_flight),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+        }
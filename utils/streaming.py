@@ -0,0 +1,78 @@
+import asyncio
+from contextlib import contextmanager
+import json
+import logging
+import threading
+from typing import Iterator
+
+from asgi_correlation_id.context import correlation_id
+
+from utils.get_logs import is_record_to_keep
+
+
+class StageEventsHandler(logging.Handler):
+    """Logging handler that passes the stage records of one request to a queue.
+
+    The stage records are the ones that are sent with the response
+    (see utils.get_logs.KEYWORDS_TO_KEEP): chosen pipeline and functions,
+    retrieved context metadata and the time of each stage.
+    """
+
+    def __init__(self, corr_id: str, queue: asyncio.Queue) -> None:
+        """Creates a handler for the request with the given CorrelationID.
+
+        Must be created inside the event loop that reads the queue.
+
+        Args:
+            corr_id: correlation id of the request.
+            queue: queue to put the stage messages into.
+        """
+        super().__init__(level=logging.INFO)
+        self.corr_id = corr_id
+        self.queue = queue
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Passes the record to the queue if it is a stage record of the request."""
+        # Records from the worker threads keep the context of the request
+        if correlation_id.get() != self.corr_id:
+            return
+        message = record.getMessage()
+        if not is_record_to_keep(message):
+            return
+        if threading.get_ident() == self.loop_thread_id:
+            self.queue.put_nowait(message)
+        else:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+
+@contextmanager
+def stage_events(queue: asyncio.Queue) -> Iterator[None]:
+    """Passes the stage records of the current request to the queue.
+
+    The records are passed while the block is executed.
+
+    Args:
+        queue: queue to put the stage messages into.
+    """
+    handler = StageEventsHandler(correlation_id.get(), queue)
+    root_logger = logging.getLogger()
+    root_logger.addHandler(handler)
+    try:
+        yield
+    finally:
+        root_logger.removeHandler(handler)
+
+
+def sse_event(event: str, data: object) -> str:
+    """Formats the data as a server-sent event.
+
+    Args:
+        event: name of the event.
+        data: JSON serializable payload of the event.
+
+    Returns:
+        Event in the text/event-stream format.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"